@@ -0,0 +1,56 @@
+import sys
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from edgar_prelim.edgar_submission import parse_submission, parse_tables, clean_table
+
+"""
+Times clean_table on the largest tables, by cell count, among those parsed from the full submission text files named
+on the command line, or on synthetic wide and long tables if none are named.
+
+    python bench/clean_table_bench.py [0000000001-19-000001.txt ...]
+"""
+
+
+def synthetic_tables() -> List[pd.DataFrame]:
+    """An income statement with repeated header rows and $ columns, at increasing numbers of periods and rows."""
+    def table(periods: int, rows: int) -> pd.DataFrame:
+        def row(label: str, cells) -> List[str]:
+            return [label] + [c for cell in cells for c in (cell, '', '')]
+
+        header = [row('', ['Three Months Ended'] * periods),
+                  row('', [f'March 31, {2019 - p}' for p in range(periods)]),
+                  row('', ['(Unaudited)'] * periods)]
+        body = [[f'Line  item {r}'] + ['$', f'{r * 1037:,}', ''] * periods for r in range(rows)]
+        return pd.DataFrame(header + body, dtype=object)
+
+    return [table(periods, rows) for periods, rows in [(2, 40), (8, 100), (25, 200), (250, 40)]]
+
+
+def benchmark(tables: List[pd.DataFrame], repeat: int = 3):
+    print(f'{"rows":>6}{"cols":>6}{"cleaned":>10}{"ms":>10}')
+    times = []
+    for df in tables:
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cleaned = clean_table(df)
+            seconds.append(time.perf_counter() - start)
+        times.append(min(seconds))
+        print(f'{df.shape[0]:6}{df.shape[1]:6}{str(cleaned.shape):>10}{times[-1] * 1000:10.1f}')
+    print(f'{len(tables)} tables, {np.sum(times) * 1000:.1f} ms')
+
+
+def largest_tables(paths: List[str], count: int = 20) -> List[pd.DataFrame]:
+    tables = []
+    for path in paths:
+        with open(path, encoding='latin-1') as f:
+            tables.extend(t.raw_df for t in parse_tables(parse_submission(f.read()), gate=False))
+    return sorted(tables, key=lambda df: df.size, reverse=True)[:count]
+
+
+if __name__ == '__main__':
+    benchmark(largest_tables(sys.argv[1:]) if len(sys.argv) > 1 else synthetic_tables())
@@ -0,0 +1,85 @@
+import sys
+import time
+from collections import Counter
+from typing import List
+
+from edgar_prelim.edgar_submission import Submission, parse_submission, parse_tables, gate_documents, items_from_tables
+
+"""
+Measures what gate_documents saves parse_tables and what it costs in recall. For each submission, reports the documents
+and bytes skipped by reason, the time to parse its tables with and without the gate, and any tables or items found
+without the gate that are lost with it. Reads the full submission text files named on the command line, or a synthetic
+submission if none are named.
+
+    python bench/document_gate_bench.py [0000000001-19-000001.txt ...]
+"""
+
+
+def synthetic_submission() -> Submission:
+    def document(doc_type: str, filename: str, text: str) -> str:
+        return f'<DOCUMENT>\n<TYPE>{doc_type}\n<SEQUENCE>1\n<FILENAME>{filename}\n<TEXT>\n{text}\n</TEXT>\n</DOCUMENT>\n'
+
+    row = '<tr><td>{}</td><td>$</td><td>{:,}</td><td>$</td><td>{:,}</td></tr>'
+    statement = (
+            '<p>CONSOLIDATED STATEMENTS OF INCOME (Unaudited)</p><p>(Dollars in thousands)</p><table>'
+            '<tr><td></td><td colspan="2">March 31, 2019</td><td colspan="2">March 31, 2018</td></tr>' +
+            ''.join(row.format(label, 1000 * i, 900 * i) for i, label in enumerate(
+                ['Total interest income', 'Net interest income', 'Provision for loan losses', 'Net income'] * 10)) +
+            '</table>')
+    narrative = '<p>The company reported results for the first quarter.</p>' * 200
+    slides = ''.join(f'<div><p>Slide {i}</p><table><tr><td>Loans</td><td>{i}</td></tr></table></div>'
+                     for i in range(400))
+    raw = (
+            '<SEC-DOCUMENT>0000000001-19-000001.txt : 20190415\n<SEC-HEADER>\nCENTRAL INDEX KEY:\t\t\t0000000001\n'
+            '</SEC-HEADER>\n' +
+            document('8-K', 'form8-k.htm', '<html><p>Item 2.02 Results of Operations</p>' + narrative + '</html>') +
+            document('EX-99.1', 'ex991.htm', '<html>' + narrative + statement * 3 + '</html>') +
+            document('EX-99.2', 'ex992.htm', '<html>' + slides + '</html>') +
+            '</SEC-DOCUMENT>\n')
+    return parse_submission(raw)
+
+
+def benchmark(submissions: List[Submission]):
+    reasons = Counter()
+    reason_bytes = Counter()
+    total_bytes = 0
+    gated_seconds = ungated_seconds = 0.
+    lost_tables = lost_items = 0
+    for submission in submissions:
+        for doc, reason in zip(submission.documents, gate_documents([doc.text for doc in submission.documents])):
+            reason = reason or 'parsed'
+            reasons[reason] += 1
+            reason_bytes[reason] += len(doc.text)
+            total_bytes += len(doc.text)
+
+        start = time.perf_counter()
+        gated = parse_tables(submission)
+        gated_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        ungated = parse_tables(submission, gate=False)
+        ungated_seconds += time.perf_counter() - start
+
+        gated_items, ungated_items = items_from_tables(gated), items_from_tables(ungated)
+        lost_tables += len(ungated) - len(gated)
+        if not gated_items.equals(ungated_items):
+            lost_items += len(ungated_items) - len(gated_items)
+            print(f'{submission.number}: items differ\n{ungated_items}\n{gated_items}')
+
+    print(f'{len(submissions)} submissions, {sum(reasons.values())} documents, {total_bytes:,} bytes')
+    for reason, count in reasons.most_common():
+        print(f'  {reason:>16}: {count:6} documents {reason_bytes[reason]:14,} bytes '
+              f'({reason_bytes[reason] / max(total_bytes, 1):.0%})')
+    print(f'parse_tables: {ungated_seconds:.2f}s without the gate, {gated_seconds:.2f}s with it')
+    print(f'lost: {lost_tables} tables, {lost_items} items')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        subs = []
+        for path in sys.argv[1:]:
+            with open(path, encoding='latin-1') as f:
+                subs.append(parse_submission(f.read()))
+    else:
+        subs = [synthetic_submission()]
+    benchmark(subs)
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+from typing import List, Iterator, Tuple, Optional
+
+from edgar_prelim.edgar_cache import DiskResponseCache
+from edgar_prelim.edgar_fiscal_period import parse_fiscal_period, fiscal_period_patterns, fiscal_period_exclusions
+from edgar_prelim.edgar_submission import parse_submission, parse_tables, _is_header_row
+
+"""
+Differential harness for parse_fiscal_period. Compares the screened patterns with the patterns searched one at a time,
+as they were before screening, on every header string of the tables of the submissions in a response cache, and times
+each. The header strings are the cells of the header rows of each table, and the first row of each cleaned table with
+its leading cell as the prefix, as items_from_table parses it. Reads the cache named on the command line or by
+EDGAR_CACHE_DIR, or full submission text files, or falls back to a synthetic set of headers.
+
+    python bench/fiscal_period_bench.py [cache_dir | 0000000001-19-000001.txt ...]
+"""
+
+SYNTHETIC_HEADERS = [
+    '', 'Three Months Ended', 'Quarter Ended', 'March 31,', 'June 30, 2019', '2019', '2018', '(Unaudited)', 'Q1 2019',
+    '1Q19', 'Fourth Quarter 2018', 'Three Months Ended March 31, 2019', 'For the Quarter Ended 3/31/2019', '31-Mar-19',
+    'Six Months Ended June 30, 2019', '% Change', 'Q1 2019 vs Q1 2018', 'Dec. 31, 2018 (a)', 'Net income', '$',
+]
+
+
+def _submissions(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for response in DiskResponseCache(path, replay_only=True).responses():
+                if response.url.endswith('.txt') and response.status_code == 200:
+                    yield response.content.decode(response.encoding or 'ISO-8859-1', errors='replace')
+        else:
+            with open(path, encoding='latin-1') as f:
+                yield f.read()
+
+
+def headers(paths: List[str]) -> List[Tuple[str, Optional[str]]]:
+    """The distinct header strings, each with its prefix or None, of the tables of the submissions."""
+    res = set()
+    for raw in _submissions(paths):
+        for table in parse_tables(parse_submission(raw), gate=False):
+            for _, row in table.raw_df.iterrows():
+                if _is_header_row(row):
+                    res.update((str(cell), None) for cell in row.dropna())
+            if not table.df.empty:
+                prefix = str(table.df.iloc[0, 0])
+                res.update((str(cell), prefix) for cell in table.df.iloc[0, 1:])
+    return sorted(res, key=str)
+
+
+def benchmark(header_strings: List[Tuple[str, Optional[str]]]):
+    def parse_all(**kwargs):
+        start = time.perf_counter()
+        res = [parse_fiscal_period(header, prefix, **kwargs) for header, prefix in header_strings]
+        return res, time.perf_counter() - start
+
+    cascade, cascade_seconds = parse_all(patterns=list(fiscal_period_patterns),
+                                         exclusions=list(fiscal_period_exclusions))
+    screened, screened_seconds = parse_all()
+
+    mismatches = [(h, e, f) for h, e, f in zip(header_strings, cascade, screened) if e != f]
+    for (header, prefix), expected, found in mismatches[:20]:
+        print(f'{header!r} (prefix {prefix!r}): {expected} != {found}')
+    print(f'{len(header_strings)} header strings, {sum(fp is not None for fp in cascade)} fiscal periods, '
+          f'{len(mismatches)} mismatches')
+    print(f'  pattern by pattern: {len(header_strings) / cascade_seconds:12,.0f} headers/s')
+    print(f'  screened:           {len(header_strings) / screened_seconds:12,.0f} headers/s')
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:] or ([os.environ['EDGAR_CACHE_DIR']] if os.environ.get('EDGAR_CACHE_DIR') else [])
+    benchmark(headers(args) if args else [(h, p) for h in SYNTHETIC_HEADERS for p in [None, *SYNTHETIC_HEADERS[:4]]])
@@ -0,0 +1,53 @@
+import sys
+import time
+from typing import List
+
+import pandas as pd
+
+from edgar_prelim.edgar_items import PrelimItem, prelim_items
+from edgar_prelim.edgar_submission import TableTuple, parse_submission, parse_tables, items_from_table, clean_table
+
+"""
+Times items_from_table on the tables parsed from the full submission text files named on the command line, or on a
+synthetic statement if none are named, with the prelim items alone and with each of their patterns repeated as many
+more items, to show what each added item costs per table.
+
+    python bench/item_matcher_bench.py [0000000001-19-000001.txt ...]
+"""
+
+
+def synthetic_tables() -> List[TableTuple]:
+    labels = ['Interest income', 'Interest expense', 'Net interest income', 'Provision for loan losses',
+              'Noninterest income', 'Total revenue', 'Noninterest expense', 'Income before income taxes',
+              'Income tax expense', 'Net income', 'Earnings per share', 'Book value per share', 'Total assets',
+              'Total deposits', 'Total loans', "Total shareholders' equity"]
+    rows = [['', 'Three Months Ended March 31, 2019', 'Three Months Ended March 31, 2018']] + [
+        [f'{label}{"" if i < len(labels) else f" {i}"}', f'${i * 1037:,}', f'${i * 977:,}']
+        for i, label in enumerate(labels * 8)]
+    df = clean_table(pd.DataFrame(rows, dtype=object))
+    return [TableTuple('Consolidated Statements of Income', df, df, None, 0, 'thousands', 1e3)] * 50
+
+
+def more_items(count: int) -> List[PrelimItem]:
+    return prelim_items + [item._replace(name=f'{item.name} {i}') for i in range(count) for item in prelim_items]
+
+
+def benchmark(tables: List[TableTuple]):
+    for repeats in [0, 1, 4]:
+        items = more_items(repeats)
+        start = time.perf_counter()
+        found = sum(len(items_from_table(table, items)) for table in tables)
+        seconds = time.perf_counter() - start
+        print(f'{len(items):4} items: {len(tables)} tables, {found} values, '
+              f'{seconds * 1000 / max(len(tables), 1):.2f} ms/table')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        parsed = []
+        for path in sys.argv[1:]:
+            with open(path, encoding='latin-1') as f:
+                parsed.extend(parse_tables(parse_submission(f.read()), gate=False))
+    else:
+        parsed = synthetic_tables()
+    benchmark(parsed)
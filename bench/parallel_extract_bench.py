@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+from datetime import date
+from typing import List
+
+from edgar_prelim.edgar_fetch import Fetched
+from edgar_prelim.edgar_load import extract_in_processes, extract_prelim_statement_from_submission
+from edgar_prelim.edgar_query import Filing, Report
+from edgar_prelim.edgar_submission import parse_submission
+
+"""
+Measures how extraction scales with the number of worker processes of extract_in_processes, from 1 to the number of
+cores, against extraction in this process. The submissions are already in memory, so only extraction and the transfer
+of submissions and statements between processes are timed. Reads the full submission text files named on the command
+line, or synthetic submissions if none are named.
+
+    python bench/parallel_extract_bench.py [0000000001-19-000001.txt ...]
+"""
+
+
+def synthetic_submissions(count: int = 40) -> List[str]:
+    row = '<tr><td>{}</td><td>$</td><td>{:,}</td><td>$</td><td>{:,}</td></tr>'
+    statement = (
+            '<p>CONSOLIDATED STATEMENTS OF INCOME (Unaudited)</p><p>(Dollars in thousands)</p><table>'
+            '<tr><td></td><td colspan="2">March 31, 2019</td><td colspan="2">March 31, 2018</td></tr>' +
+            ''.join(row.format(label, 1000 * i, 900 * i) for i, label in enumerate(
+                ['Total interest income', 'Net interest income', 'Provision for loan losses', 'Net income'] * 10)) +
+            '</table>')
+    text = '<html>' + '<p>The company reported results for the first quarter.</p>' * 200 + statement * 3 + '</html>'
+    return [
+        f'<SEC-DOCUMENT>0000000001-19-{i:06d}.txt : 20190415\n<SEC-HEADER>\nCENTRAL INDEX KEY:\t\t\t0000000001\n'
+        f'</SEC-HEADER>\n<DOCUMENT>\n<TYPE>EX-99.1\n<SEQUENCE>1\n<FILENAME>ex991.htm\n<TEXT>\n{text}\n</TEXT>\n'
+        f'</DOCUMENT>\n</SEC-DOCUMENT>\n'
+        for i in range(count)]
+
+
+def benchmark(raws: List[str]):
+    report = Report(fpe_date=date(2019, 3, 31), fye_date=date(2019, 12, 31), fiscal_period=1, href='')
+    fetched = [Fetched(Filing(date=date(2019, 4, 15), type='8-K', href=f'{i}'), (report, parse_submission(raw)), None)
+               for i, raw in enumerate(raws)]
+
+    start = time.perf_counter()
+    statements = sum(len(extract_prelim_statement_from_submission('0000000001', f.key, *f.value)) for f in fetched)
+    baseline = time.perf_counter() - start
+    print(f'{len(fetched)} filings, {statements} statement rows')
+    print(f'{"in process":>12}: {len(fetched) / baseline:8.1f} filings/s')
+
+    for workers in range(1, (os.cpu_count() or 1) + 1):
+        start = time.perf_counter()
+        rows = sum(len(extracted.result()) for _, extracted in extract_in_processes('0000000001', fetched,
+                                                                                   workers=workers))
+        seconds = time.perf_counter() - start
+        assert rows == statements
+        print(f'{workers:4} workers: {len(fetched) / seconds:8.1f} filings/s ({baseline / seconds:.2f}x)')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        texts = []
+        for path in sys.argv[1:]:
+            with open(path, encoding='latin-1') as f:
+                texts.append(f.read())
+    else:
+        texts = synthetic_submissions()
+    benchmark(texts)
@@ -0,0 +1,62 @@
+import sys
+import tempfile
+import time
+from typing import List
+
+from edgar_prelim.edgar_submission import Submission, parse_submission, parse_tables, items_from_tables
+from edgar_prelim.edgar_table_cache import TableCache, submission_accession
+
+"""
+Compares extracting the items from the submission text files named on the command line by parsing their tables with
+extracting them from the tables in a table cache, or from a synthetic submission if none are named.
+
+    python bench/table_cache_bench.py [0000000001-19-000001.txt ...]
+"""
+
+
+def synthetic_submissions() -> List[Submission]:
+    """A submission with an earnings release of many long income statements."""
+    rows = ''.join(f'<tr><td>Line item {r}</td><td>{r * 1037:,}</td><td>{r * 1011:,}</td></tr>' for r in range(100))
+    table = ('<p>CONSOLIDATED STATEMENTS OF INCOME (Unaudited)</p><p>(Dollars in thousands)</p><table>'
+             '<tr><td></td><td>March 31, 2019</td><td>March 31, 2018</td></tr>'
+             f'{rows}<tr><td>Net income</td><td>3,210</td><td>3,000</td></tr></table>')
+    accession = '0000000001-19-000001'
+    return [parse_submission(f'<SEC-DOCUMENT>{accession}.txt : 20190415\n'
+                             f'<SEC-HEADER>{accession}.hdr.sgml : 20190415\n'
+                             f'CENTRAL INDEX KEY:\t\t\t0000000001\n</SEC-HEADER>\n'
+                             f'<DOCUMENT>\n<TYPE>EX-99.1\n<SEQUENCE>1\n<FILENAME>ex991.htm\n<TEXT>\n'
+                             f'<html><body>{table * 20}</body></html>\n</TEXT>\n</DOCUMENT>\n</SEC-DOCUMENT>\n')]
+
+
+def benchmark(submissions: List[Submission], repeat: int = 3):
+    with tempfile.TemporaryDirectory() as directory:
+        cache = TableCache(directory)
+        parse_seconds, cache_seconds = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for submission in submissions:
+                items_from_tables(parse_tables(submission, any_items=True))
+            parse_seconds.append(time.perf_counter() - start)
+
+        for submission in submissions:
+            cache.put(submission_accession(submission), parse_tables(submission, any_items=True))
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for submission in submissions:
+                items_from_tables(cache.get(submission_accession(submission)))
+            cache_seconds.append(time.perf_counter() - start)
+
+    print(f'{len(submissions)} submissions: parsed {min(parse_seconds) * 1000:.1f} ms, '
+          f'cached {min(cache_seconds) * 1000:.1f} ms')
+
+
+def read_submissions(paths: List[str]) -> List[Submission]:
+    submissions = []
+    for path in paths:
+        with open(path, encoding='latin-1') as f:
+            submissions.append(parse_submission(f.read()))
+    return submissions
+
+
+if __name__ == '__main__':
+    benchmark(read_submissions(sys.argv[1:]) if len(sys.argv) > 1 else synthetic_submissions())
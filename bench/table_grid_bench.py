@@ -0,0 +1,88 @@
+import sys
+import time
+from typing import List, Iterable
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from edgar_prelim import bs4_util
+from edgar_prelim.bs4_util import read_table_tag, _UnsupportedTable
+
+"""
+Times read_table_tag per table, reading each table directly from the tree and by re-parsing it with pd.read_html, and
+checks that the two agree. Reads the tables of the html documents named on the command line, for example exhibits
+saved from Edgar, or a synthetic set of income statements if none are named.
+
+    python bench/table_grid_bench.py [exhibit.htm ...]
+"""
+
+
+def synthetic_documents(count: int = 20, rows: int = 40) -> List[str]:
+    """Income statement tables laid out like those of bank earnings releases."""
+    def row(i: int) -> str:
+        return (f'<tr style="font-size:8pt"><td style="padding-left:{i % 3}em"><p>Line&nbsp;item {i}</p></td>'
+                f'<td>$</td><td align="right"><font>{i * 1037:,}</font></td><td>&nbsp;</td>'
+                f'<td>$</td><td align="right"><font>({i * 991:,})</font></td><td>&nbsp;</td></tr>')
+
+    header = ('<tr><td colspan="7"><b>Consolidated Statements of Income</b></td></tr>'
+              '<tr><td></td><td colspan="3"><b>Three Months Ended<br/>March 31, 2019</b></td>'
+              '<td colspan="3"><b>Three Months Ended<br/>March 31, 2018</b></td></tr>')
+    table = '<table>' + header + ''.join(row(i) for i in range(rows)) + '</table>'
+    return ['<html><body>' + table * 5 + '</body></html>'] * count
+
+
+def _tables(html: str):
+    return [t for t in BeautifulSoup(html, features='lxml').find_all('table') if not t.find_all('table')]
+
+
+def _unsupported(table, col_count):
+    raise _UnsupportedTable()
+
+
+def _time_tables(documents: Iterable[str], read_grid: bool) -> (List[float], List[pd.DataFrame]):
+    grid = bs4_util._read_table_grid
+    bs4_util._read_table_grid = grid if read_grid else _unsupported
+    try:
+        times, dfs = [], []
+        for html in documents:
+            for table in _tables(html):
+                start = time.perf_counter()
+                dfs.append(read_table_tag(table))
+                times.append(time.perf_counter() - start)
+        return times, dfs
+    finally:
+        bs4_util._read_table_grid = grid
+
+
+def _same(df: pd.DataFrame, expected: pd.DataFrame) -> bool:
+    if df is None or expected is None:
+        return df is expected
+    return df.equals(expected) and list(df.columns) == list(expected.columns) and \
+        all(type(v) is type(e) for v, e in zip(df.values.flat, expected.values.flat))
+
+
+def benchmark(documents: List[str]):
+    grid_times, grid_dfs = _time_tables(documents, read_grid=True)
+    html_times, html_dfs = _time_tables(documents, read_grid=False)
+    mismatches = sum(not _same(df, expected) for df, expected in zip(grid_dfs, html_dfs))
+
+    grid_times, html_times = np.array(grid_times) * 1000, np.array(html_times) * 1000
+    print(f'{len(grid_times)} tables, {mismatches} mismatches')
+    print(f'{"":>12}{"p50 ms":>10}{"p95 ms":>10}{"total ms":>12}')
+    for name, times in [('grid', grid_times), ('read_html', html_times)]:
+        print(f'{name:>12}{np.percentile(times, 50):10.3f}{np.percentile(times, 95):10.3f}{times.sum():12.1f}')
+    print(f'speedup per table: p50 {np.percentile(html_times / grid_times, 50):.1f}x, '
+          f'total {html_times.sum() / grid_times.sum():.1f}x')
+
+
+if __name__ == '__main__':
+    paths = sys.argv[1:]
+    if paths:
+        docs = []
+        for path in paths:
+            with open(path, encoding='latin-1') as f:
+                docs.append(f.read())
+    else:
+        docs = synthetic_documents()
+    benchmark(docs)
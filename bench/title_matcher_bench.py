@@ -0,0 +1,98 @@
+import random
+import sys
+import time
+from typing import List
+
+from bs4 import BeautifulSoup
+
+from edgar_prelim.bs4_util import TextIndex, iter_tag_text
+from edgar_prelim.edgar_title import title_inclusion_patterns, title_exclusion_patterns, title_from_table_tag, \
+    PatternSet
+
+"""
+Measures the throughput of the title patterns, searched one at a time and together as a PatternSet, over the text
+fragments of the html documents named on the command line, or of a synthetic earnings release if none are named, and
+checks that titles found with each agree.
+
+    python bench/title_matcher_bench.py [exhibit.htm ...]
+"""
+
+WORDS = ('the company reported net income of $ million for the quarter compared with a year ago driven by higher '
+         'interest income loan growth and lower provision for credit losses deposits increased total assets were '
+         'billion book value per share was').split()
+
+TITLES = ['Consolidated Statements of Income (Unaudited)', 'Consolidated Balance Sheets', 'Financial Highlights',
+          'Selected Financial Data', 'Non-GAAP Financial Measures', '(Dollars in thousands, except per share data)']
+
+
+def synthetic_document(tables: int = 40, rows: int = 30, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+
+    def paragraph():
+        return '<p>' + ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(10, 60))) + '.</p>'
+
+    def table():
+        return '<table>' + ''.join(
+            f'<tr><td>{" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 4))).capitalize()}</td><td>$</td>'
+            f'<td>{rnd.randint(1, 10 ** 6):,}</td><td>{rnd.randint(1, 10 ** 6):,}</td></tr>'
+            for _ in range(rows)) + '</table>'
+
+    return '<html><body>' + ''.join(
+        ''.join(paragraph() for _ in range(rnd.randint(0, 3))) + f'<p><b>{rnd.choice(TITLES)}</b></p>' + table()
+        for _ in range(tables)) + '</body></html>'
+
+
+def fragment_throughput(fragments: List[str]):
+    patterns = _patterns()
+    pattern_set = PatternSet(patterns, cache_size=0)
+    lowers = [f.lower() for f in fragments]
+
+    start = time.perf_counter()
+    expected = [tuple(i for i, p in enumerate(patterns) if p.search(lower)) for lower in lowers]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # noinspection PyProtectedMember
+    matched = [tuple(pattern_set._search(lower)) for lower in lowers]
+    set_seconds = time.perf_counter() - start
+
+    mismatches = sum(m != e for m, e in zip(matched, expected))
+    print(f'{len(fragments)} fragments, {mismatches} mismatches')
+    print(f'  one at a time: {len(fragments) / loop_seconds:12,.0f} fragments/s')
+    print(f'  PatternSet:    {len(fragments) / set_seconds:12,.0f} fragments/s')
+
+
+def title_throughput(html: str):
+    def titles(inclusion_patterns, exclusion_patterns):
+        soup = BeautifulSoup(html, features='lxml')
+        index = TextIndex(soup)
+        tables = soup.find_all('table')
+        for t in tables:
+            title_from_table_tag(t, index=index)
+        start = time.perf_counter()
+        res = [title_from_table_tag(t, '', inclusion_patterns, exclusion_patterns, index=index) for t in tables]
+        return res, time.perf_counter() - start
+
+    expected, loop_seconds = titles(list(title_inclusion_patterns), tuple(title_exclusion_patterns))
+    found, set_seconds = titles(title_inclusion_patterns, title_exclusion_patterns)
+    print(f'{len(found)} tables, {sum(f != e for f, e in zip(found, expected))} title mismatches')
+    print(f'  one at a time: {len(found) / loop_seconds:12,.0f} tables/s')
+    print(f'  PatternSet:    {len(found) / set_seconds:12,.0f} tables/s')
+
+
+def _patterns():
+    return [p.pattern for p in title_inclusion_patterns if not p.inclusions]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        docs = []
+        for path in sys.argv[1:]:
+            with open(path, encoding='latin-1') as f:
+                docs.append(f.read())
+    else:
+        docs = [synthetic_document()]
+
+    fragment_throughput([txt for doc in docs for txt in iter_tag_text(BeautifulSoup(doc, features='lxml'))])
+    for doc in docs:
+        title_throughput(doc)
@@ -1,20 +1,42 @@
 import re
 from functools import reduce
 from itertools import chain, takewhile
-from typing import Iterator, Optional, Iterable, Pattern, Tuple
+from typing import Iterator, Optional, Iterable, Pattern, Tuple, List
 
 import numpy as np
 import pandas as pd
 import unicodedata
 from bs4 import Tag, NavigableString
 
+from edgar_prelim.edgar_re import PatternSet
 from edgar_prelim.func_util import head_option
 
 
+# The whitespace that pd.read_html collapses in the text of a cell.
+_RE_CELL_WHITESPACE = re.compile(r'[\r\n]+|\s{2,}')
+
+# The cell values from which pd.read_html strips thousands separators are those without any other characters.
+_RE_NON_NUMERIC = re.compile(r'[^-^0-9^,^.]+')
+
+# The cell values that pd.read_html reads as NaN.
+_NA_VALUES = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', 'N/A',
+                        'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null'])
+
+# Tags whose content is not pretty printed or not parsed as html, for which the text of a cell is not simply its
+# strings.
+_RAW_TEXT_TAGS = frozenset(['pre', 'textarea', 'listing', 'plaintext', 'xmp', 'script', 'style', 'template', 'iframe',
+                            'noembed', 'noframes', 'noscript', 'title'])
+
+
+class _UnsupportedTable(Exception):
+    """Raised by _read_table_grid for a table whose structure it can't read exactly as pd.read_html does."""
+
+
 def read_table_tag(table: Tag) -> Optional[pd.DataFrame]:
     """
-    Wrapper around pd.read_html that attempts to compensate for certain oddities in the implementation and the
-    html.
+    Reads a table tag into a DataFrame of str, compensating for certain oddities in the html. Most tables are read
+    directly from the tag by _read_table_grid. Tables with an unusual structure are read by pd.read_html, with which
+    the two agree exactly.
 
     :param table: a BeautifulSoup Tag object for a table that should not contain nested tables.
     :return: a single table whose values are either str or np.NaN, parsed from the tag.
@@ -34,9 +56,6 @@ def read_table_tag(table: Tag) -> Optional[pd.DataFrame]:
 
         return max(chain((count_columns(r) for r in tag.find_all('tr')), (0,)))
 
-    def reset_table_index(df: pd.DataFrame) -> pd.DataFrame:
-        return df.reset_index() if isinstance(df.index, pd.MultiIndex) or df.index.dtype.type != np.int64 else df
-
     col_count = count_table_columns(table)
     if not col_count:
         return None
@@ -51,21 +70,164 @@ def read_table_tag(table: Tag) -> Optional[pd.DataFrame]:
             if len(cols) == 1 and 'colspan' not in cols[0].attrs:
                 cols[0].attrs['colspan'] = col_count
 
-        # Replace header cells with regular cells.
-        html = table.prettify().replace("<th", "<td").replace("</th", "</td")
         try:
-            # Read the table with all columns as str.
-            df_ls = pd.read_html(html, flavor='html5lib', converters={i: str for i in range(col_count)})
-            df = df_ls[0] if df_ls else None
-        except IndexError:
-            # Sometimes we can't anticipate the number of columns, so parse the table, remove any index and set to str.
-            df_ls = pd.read_html(html, flavor='html5lib')
-            df = df_ls[0].pipe(reset_table_index).astype(str).replace('nan', np.NaN) if df_ls else None
+            df = _read_table_grid(table, col_count)
+        except _UnsupportedTable:
+            df = _read_table_html(table, col_count)
 
         table.df = df
         return df
 
 
+def _read_table_html(table: Tag, col_count: int) -> Optional[pd.DataFrame]:
+    """Reads the table by re-parsing its html with pd.read_html."""
+
+    def reset_table_index(df: pd.DataFrame) -> pd.DataFrame:
+        return df.reset_index() if isinstance(df.index, pd.MultiIndex) or df.index.dtype.type != np.int64 else df
+
+    # Replace header cells with regular cells.
+    html = table.prettify().replace("<th", "<td").replace("</th", "</td")
+    try:
+        # Read the table with all columns as str.
+        df_ls = pd.read_html(html, flavor='html5lib', converters={i: str for i in range(col_count)})
+        return df_ls[0] if df_ls else None
+    except IndexError:
+        # Sometimes we can't anticipate the number of columns, so parse the table, remove any index and set to str.
+        df_ls = pd.read_html(html, flavor='html5lib')
+        return df_ls[0].pipe(reset_table_index).astype(str).replace('nan', np.NaN) if df_ls else None
+
+
+def _is_displayed(tag: Tag) -> bool:
+    return not re.search(r'display:\s*none', tag.get('style', ''))
+
+
+def _table_rows(table: Tag) -> Iterator[Tag]:
+    """The rows of a table whose rows are its children or the children of its tbody children."""
+    for child in table.children:
+        if type(child) is Tag:
+            if child.name == 'tr':
+                yield child
+            elif child.name == 'tbody' and _is_displayed(child):
+                for grandchild in child.children:
+                    if type(grandchild) is Tag and grandchild.name == 'tr':
+                        yield grandchild
+                    elif type(grandchild) is Tag or type(grandchild) is NavigableString and grandchild.strip():
+                        raise _UnsupportedTable()
+            else:
+                raise _UnsupportedTable()
+        elif type(child) is NavigableString and child.strip():
+            raise _UnsupportedTable()
+
+
+def _cell_text(cell: Tag) -> str:
+    """
+    The text of a cell as pd.read_html reads it from the prettified table: the strings of the cell, each stripped and
+    with its inner whitespace collapsed, joined by the two spaces that their line breaks and indentation collapse to.
+    """
+    texts = []
+    for node in cell.descendants:
+        if type(node) is NavigableString:
+            text = node.strip()
+            if text:
+                texts.append(_RE_CELL_WHITESPACE.sub(' ', text))
+        elif type(node) is Tag:
+            # Besides nested cells, any tag whose name starts with 'th' would be renamed by _read_table_html.
+            if node.name in _RAW_TEXT_TAGS or node.name in ('td', 'tr') or node.name.startswith('th') or \
+                    not _is_displayed(node):
+                raise _UnsupportedTable()
+    return '  '.join(texts)
+
+
+def _read_table_grid(table: Tag, col_count: int) -> Optional[pd.DataFrame]:
+    """
+    Reads a table directly from the tag, in a single walk of its rows and cells, into the same DataFrame that
+    _read_table_html produces. Cells spanning multiple columns or rows are copied into each, as pd.read_html does.
+    Raises _UnsupportedTable if the table has a structure for which the two might differ: a thead, tfoot or other
+    element besides rows and cells, a leading empty row, elements hidden with display:none, or cells in which text is
+    not parsed as html.
+    """
+    if 'display:none' in table.get('style', '').replace(' ', ''):
+        raise _UnsupportedTable()
+
+    all_texts = []
+    remainder = []  # list of (index, text, rowspan)
+    for tr in _table_rows(table):
+        if not _is_displayed(tr):
+            raise _UnsupportedTable()
+
+        texts = []
+        next_remainder = []
+        index = 0
+        for td in tr.children:
+            if type(td) is not Tag:
+                if type(td) is NavigableString and td.strip():
+                    raise _UnsupportedTable()
+                continue
+            if td.name not in ('td', 'th') or not _is_displayed(td):
+                raise _UnsupportedTable()
+
+            # Cells spanning rows from previous rows that come before this cell.
+            while remainder and remainder[0][0] <= index:
+                prev_i, prev_text, prev_rowspan = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+                index += 1
+
+            text = _cell_text(td)
+            rowspan = int(td.get('rowspan') or 1)
+            colspan = int(td.get('colspan') or 1)
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+
+        for prev_i, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+
+        if not all_texts and not texts:
+            # pd.read_html would read a leading row without cells as the header.
+            raise _UnsupportedTable()
+
+        all_texts.append(texts)
+        remainder = next_remainder
+
+    # Rows that only appear because a previous row spans them.
+    while remainder:
+        next_remainder = []
+        texts = []
+        for prev_i, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+        all_texts.append(texts)
+        remainder = next_remainder
+
+    n_cols = max(chain((len(texts) for texts in all_texts), (0,)))
+    if n_cols != col_count:
+        # pd.read_html would infer the types of the columns it wasn't told to read as str, or fail.
+        raise _UnsupportedTable()
+
+    if n_cols == 1:
+        # pd.read_html skips blank lines, which are only recognized in a table with a single column.
+        all_texts = [texts for texts in all_texts if texts and texts[0]]
+    if not all_texts:
+        return None
+
+    grid = np.empty((len(all_texts), n_cols), dtype=object)
+    grid.fill(np.NaN)
+    for i, texts in enumerate(all_texts):
+        for j, text in enumerate(texts):
+            if ',' in text and not _RE_NON_NUMERIC.search(text):
+                text = text.replace(',', '')
+            if text not in _NA_VALUES:
+                grid[i, j] = text
+    return pd.DataFrame(grid)
+
+
 def iter_tag_text(tag: Tag) -> Iterator[str]:
     """
     Iterates over the text components of an html tag, using read_table_tag for table tags to take advantage of
@@ -85,6 +247,101 @@ def iter_tag_text(tag: Tag) -> Iterator[str]:
             yield from (str(tab.iloc[row, 0]) for row in range(0, tab.shape[0]))
 
 
+class TextIndex(object):
+    """
+    The text components of a document, as produced by iter_tag_text, laid out once in document order along with their
+    lower case, so that the text of any tag in the document is a span of the index. The title and units searches around
+    each table read their text from the index rather than walking and lower casing the same tags again for every table.
+
+    The rows of a table are read with read_table_tag when a search first reaches the end of the table, as iter_tag_text
+    does, and the strings of the hidden rows that read_table_tag removes are skipped from then on.
+
+    :param root: The root of the document, which should be indexed before its tables are read.
+    """
+
+    def __init__(self, root: Tag) -> None:
+        self.root = root
+        self._texts = []  # The text, or None at the end of a table.
+        self._lower = []
+        self._hidden = []  # The hidden rows containing the text, which read_table_tag may remove.
+        self._tables = []  # The table ending at the position.
+        self._spans = {}  # id(tag) -> (start, end)
+        self._containing_table = set()  # id(tag) of tags that are or contain a table.
+        self._rows = {}  # id(table) -> [(text, lower)]
+        self._build(root)
+
+    def _build(self, root: Tag):
+        table_count = 0
+
+        def enter(tag: Tag, hidden: Tuple[Tag, ...]):
+            if tag.name == 'tr' and 'style' in tag.attrs and re.search(r'visibility:\s*hidden', tag['style']):
+                hidden = hidden + (tag,)
+            stack.append((tag, iter(tag.children), hidden, len(self._texts), table_count))
+
+        stack = []
+        enter(root, ())
+        while stack:
+            tag, children, hidden, start, start_table_count = stack[-1]
+            for c in children:
+                if type(c) is NavigableString:
+                    text = c.strip()
+                    self._append(text, text.lower(), hidden, None)
+                elif type(c) is Tag:
+                    enter(c, hidden)
+                    break
+            else:
+                stack.pop()
+                if tag.name == 'table':
+                    self._append(None, None, (), tag)
+                    table_count += 1
+                if table_count > start_table_count:
+                    self._containing_table.add(id(tag))
+                self._spans[id(tag)] = (start, len(self._texts))
+
+    def _append(self, text: Optional[str], lower: Optional[str], hidden: Tuple[Tag, ...], table: Optional[Tag]):
+        self._texts.append(text)
+        self._lower.append(lower)
+        self._hidden.append(hidden)
+        self._tables.append(table)
+
+    def iter_text(self, tag: Tag) -> Iterator[Tuple[str, str]]:
+        """Iterates over the text components of the tag, as iter_tag_text does, along with their lower case."""
+        span = self._spans.get(id(tag))
+        if span is None:
+            yield from ((txt, txt.lower()) for txt in iter_tag_text(tag))
+            return
+
+        for i in range(*span):
+            table = self._tables[i]
+            if table is not None:
+                yield from self._table_rows(table)
+            elif not self._hidden[i] or all(row.parent is not None for row in self._hidden[i]):
+                yield self._texts[i], self._lower[i]
+
+    def contains_table(self, tag: Tag) -> bool:
+        """Whether the tag is or contains a table."""
+        if id(tag) in self._spans:
+            return id(tag) in self._containing_table
+        else:
+            return tag.name == 'table' or tag.find('table') is not None
+
+    def _table_rows(self, table: Tag) -> List[Tuple[str, str]]:
+        rows = self._rows.get(id(table))
+        if rows is None:
+            tab = read_table_tag(table)
+            texts = (str(tab.iloc[row, 0]) for row in range(0, tab.shape[0])) if tab is not None else ()
+            rows = self._rows[id(table)] = [(txt, txt.lower()) for txt in texts]
+        return rows
+
+
+def _iter_text(tag: Tag, index: Optional[TextIndex]) -> Iterator[Tuple[str, str]]:
+    return index.iter_text(tag) if index is not None else ((txt, txt.lower()) for txt in iter_tag_text(tag))
+
+
+def _contains_table(tag: Tag, index: Optional[TextIndex]) -> bool:
+    return index.contains_table(tag) if index is not None else tag.name == 'table' or tag.find('table') is not None
+
+
 def iter_previous_tags(tag: Tag,
                        max_parents: int = 1e6,
                        max_previous: int = 1e6,
@@ -115,27 +372,32 @@ def iter_previous_tags(tag: Tag,
         yield from iter_previous_tags(tag.parent, max_parents - 1, max_previous, parent_threshold, top_level_tag)
 
 
-def match_tag_text(tag: Tag, patterns: Iterable[Pattern]) -> Iterator[Tuple[str, int]]:
+def match_tag_text(tag: Tag, patterns: Iterable[Pattern], index: TextIndex = None) -> Iterator[Tuple[str, int]]:
     """
     Returns all text parts of tag (as produced by iter_tag_text) that matches at least one of the supplied patterns.
 
     :param tag: the tag whose text components will be searched in the order returned by iter_tag_text.
-    :param patterns: The re.Pattern objects used to match the text components.
+    :param patterns: The re.Pattern objects used to match the text components, searched together if a PatternSet.
+    :param index: If supplied, the TextIndex of the tag's document from which to read its text components.
     :return: an iterator of Tuples, where the first element is the matched text and the second the index of the matched
     pattern.
     """
-    for txt in iter_tag_text(tag):
-        for pattern_idx, pattern in enumerate(patterns):
-            match = re.search(pattern, txt.lower())
-            if match:
-                yield txt, pattern_idx
+    for txt, lower in _iter_text(tag, index):
+        if isinstance(patterns, PatternSet):
+            yield from ((txt, pattern_idx) for pattern_idx in patterns.search(lower))
+        else:
+            for pattern_idx, pattern in enumerate(patterns):
+                match = pattern.search(lower)
+                if match:
+                    yield txt, pattern_idx
 
 
 def find_tag_text_matches(tag_iter: Iterable[Tag],
                           inclusion_patterns: Iterable[Pattern],
                           exclusion_patterns: Iterable[Pattern] = None,
                           max_tables: int = 2,
-                          continue_to_next_table_after_match: str = None) -> Iterator[Optional[Tuple[str, int]]]:
+                          continue_to_next_table_after_match: str = None,
+                          index: TextIndex = None) -> Iterator[Optional[Tuple[str, int]]]:
     """
     Finds all the text components (as produced by iter_tag_text) in the iterable of Tags that is supplied that matches
     the supplied patterns. Includes addition options to tune the search.
@@ -150,27 +412,28 @@ def find_tag_text_matches(tag_iter: Iterable[Tag],
     :param continue_to_next_table_after_match: If not None, if this exact text is encountered, the search will continue
     to the next table and then issue a 'None' to indicate that the search terminated before searching all text
     components.
+    :param index: If supplied, the TextIndex of the tags' document from which to read their text components.
     :return: An iterator of tuples where the first element is the matched text and the second is the index of matched
     pattern. If the search terminated due to one of the above conditions, a None will be yielded as the last element.
     """
     remaining_tables = max_tables
     for tag in tag_iter:
-        if remaining_tables <= 0 and (tag.name == 'table' or tag.find('table') is not None):
+        if remaining_tables <= 0 and _contains_table(tag, index):
             yield None
             return
 
-        if exclusion_patterns and any(match_tag_text(tag, exclusion_patterns)) > 0:
+        if exclusion_patterns and any(match_tag_text(tag, exclusion_patterns, index)) > 0:
             yield None
             return
 
-        yield from match_tag_text(tag, inclusion_patterns)
+        yield from match_tag_text(tag, inclusion_patterns, index)
 
         # If until_match is specified, don't continue past its location to avoid matching an earlier table.
         if continue_to_next_table_after_match and \
-                any(txt == continue_to_next_table_after_match for txt in iter_tag_text(tag)):
+                any(txt == continue_to_next_table_after_match for txt, _ in _iter_text(tag, index)):
             remaining_tables = 0
 
-        if tag.name == 'table' or tag.find('table') is not None:
+        if _contains_table(tag, index):
             remaining_tables -= 1
             if remaining_tables <= 0:
                 yield None
@@ -184,7 +447,8 @@ def match_table_title_text(table: Tag,
                            continue_to_next_table_after_match: str = None,
                            max_previous: int = 15,
                            max_parents: int = 50,
-                           max_tables: int = 2) -> Optional[Tuple[str, int]]:
+                           max_tables: int = 2,
+                           index: TextIndex = None) -> Optional[Tuple[str, int]]:
     """
     Attempt to locate a best guess at the title for a table tag by first matching the text components inside the table
     and then the text inside tags previous to the table. The inclusion_patterns are supplied in their rank order and
@@ -201,6 +465,7 @@ def match_table_title_text(table: Tag,
     :param max_parents: If the table is nested within another tag, the number of levels the search will go up until
     it encounters previous siblings.
     :param max_tables: The max number of tables (or tags containing tables) the search will encounter before returning
+    :param index: If supplied, the TextIndex of the table's document from which to read the text of the tags searched.
     :return: A guess for the table's title, or None if no matches were found.
     """
     table_matches = find_tag_text_matches(
@@ -208,14 +473,16 @@ def match_table_title_text(table: Tag,
         inclusion_patterns,
         exclusion_patterns,
         max_tables=2,
-        continue_to_next_table_after_match=continue_to_next_table_after_match)
+        continue_to_next_table_after_match=continue_to_next_table_after_match,
+        index=index)
 
     prev_matches = find_tag_text_matches(
         iter_previous_tags(table, max_parents=max_parents, max_previous=max_previous, parent_threshold=2),
         inclusion_patterns,
         exclusion_patterns,
         max_tables=max_tables,
-        continue_to_next_table_after_match=continue_to_next_table_after_match
+        continue_to_next_table_after_match=continue_to_next_table_after_match,
+        index=index
     )
 
     all_matches = takewhile(lambda x: x is not None, chain(table_matches, prev_matches))
@@ -0,0 +1,158 @@
+import fcntl
+import json
+import mmap
+import os
+import threading
+import zlib
+from collections import namedtuple
+from datetime import date
+from pathlib import Path
+from typing import Optional, Union, List
+
+from sqlalchemy import select, and_
+from sqlalchemy.engine import Connection
+
+from edgar_prelim.edgar_db import prelim_engine, submission_archive_table, upgrade_schema
+from edgar_prelim.logging_config import init_logging
+
+logger = init_logging(__name__)
+
+"""
+A durable local archive of the submission text files downloaded from Edgar, so that history can be extracted again
+without downloading it again. Each submission is compressed into a gzip member of its own, appended to its CIK's
+archive file, so that an archive file as a whole is an ordinary gzip file. The submission_archive table indexes each
+member by accession number, with the offsets of the header and documents within its text. Members are read through a
+memory map of the archive file, handing zlib the slice of the map without copying it.
+
+Setting EDGAR_ARCHIVE_DIR keeps an archive in that directory, from which load_submission reads the submissions that it
+has, archiving the others as they are downloaded.
+"""
+
+# An archived submission: the member holding it, the encoding of its text, and the (start, end) character offsets in
+# that text of its header and the (type, filename, start, end) of each of its html documents.
+ArchiveEntry = namedtuple('ArchiveEntry', ['accession', 'cik', 'filing_date', 'path', 'offset', 'length', 'encoding',
+                                           'header', 'documents'])
+
+
+def _entry_from_row(row) -> ArchiveEntry:
+    return ArchiveEntry(
+        accession=row.accession,
+        cik=row.cik,
+        filing_date=row.filing_date,
+        path=row.path,
+        offset=int(row.offset),
+        length=int(row.length),
+        encoding=row.encoding,
+        header=(int(row.header_start), int(row.header_end)),
+        documents=[tuple(doc) for doc in json.loads(row.documents)])
+
+
+class SubmissionArchive(object):
+    """
+    Archives submissions in 'directory', indexed in the submission_archive table of 'conn'. Archives are safe to share
+    between threads, and between processes that use the same directory and database.
+    """
+
+    def __init__(self, directory: Union[str, Path], conn: Connection = prelim_engine, compress_level: int = 6) -> None:
+        self.directory = Path(directory)
+        self.conn = conn
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._maps = {}
+        self._upgraded = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _index(self) -> Connection:
+        if not self._upgraded:
+            upgrade_schema(self.conn)
+            self._upgraded = True
+        return self.conn
+
+    def entry(self, accession: str) -> Optional[ArchiveEntry]:
+        """Returns the entry of the submission with the accession number, or None if it isn't archived."""
+        t = submission_archive_table
+        row = self._index().execute(select([t]).where(t.c.accession == accession)).first()
+        return None if row is None else _entry_from_row(row)
+
+    def entries(self, cik: str = None, start: date = None, end: date = None) -> List[ArchiveEntry]:
+        """Returns the entries of the archived submissions, of a CIK and filed between start and end if supplied, in
+        the order of their CIKs and their filing dates."""
+        t = submission_archive_table
+        clauses = [clause for clause in [
+            t.c.cik == cik if cik is not None else None,
+            t.c.filing_date >= start if start is not None else None,
+            t.c.filing_date < end if end is not None else None,
+        ] if clause is not None]
+        query = select([t]).where(and_(*clauses)).order_by(t.c.cik, t.c.filing_date, t.c.offset)
+        return [_entry_from_row(row) for row in self._index().execute(query)]
+
+    def read(self, entry: ArchiveEntry) -> bytes:
+        """Returns the content of an archived submission."""
+        end = entry.offset + entry.length
+        with self._lock:
+            mapped = self._maps.get(entry.path)
+            if mapped is None or len(mapped) < end:
+                # The file has grown since it was mapped. The old map is closed once no reader is using it.
+                with open(self.directory / entry.path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[entry.path] = mapped
+
+        with memoryview(mapped)[entry.offset:end] as member:
+            return zlib.decompress(member, wbits=31)
+
+    def put(self, entry: ArchiveEntry, content: bytes) -> ArchiveEntry:
+        """
+        Appends the content of a submission to its CIK's archive file and indexes it.
+        :param entry: The entry of the submission, whose path, offset and length are ignored.
+        :return: The entry as archived, or as it was already archived, if it was.
+        """
+        compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, 31)
+        member = compressor.compress(content) + compressor.flush()
+
+        path = f'{entry.cik[-2:]}/{entry.cik}.gz'
+        (self.directory / path).parent.mkdir(exist_ok=True)
+        with open(self.directory / path, 'ab') as f:
+            # Appends to the file, and the check that the submission isn't already in it, are serialized among all the
+            # threads and processes archiving the CIK.
+            fcntl.flock(f, fcntl.LOCK_EX)
+            existing = self.entry(entry.accession)
+            if existing is not None:
+                return existing
+
+            offset = f.seek(0, os.SEEK_END)
+            f.write(member)
+            f.flush()
+            os.fsync(f.fileno())
+            entry = entry._replace(path=path, offset=offset, length=len(member))
+            self._index().execute(submission_archive_table.insert().values(
+                accession=entry.accession,
+                cik=entry.cik,
+                filing_date=entry.filing_date,
+                path=entry.path,
+                offset=entry.offset,
+                length=entry.length,
+                encoding=entry.encoding,
+                header_start=entry.header[0],
+                header_end=entry.header[1],
+                documents=json.dumps([list(doc) for doc in entry.documents])))
+
+        logger.debug(f"Archived {entry.accession} in {path} at {offset}, {len(content)} bytes as {len(member)}.")
+        return entry
+
+
+def _archive_from_environment() -> Optional[SubmissionArchive]:
+    archive_dir = os.environ.get('EDGAR_ARCHIVE_DIR')
+    return SubmissionArchive(archive_dir) if archive_dir else None
+
+
+_submission_archive = _archive_from_environment()
+
+
+def set_submission_archive(archive: Optional[SubmissionArchive]):
+    """Replaces the archive used by load_submission. None disables archiving."""
+    global _submission_archive
+    _submission_archive = archive
+
+
+def get_submission_archive() -> Optional[SubmissionArchive]:
+    return _submission_archive
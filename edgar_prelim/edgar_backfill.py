@@ -0,0 +1,182 @@
+import sys
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, List, Dict, Optional, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import and_, between, or_, select
+from sqlalchemy.engine import Connection
+
+from edgar_prelim.edgar_db import *
+from edgar_prelim.edgar_fetch import prefetch_filings
+from edgar_prelim.edgar_fingerprint import pattern_version, register_pattern_version, ITEMS
+from edgar_prelim.edgar_http import edgar_session
+from edgar_prelim.edgar_items import PrelimItem, prelim_items
+from edgar_prelim.edgar_jobs import JobScheduler, JobResult, JobProgress
+from edgar_prelim.edgar_load import extract_prelim_outcome_from_submission, query_changes_since
+from edgar_prelim.edgar_query import Filing
+from edgar_prelim.logging_config import init_logging
+
+logger = init_logging(__name__)
+
+"""
+Adds new items to the statements already loaded, without loading every CIK again. Once an item is added to
+prelim_items, backfill_items extracts just that item from each filing already identified as a prelim, and appends its
+rows to the filing's statement. The items already in the statement, including those overridden, are left as they are.
+The tables are parsed for any items, as a load parses them, and items are extracted from them independently of each
+other, so the rows are those a full reload would have produced.
+
+Once a filing has been backfilled, it and its statement are marked with the pattern_version of all of the items, as if
+it had been loaded with them, so that backfilling the items again skips it whether or not they were found. That holds
+only if the items are all that changed since the version it was loaded with. The filings whose other patterns changed
+too keep their version, and are backfilled again each time until edgar_reextract extracts them with the current
+patterns.
+
+The submissions are read from the submission archive when it has them, and their tables from the table cache, so only
+the filings that neither has are downloaded. The filings that had no items are left to edgar_reextract, which considers
+them because their pattern_version differs.
+
+    python -m edgar_prelim.edgar_backfill 'total deposits' 'total assets'
+"""
+
+
+def _filing_key(row) -> Tuple[str, date, str, str]:
+    return row.cik, pd.Timestamp(row.filing_date).date(), row.filing_type, row.filing_href
+
+
+def _between(table, start: date = None, end: date = None):
+    return between(table.c.filing_date, start if start else PRELIM_START, end if end else EOT)
+
+
+def query_ciks_with_prelims(conn: Connection = prelim_engine) -> List[str]:
+    t = prelim_filing_table
+    return [cik for (cik,) in conn.execute(
+        select([t.c.cik]).where(t.c.is_prelim == True).distinct().order_by(t.c.cik))]
+
+
+def _query_prelim_filings(cik: str, version: str, start: date = None, end: date = None,
+                          conn: Connection = prelim_engine) -> pd.DataFrame:
+    """The CIK's filings that were identified as prelims by a version of the patterns other than 'version', in the
+    order of their filing dates."""
+    t = prelim_filing_table
+    return pd.read_sql(t.select().where(and_(t.c.cik == cik, t.c.is_prelim == True, _between(t, start, end),
+                                             or_(t.c.pattern_version == None, t.c.pattern_version != version)))
+                       .order_by(t.c.filing_date), conn)
+
+
+def _only_items_changed(changed: Optional[Dict[str, list]], names: Set[str]) -> bool:
+    """Whether the changed components (see changed_components) are those of the named items alone."""
+    return changed is not None and set(changed) <= {ITEMS} and \
+        all(c.key.rpartition('/')[0] in names for c in changed.get(ITEMS, []))
+
+
+def _query_statement_items(cik: str, start: date = None, end: date = None,
+                           conn: Connection = prelim_engine) -> Dict[Tuple[str, date, str, str], Set[str]]:
+    """The items in the statement of each of the CIK's filings."""
+    t = prelim_statement_table
+    df = pd.read_sql(select([t.c.cik, t.c.filing_date, t.c.filing_type, t.c.filing_href, t.c.item])
+                     .where(and_(t.c.cik == cik, _between(t, start, end))), conn)
+    res = defaultdict(set)
+    for row in df.itertuples(index=False):
+        res[_filing_key(row)].add(row.item)
+    return res
+
+
+def _of_filing(table, cik: str, filing: Filing):
+    return and_(table.c.cik == cik, table.c.filing_date == filing.date, table.c.filing_type == filing.type,
+                table.c.filing_href == filing.href)
+
+
+def _append_items(cik: str, filing: Filing, item_df: pd.DataFrame, version: Optional[str], conn: Connection) -> int:
+    """
+    Appends the items to the filing's statement that aren't already in it, and returns how many were.
+    :param version: If supplied, the filing and the rest of its statement, except for the overridden items, are marked
+    as produced by this version.
+    """
+    t = prelim_statement_table
+    with conn.begin() as c:
+        existing = {item for (item,) in c.execute(select([t.c.item]).where(_of_filing(t, cik, filing)))}
+        new_df = item_df[~item_df.item.isin(existing)] if not item_df.empty else item_df
+        if not new_df.empty:
+            new_df.to_sql(t.name, c, if_exists='append', index=False)
+        if version is not None:
+            c.execute(t.update().where(and_(_of_filing(t, cik, filing), t.c.is_overridden == False)).values(
+                pattern_version=version))
+            c.execute(prelim_filing_table.update().where(_of_filing(prelim_filing_table, cik, filing)).values(
+                pattern_version=version))
+        return len(new_df)
+
+
+def backfill_cik(cik: str, new_items: List[PrelimItem], items: List[PrelimItem] = None, start: date = None,
+                 end: date = None, prefetch_size: int = 4, conn: Connection = prelim_engine) -> JobResult:
+    """
+    Extracts the new items from the CIK's prelim filings whose statements don't have them all, and appends them. The
+    filings that were produced by the current version of the patterns were extracted with the new items already, and
+    are skipped. Filings that fail are logged and skipped, so that running the backfill again tries them again.
+    :param new_items: The items to add.
+    :param items: All of the items, including the new ones, whose pattern_version the new rows are marked with.
+    """
+    names = {item.name for item in new_items}
+    version = pattern_version(items)
+    statement_items = _query_statement_items(cik, start, end, conn)
+    rows = [row for row in _query_prelim_filings(cik, version, start, end, conn).itertuples(index=False)
+            if not names <= statement_items[_filing_key(row)]]
+    changes = query_changes_since([row.pattern_version for row in rows if row.pattern_version], items, conn)
+    versions = {}
+    pending = []
+    for row in rows:
+        filing = Filing(date=pd.Timestamp(row.filing_date).date(), type=row.filing_type, href=row.filing_href)
+        versions[filing] = version if _only_items_changed(changes.get(row.pattern_version), names) else None
+        pending.append(filing)
+
+    appended = 0
+    for filing, fetched, error in prefetch_filings(pending, prefetch_size):
+        try:
+            if error is not None:
+                raise error
+            item_df = extract_prelim_outcome_from_submission(cik, filing, *fetched, new_items)[0] \
+                if fetched is not None else pd.DataFrame()
+        except Exception as e:
+            logger.error(f"Failure backfilling {filing}: {e}")
+            continue
+
+        appended += _append_items(cik, filing, item_df.assign(pattern_version=version), versions[filing], conn)
+
+    logger.info(f"Backfilled {appended} items into {len(pending)} statements for {cik}.")
+    return JobResult(filings=len(pending), loaded=appended > 0)
+
+
+def backfill_items(names: Iterable[str], ciks: Iterable[str] = None, start: date = None, end: date = None,
+                   items: List[PrelimItem] = None, workers: int = 4, job: str = None,
+                   conn: Connection = prelim_engine) -> JobProgress:
+    """
+    Adds the named items to the statements of the prelim filings already loaded. The CIKs are backfilled 'workers' at
+    a time, and the progress is kept in the prelim_job table, so a backfill that is stopped resumes with the CIKs it
+    hadn't finished. See JobScheduler.
+    :param names: The names of the items to add.
+    :param ciks: The CIKs to backfill, or None for all of those with prelims.
+    :param start: If supplied, only filings filed on or after start are backfilled.
+    :param end: If supplied, only filings filed on or before end are backfilled.
+    :param items: All of the items, prelim_items by default, among which are the named ones.
+    :param job: The name of the job, by default one naming the items.
+    """
+    items = items if items is not None else prelim_items
+    names = sorted(set(names))
+    new_items = [item for item in items if item.name in names]
+    unknown = set(names) - {item.name for item in new_items}
+    if unknown:
+        raise ValueError(f"Unknown items: {', '.join(sorted(unknown))}.")
+
+    upgrade_schema(conn)
+    register_pattern_version(items, conn)
+    ciks = list(ciks) if ciks is not None else query_ciks_with_prelims(conn)
+    logger.info(f"Backfilling {', '.join(names)} for {len(ciks)} CIKs.")
+
+    with edgar_session():
+        scheduler = JobScheduler(job or f"backfill_items: {', '.join(names)}"[:255], workers=workers, conn=conn)
+        scheduler.schedule(ciks)
+        return scheduler.run(lambda cik: backfill_cik(cik, new_items, items, start, end, conn=conn))
+
+
+if __name__ == '__main__':
+    print(backfill_items(sys.argv[1:]))
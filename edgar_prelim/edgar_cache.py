@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Mapping, Union, Tuple, BinaryIO, Iterator
+
+"""
+A content-addressed, on-disk cache for responses from the Edgar system, keyed by url and query parameters.
+"""
+
+# The parts of an http response that are needed to replay it.
+CachedResponse = namedtuple('CachedResponse', ['url', 'status_code', 'encoding', 'content'])
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+class CacheMissError(Exception):
+    """Raised by a replay-only cache when no response has been recorded for a request."""
+
+    def __init__(self, url: str, params: Mapping = None) -> None:
+        super().__init__(f"No cached response for {url} {dict(params) if params else ''}".strip())
+        self.url = url
+        self.params = params
+
+
+def cache_key(url: str, params: Mapping = None) -> str:
+    """Returns a stable digest for the url and query parameters, independent of parameter order."""
+    canonical = json.dumps([url, sorted((str(k), str(v)) for k, v in (params or {}).items())])
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class DiskResponseCache(object):
+    """
+    Stores each response gzip compressed in its own file named by the digest of the request. When the total size of
+    the cache exceeds max_bytes, the least recently used entries are evicted. Caches are safe to share between
+    threads.
+    :param replay_only: If True, requests without a cached response raise a CacheMissError, and nothing is recorded.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES,
+                 replay_only: bool = False) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.replay_only = replay_only
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._size = sum(p.stat().st_size for p in self._entries())
+
+    def _entries(self):
+        return self.directory.glob('*/*.gz')
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f'{key}.gz'
+
+    def get(self, url: str, params: Mapping = None) -> Optional[CachedResponse]:
+        """Returns the cached response for the request, or None if there is none."""
+        opened = self.open(url, params)
+        if opened is None:
+            return None
+
+        cached, body = opened
+        with body:
+            return cached._replace(content=body.read())
+
+    def open(self, url: str, params: Mapping = None) -> Optional[Tuple[CachedResponse, BinaryIO]]:
+        """Like get, but returns the content of the cached response as a readable stream instead of in the tuple."""
+        path = self._path(cache_key(url, params))
+        try:
+            body = gzip.open(path, 'rb')
+            os.utime(path)
+        except FileNotFoundError:
+            if self.replay_only:
+                raise CacheMissError(url, params)
+            return None
+
+        meta = json.loads(body.readline().decode('utf-8'))
+        return CachedResponse(meta['url'], meta['status_code'], meta['encoding'], None), body
+
+    def put(self, url: str, params: Mapping, response: CachedResponse):
+        """Records the response for the request."""
+        with self.writer(url, params, response) as f:
+            f.write(response.content)
+
+    @contextmanager
+    def writer(self, url: str, params: Mapping, response: CachedResponse) -> Iterator[BinaryIO]:
+        """Records the response for the request with the content written to the yielded stream, which lets a
+        response be recorded as it is read. Nothing is recorded if the block raises."""
+        if self.replay_only:
+            with open(os.devnull, 'wb') as f:
+                yield f
+            return
+
+        path = self._path(cache_key(url, params))
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        meta = {'url': response.url, 'status_code': response.status_code, 'encoding': response.encoding}
+        try:
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(json.dumps(meta).encode('utf-8') + b'\n')
+                yield f
+        except BaseException:
+            try:
+                tmp_path.unlink()
+            except FileNotFoundError:
+                pass
+            raise
+
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            self._size += path.stat().st_size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache fits within max_bytes."""
+        entries = sorted(((p.stat(), p) for p in self._entries()), key=lambda x: x[0].st_mtime)
+        self._size = sum(st.st_size for st, _ in entries)
+        for st, p in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            self._size -= st.st_size
+
+    def responses(self) -> Iterator[CachedResponse]:
+        """Reads back every cached response, in no particular order."""
+        for path in self._entries():
+            try:
+                body = gzip.open(path, 'rb')
+            except FileNotFoundError:
+                continue
+
+            with body:
+                meta = json.loads(body.readline().decode('utf-8'))
+                yield CachedResponse(meta['url'], meta['status_code'], meta['encoding'], body.read())
+
+    def clear(self):
+        with self._lock:
+            for p in self._entries():
+                p.unlink()
+            self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
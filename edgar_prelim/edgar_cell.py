@@ -0,0 +1,172 @@
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from edgar_prelim.edgar_fiscal_period import header_part_pattern, parse_fiscal_period, is_excluded_fiscal_period
+from edgar_prelim.edgar_re import *
+from edgar_prelim.edgar_title import is_units
+
+"""
+Classifies the text of table cells. The header and row predicates of table cleaning and splitting ask the same
+questions of the same cells many times over, so each distinct cell is classified once, into a bitmask of the
+properties below, and the classification is kept in a bounded cache.
+"""
+
+# The properties of a cell: whether it could be part of a header (is_header_part), looks like a row's value, has units
+# or unaudited, is a fiscal period by itself (parse_fiscal_period), or is excluded from being part of one.
+CELL_HEADER_PART = 1
+CELL_ROW_PART = 2
+CELL_UNITS = 4
+CELL_UNAUDITED = 8
+CELL_FISCAL_PERIOD = 16
+CELL_FISCAL_PERIOD_EXCLUSION = 32
+
+_RE_ROW_VALUE = re.compile(r'^[$(]?\s*[\d,]+\.?\d*[)%]*$')
+_RE_UNAUDITED_EXACT = re.compile(UNAUDITED_EXACT, flags=re.IGNORECASE)
+
+
+def classify_cell(cell: str) -> int:
+    """
+    Returns the bitmask of the properties of a cell. Every property depends only on the lowercased text of the cell,
+    which is what is cached.
+    :param cell: The cell, which is converted to a string.
+    """
+    return _classify_lower(str(cell).lower())
+
+
+@lru_cache(maxsize=2 ** 16)
+def _classify_lower(lower: str) -> int:
+    prepped = lower.strip()
+    fiscal_period = parse_fiscal_period(lower) is not None
+
+    bits = 0
+    if fiscal_period:
+        bits |= CELL_FISCAL_PERIOD
+    if fiscal_period or header_part_pattern.search(prepped) is not None:
+        bits |= CELL_HEADER_PART
+    if _is_row_part(prepped):
+        bits |= CELL_ROW_PART
+    if is_units(lower):
+        bits |= CELL_UNITS
+    if _RE_UNAUDITED_EXACT.search(lower) is not None:
+        bits |= CELL_UNAUDITED
+    if is_excluded_fiscal_period(lower):
+        bits |= CELL_FISCAL_PERIOD_EXCLUSION
+    return bits
+
+
+def classify_cells(cells: np.ndarray) -> np.ndarray:
+    """
+    Returns the bitmask of the properties of each cell of a column or table, classifying each distinct cell once. Null
+    cells have no properties.
+    """
+    cells = np.asarray(cells, dtype=object)
+    codes, uniques = pd.factorize(cells.ravel())
+    if len(uniques) == 0:
+        return np.zeros(cells.shape, dtype=int)
+
+    bits = np.array([classify_cell(cell) for cell in uniques], dtype=int)
+    return np.where(codes >= 0, bits.take(codes), 0).reshape(cells.shape)
+
+
+def is_header_cell(cell: str) -> bool:
+    """The same as is_header_part."""
+    return bool(classify_cell(cell) & CELL_HEADER_PART)
+
+
+def is_fiscal_period_cell(cell: str, prefix: str = None) -> bool:
+    """The same as parse_fiscal_period(cell, prefix) is not None."""
+    bits = classify_cell(cell)
+    if bits & CELL_FISCAL_PERIOD_EXCLUSION:
+        return False
+
+    prefix_bits = classify_cell(prefix) if prefix else 0
+    if prefix_bits & CELL_FISCAL_PERIOD_EXCLUSION:
+        return False
+    elif bits & CELL_FISCAL_PERIOD:
+        return True
+    elif prefix_bits & CELL_HEADER_PART:
+        return bool(classify_cell(prefix + ' ' + cell) & CELL_FISCAL_PERIOD)
+    else:
+        return False
+
+
+def has_fiscal_period(row: pd.Series) -> bool:
+    """
+    Returns true if any value in this row is a fiscal period (starting at index 1, with index 0 being a possible
+    prefix).
+    """
+    prefix = str(row.iloc[0])
+    return any(is_fiscal_period_cell(str(cell), prefix) for cell in row.iloc[1:])
+
+
+def _is_row_part(prepped: str) -> bool:
+    """Returns true if the cell can reasonably be inferred to be from a row values."""
+    if _RE_ROW_VALUE.match(prepped) is not None:
+        value = parse_item_value(prepped)
+        return value is not None and not ((2000 <= value <= 2050) or (28 <= value <= 31))
+    else:
+        return is_hyphen(prepped)
+
+
+def parse_item_value(src_value: str) -> Optional[float]:
+    """
+    Does its darndest to extract a value from a table cell. Hyphens are considered zero. Values in parent (or with at
+    least a leading parent are negative."""
+    value = re.sub(r'[$%,*]', '', src_value)
+    if is_hyphen(value):
+        return 0.
+
+    if value == '' or re.search(rf'\d', value) is None:
+        return None
+
+    signum = 1.0
+    value = re.sub(r'\s+', '', value)
+    neg = re.match(r'\(([\d.]+)\)?', value)
+    if neg:
+        value = neg.group(1)
+        signum = -1.0
+    else:
+        pos = re.search(r'([\d.]+)', value)
+        if pos:
+            value = pos.group(1)
+
+    try:
+        return signum * float(value)
+    except ValueError:
+        return np.nan
+
+
+def parse_item_values(cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    parse_item_value of each cell of a column or table at once, parsing each distinct cell once.
+    :param cells: The cells. Those that aren't strings have no value.
+    :return: The values of the cells as float64, in their shape, and the mask of the cells that have a value. A cell
+    without a value is nan, as is one whose value isn't a number.
+    """
+    cells = np.asarray(cells, dtype=object)
+    codes, uniques = pd.factorize(cells.ravel())
+    parsed = [_parse_item_value(cell) for cell in uniques]
+    unique_values = np.array([np.nan if value is None else value for value in parsed] + [np.nan], dtype=np.float64)
+    unique_valid = np.array([value is not None for value in parsed] + [False], dtype=bool)
+
+    # Null cells have a code of -1, which takes the nan and False appended to the values of the distinct cells.
+    return unique_values.take(codes).reshape(cells.shape), unique_valid.take(codes).reshape(cells.shape)
+
+
+# A cell that is only a number with commas, perhaps in parens and with $ or %, as most cells with values are.
+_RE_PLAIN_VALUE = re.compile(r'\$?(\()?\$?(\d[\d,]*(?:\.\d+)?)\)?%?')
+
+
+def _parse_item_value(cell) -> Optional[float]:
+    if not isinstance(cell, str):
+        return None
+
+    plain = _RE_PLAIN_VALUE.fullmatch(cell)
+    if plain is None:
+        return parse_item_value(cell)
+
+    value = float(plain.group(2).replace(',', ''))
+    return -value if plain.group(1) else value
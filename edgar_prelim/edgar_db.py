@@ -2,7 +2,8 @@ import os
 from datetime import date
 
 import pandas as pd
-from sqlalchemy import create_engine, MetaData, Table, Column, String, Date, Numeric, text, Boolean
+from sqlalchemy import create_engine, MetaData, Table, Column, String, Date, Numeric, text, Boolean, DateTime, Index, \
+    inspect, Text
 # noinspection PyProtectedMember
 from sqlalchemy.engine import Connection
 
@@ -31,13 +32,20 @@ prelim_cik_table = Table(
     Column('ticker', String(255), nullable=True)
 )
 
-# Table that records the filings that we have visited and whether they were identified as a prelim.
+# Table that records the filings that we have visited, whether they were identified as a prelim and, if not, why not.
+# The hashes of a filing's documents and the counts of its tables with a relevant title and of those with fiscal periods
+# record what its outcome was decided from, so that a rejected filing whose outcome can't change isn't visited again.
 prelim_filing_table = Table(
     'prelim_filing', prelim_metadata,
     *([
           Column(c.name, c.type, primary_key=c.primary_key) for c in prelim_core_columns
       ] + [
           Column('is_prelim', Boolean),
+          Column('reject_reason', String(255), nullable=True),
+          Column('pattern_version', String(16), nullable=True),
+          Column('document_hashes', Text, nullable=True),
+          Column('titled_tables', Numeric(5, 0), nullable=True),
+          Column('fiscal_period_tables', Numeric(5, 0), nullable=True),
       ])
 )
 
@@ -61,9 +69,79 @@ prelim_statement_table = Table(
           Column('src_value', String(1024)),
           Column('src_units', String(1024)),
           Column('is_overridden', Boolean),
+          Column('pattern_version', String(16), nullable=True),
       ])
 )
 
+# Table of the filings listed in Edgar's full-index and daily-index files, for discovering filings without paging
+# through each company's filing list.
+filing_index_table = Table(
+    'filing_index', prelim_metadata,
+    *([
+          Column(c.name, c.type, primary_key=c.primary_key) for c in prelim_core_columns
+      ] + [
+          Column('company_name', String(255)),
+          Index('filing_index_type_date', 'filing_type', 'filing_date'),
+      ])
+)
+
+# Table that records which index files have been loaded into the filing_index table.
+filing_index_source_table = Table(
+    'filing_index_source', prelim_metadata,
+    Column('source', String(255), primary_key=True),
+    Column('period_start', Date),
+    Column('period_end', Date),
+    Column('row_count', Numeric(10, 0)),
+    Column('loaded_at', DateTime),
+)
+
+# Table of the progress of a long-running job over the CIKs, such as update_database, so that it can resume where it
+# stopped. Each CIK is pending, running under a lease held by one scheduler until it expires, done or failed.
+prelim_job_table = Table(
+    'prelim_job', prelim_metadata,
+    Column('job', String(255), primary_key=True),
+    Column('cik', String(255), primary_key=True),
+    Column('position', Numeric(10, 0)),
+    Column('status', String(16)),
+    Column('lease_owner', String(255), nullable=True),
+    Column('lease_expires', DateTime, nullable=True),
+    Column('started_at', DateTime, nullable=True),
+    Column('finished_at', DateTime, nullable=True),
+    Column('filings', Numeric(10, 0), nullable=True),
+    Column('loaded', Boolean, nullable=True),
+    Column('error', String(1024), nullable=True),
+    Index('prelim_job_status', 'job', 'status', 'position'),
+)
+
+
+# Table of the versions of the patterns that extraction depends on, recorded in the pattern_version column of the
+# filings and statements that they produced. The components are the json of each family's patterns (see
+# edgar_fingerprint), from which the patterns that changed since a version can be found.
+pattern_version_table = Table(
+    'pattern_version', prelim_metadata,
+    Column('version', String(16), primary_key=True),
+    Column('components', Text),
+    Column('recorded_at', DateTime),
+)
+
+# Table of the submissions kept in the local archive, each a compressed member of its CIK's archive file at 'offset'
+# for 'length' bytes. The header and documents are the character offsets, in the decompressed and decoded text, of the
+# SEC-HEADER and of the text of each html document, the latter a json list of [type, filename, start, end].
+submission_archive_table = Table(
+    'submission_archive', prelim_metadata,
+    Column('accession', String(255), primary_key=True),
+    Column('cik', String(255)),
+    Column('filing_date', Date, nullable=True),
+    Column('path', String(255)),
+    Column('offset', Numeric(15, 0)),
+    Column('length', Numeric(15, 0)),
+    Column('encoding', String(32)),
+    Column('header_start', Numeric(15, 0)),
+    Column('header_end', Numeric(15, 0)),
+    Column('documents', Text),
+    Index('submission_archive_cik', 'cik', 'filing_date'),
+)
+
 
 def translate_to_persistable(value):
     """Translates a pd.DataFrame value into a value friendly to SQLAlchemy."""
@@ -75,6 +153,19 @@ def translate_to_persistable(value):
         return value
 
 
+def upgrade_schema(conn: Connection = prelim_engine):
+    """Creates any missing tables and adds any nullable columns missing from existing tables, so that a database
+    created by an earlier version can be read."""
+    prelim_metadata.create_all(conn, checkfirst=True)
+    inspector = inspect(conn)
+    for table in prelim_metadata.sorted_tables:
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable and not column.primary_key:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(f'alter table {table.name} add column {column.name} {column_type}')
+
+
 def query_cik(cik: str, conn: Connection = prelim_engine) -> pd.DataFrame:
     return pd.read_sql(text("select * from cik where cik = :cik").bindparams(cik=cik), conn)
 
@@ -88,6 +179,6 @@ def save_ciks(conn: Connection = prelim_engine):
 
 
 if __name__ == '__main__':
-    prelim_metadata.create_all(prelim_engine, checkfirst=True)
+    upgrade_schema(prelim_engine)
     # save_ciks()
 
@@ -0,0 +1,78 @@
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Iterable, Iterator, Callable, Tuple, Any, Union
+
+from edgar_prelim.edgar_query import Filing, Report, query_edgar_for_submission_text, report_from_submission_header, \
+    submission_text_href
+from edgar_prelim.edgar_submission import Submission, load_submission
+from edgar_prelim.edgar_triage import Triage, triage_filing
+
+"""
+Overlaps the network requests for upcoming filings with the parsing of the current one. All requests pass through
+edgar_http, so the prefetching threads share the global limit on the request rate.
+"""
+
+# The outcome of fetching an element: the value returned by the fetch function or the exception it raised.
+Fetched = namedtuple('Fetched', ['key', 'value', 'error'])
+
+
+def prefetch(keys: Iterable, fetch: Callable[[Any], Any], prefetch_size: int = 4) -> Iterator[Fetched]:
+    """
+    Applies fetch to each key in a pool of threads, keeping up to 'prefetch_size' fetches in flight, and yields the
+    results in the order of the keys. Exceptions raised by fetch are returned in the Fetched tuple, not raised.
+    """
+    if prefetch_size < 1:
+        for key in keys:
+            try:
+                yield Fetched(key, fetch(key), None)
+            except Exception as e:
+                yield Fetched(key, None, e)
+        return
+
+    key_iter = iter(keys)
+    with ThreadPoolExecutor(max_workers=prefetch_size, thread_name_prefix='prefetch') as executor:
+        pending = deque((key, executor.submit(fetch, key)) for key in islice(key_iter, prefetch_size))
+        while pending:
+            key, future = pending.popleft()
+            for next_key in islice(key_iter, 1):
+                pending.append((next_key, executor.submit(fetch, next_key)))
+
+            try:
+                yield Fetched(key, future.result(), None)
+            except Exception as e:
+                yield Fetched(key, None, e)
+
+
+def fetch_filing(filing: Filing, triage: bool = False) -> Union[None, Triage, Tuple[Report, Submission]]:
+    """
+    Downloads the report metadata and the submission for an 8-K filing, or returns None for other filings. The
+    submission's url is derived from the accession number in the filing href and the report is built from its header,
+    so the filing index page is only requested when either of those fails. If triage is True, the start of the
+    submission is read first and, if the filing can't be an earnings release, the rejecting Triage is returned instead.
+    """
+    if filing.type.upper() != '8-K':
+        return None
+
+    if triage:
+        result = triage_filing(filing)
+        if not result.keep:
+            return result
+
+    try:
+        href = submission_text_href(filing.href)
+    except ValueError:
+        report = query_edgar_for_submission_text(filing.href)
+        return report, load_submission(report.href)
+
+    submission = load_submission(href)
+    report = report_from_submission_header(submission.header, href)
+    if report is None:
+        report = query_edgar_for_submission_text(filing.href)
+    return report, submission
+
+
+def prefetch_filings(filings: Iterable[Filing], prefetch_size: int = 4, triage: bool = False) -> Iterator[Fetched]:
+    """Fetches the filings ahead of their consumption. See fetch_filing."""
+    return prefetch(filings, partial(fetch_filing, triage=triage), prefetch_size)
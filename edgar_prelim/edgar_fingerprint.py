@@ -0,0 +1,220 @@
+import hashlib
+import json
+import types
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Iterable, Set
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from edgar_prelim.edgar_db import prelim_engine, pattern_version_table
+from edgar_prelim.edgar_fiscal_period import fiscal_period_patterns, fiscal_period_exclusions, header_part_pattern
+from edgar_prelim.edgar_items import PrelimItem, prelim_items
+from edgar_prelim.edgar_re import *
+from edgar_prelim.edgar_title import title_inclusion_patterns, title_exclusion_patterns, unit_patterns, units_table
+
+"""
+Fingerprints the patterns that extraction depends on, so that each filing and statement records the version of the
+patterns that produced it, and the filings whose result could have changed with the patterns can be found. The patterns
+are in four families: the items, the table titles, the fiscal periods and the units. Each family is a list of
+components, one for each pattern, keyed by the pattern's group and position within it.
+
+A filing can only depend on a changed item, title or units pattern if its text contains the pattern's literals, in its
+old or new form, just as document_gate decides. Fiscal periods are parsed from header cells joined across rows, so a
+change to them is taken to affect every filing.
+"""
+
+ITEMS = 'items'
+TITLES = 'titles'
+FISCAL_PERIODS = 'fiscal_periods'
+UNITS = 'units'
+
+# The families whose patterns are matched against the text of a document as it reads, so that only documents that
+# contain a pattern's literals can depend on it.
+SCREENED_FAMILIES = frozenset([ITEMS, TITLES, UNITS])
+
+# A pattern that extraction depends on: its key, 'group/position', the source and flags of the regex as it is matched
+# and any other detail that affects its outcome. Components without a pattern can't be screened.
+PatternComponent = namedtuple('PatternComponent', ['key', 'pattern', 'flags', 'detail'])
+
+
+def _is_plain(value) -> bool:
+    """Whether the value is made only of text and numbers, so that its repr is the same in every process."""
+    if isinstance(value, (str, int, float)) or value is None:
+        return True
+    elif isinstance(value, (tuple, list, frozenset, set)):
+        return all(_is_plain(v) for v in value)
+    elif isinstance(value, dict):
+        return all(_is_plain(k) and _is_plain(v) for k, v in value.items())
+    return False
+
+
+def _update_code_digest(digest, fn: types.FunctionType, seen: Set[types.CodeType]):
+    def update_code(code: types.CodeType):
+        if code in seen:
+            return
+        seen.add(code)
+        digest.update(code.co_code)
+        digest.update(repr(code.co_names).encode('utf-8'))
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                update_code(const)
+            else:
+                digest.update(repr(const).encode('utf-8'))
+        for name in code.co_names:
+            value = fn.__globals__.get(name)
+            if isinstance(value, types.FunctionType) and \
+                    value.__module__.split('.')[0] == fn.__module__.split('.')[0]:
+                _update_code_digest(digest, value, seen)
+            elif _is_plain(value):
+                digest.update(repr(sorted(value) if isinstance(value, (set, frozenset)) else value).encode('utf-8'))
+
+    update_code(fn.__code__)
+
+
+def _code_digest(fn) -> str:
+    """
+    A digest of the code of a function: its bytecode, constants and names, those of the functions defined within it, and
+    those of the functions of this package that it calls, in turn, with the plain values they refer to. Unlike its
+    source, this tells apart lambdas defined on the same line, and changes with the helpers a lambda calls. The
+    bytecode differs between versions of Python, so a new one changes the digest.
+    """
+    digest = hashlib.sha256()
+    _update_code_digest(digest, fn, set())
+    return digest.hexdigest()[:16]
+
+
+def pattern_components(items: Iterable[PrelimItem] = None) -> Dict[str, List[PatternComponent]]:
+    """The components of each family of patterns, with the items being extracted, prelim_items by default."""
+    def of(group: str, patterns: Iterable[Pattern], details: Iterable = None) -> List[PatternComponent]:
+        patterns = list(patterns)
+        return [PatternComponent(f'{group}/{i}', p.pattern, p.flags, detail)
+                for i, (p, detail) in enumerate(zip(patterns, details or [None] * len(patterns)))]
+
+    components = {
+        ITEMS: [
+            PatternComponent(f'{item.name}/{rank}', allow_space_between_letters(pattern), int(re.IGNORECASE),
+                             repr(item.min_abs_value))
+            for item in (items if items is not None else prelim_items)
+            for rank, pattern in enumerate(item.patterns)
+        ],
+        TITLES:
+            of('inclusion', (t.pattern for t in title_inclusion_patterns),
+               ([sorted(t[1]), sorted(t[2])] for t in title_inclusion_patterns)) +
+            of('exclusion', title_exclusion_patterns),
+        FISCAL_PERIODS:
+            of('pattern', (p for p, _ in fiscal_period_patterns),
+               (_code_digest(parser) for _, parser in fiscal_period_patterns)) +
+            of('exclusion', fiscal_period_exclusions) +
+            of('header_part', [header_part_pattern]),
+        UNITS:
+            of('pattern', unit_patterns) +
+            [PatternComponent('table/0', None, 0, sorted(units_table.items()))],
+    }
+    # The components are as they read back from json, so that they compare equal to those of a recorded version.
+    return _components_from_json(json.dumps(_components_to_json(components)))
+
+
+def _components_to_json(components: Dict[str, List[PatternComponent]]) -> dict:
+    return {family: [list(c) for c in family_components] for family, family_components in components.items()}
+
+
+def _components_from_json(raw: str) -> Dict[str, List[PatternComponent]]:
+    return {family: [PatternComponent(*c) for c in family_components]
+            for family, family_components in json.loads(raw).items()}
+
+
+def _fingerprint(components: Dict[str, List[PatternComponent]]) -> str:
+    canonical = json.dumps(_components_to_json(components), sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def pattern_version(items: Iterable[PrelimItem] = None) -> str:
+    """The fingerprint of the patterns, with the items being extracted, prelim_items by default."""
+    if items is None or items is prelim_items:
+        return _default_pattern_version()
+    return _fingerprint(pattern_components(items))
+
+
+@lru_cache(maxsize=None)
+def _default_pattern_version() -> str:
+    return _fingerprint(pattern_components())
+
+
+def table_pattern_version() -> str:
+    """The fingerprint of the patterns that the tables parsed from a submission depend on, which are all but the
+    items."""
+    return _fingerprint({family: components for family, components in pattern_components().items() if family != ITEMS})
+
+
+def register_pattern_version(items: Iterable[PrelimItem] = None, conn: Connection = prelim_engine) -> str:
+    """Records the components of the current version of the patterns, if they aren't already, and returns it."""
+    version = pattern_version(items)
+    t = pattern_version_table
+    if conn.execute(select([t.c.version]).where(t.c.version == version)).first() is None:
+        components = json.dumps(_components_to_json(pattern_components(items)))
+        conn.execute(t.insert().values(version=version, components=components,
+                                        recorded_at=datetime.utcnow()))
+    return version
+
+
+def query_pattern_components(version: str,
+                             conn: Connection = prelim_engine) -> Optional[Dict[str, List[PatternComponent]]]:
+    """The components of a recorded version of the patterns, or None if the version wasn't recorded."""
+    t = pattern_version_table
+    row = conn.execute(select([t.c.components]).where(t.c.version == version)).first()
+    if row is None:
+        return None
+    return _components_from_json(row.components)
+
+
+def changed_components(old: Dict[str, List[PatternComponent]],
+                       new: Dict[str, List[PatternComponent]]) -> Dict[str, List[PatternComponent]]:
+    """
+    The components of each family that were added, removed or changed from the old version to the new, in both their
+    old and new form. A change to a pattern can change the rank of the patterns after it in its group, so those count
+    as changed too.
+    """
+    res = {}
+    for family in sorted(old.keys() | new.keys()):
+        old_by_key = {c.key: c for c in old.get(family, [])}
+        new_by_key = {c.key: c for c in new.get(family, [])}
+
+        def position(key: str):
+            group, _, i = key.rpartition('/')
+            return group, int(i)
+
+        changed = []
+        changed_groups = set()
+        for key in sorted(old_by_key.keys() | new_by_key.keys(), key=position):
+            group = position(key)[0]
+            if old_by_key.get(key) != new_by_key.get(key) or group in changed_groups:
+                changed_groups.add(group)
+                changed.extend(c for c in (old_by_key.get(key), new_by_key.get(key)) if c is not None)
+        if changed:
+            res[family] = changed
+    return res
+
+
+class DependencyScreen(object):
+    """
+    Decides whether a filing extracted with an old version of the patterns could have a different result with the new
+    one, from the plain text of its documents (see document_plain_text). Documents without the literals of any of the
+    changed patterns, in either form, match them neither before nor after the change.
+    :param changed: The changed components of each family, as returned by changed_components.
+    """
+
+    def __init__(self, changed: Dict[str, List[PatternComponent]]) -> None:
+        self.changed = changed
+        self.unscreened = any(family not in SCREENED_FAMILIES or c.pattern is None
+                              for family, components in changed.items() for c in components)
+        self._patterns = PatternSet((re.compile(c.pattern, c.flags)
+                                     for family, components in changed.items() if family in SCREENED_FAMILIES
+                                     for c in components if c.pattern is not None), cache_size=0)
+
+    def may_depend(self, plain_texts: Iterable[str]) -> bool:
+        if not self.changed:
+            return False
+        return self.unscreened or any(len(self._patterns.candidates(text)) > 0 for text in plain_texts)
@@ -1,7 +1,7 @@
 from functools import partial
 from re import Pattern
 from types import FunctionType
-from typing import Optional, Tuple, List, Sequence
+from typing import Optional, Tuple, List, Sequence, Iterable
 
 import pandas as pd
 
@@ -150,11 +150,48 @@ fiscal_period_exclusions = (
 )
 
 
+# The default patterns and exclusions screened together by their literals, so that a period string is only searched
+# with those that could match it. Every one of the default patterns also requires a digit.
+_fiscal_period_pattern_set = PatternSet(pattern for pattern, _ in fiscal_period_patterns)
+_fiscal_period_exclusion_set = PatternSet(fiscal_period_exclusions)
+_RE_DIGIT = re.compile(r'\d')
+_RE_UNAUDITED_EXACT = re.compile(UNAUDITED_EXACT)
+
+
+def _prep_fiscal_period_str(period) -> str:
+    prepped = str(period).strip().lower()
+    return _RE_UNAUDITED_EXACT.sub('', prepped).strip()
+
+
+def _candidate_patterns(prepped_period: str, patterns: Sequence) -> Iterable[int]:
+    """The indexes, in order, of the patterns that could match the prepped period string."""
+    if patterns is fiscal_period_patterns:
+        if _RE_DIGIT.search(prepped_period) is None:
+            return ()
+        return _fiscal_period_pattern_set.candidates(''.join(prepped_period.split()))
+    elif patterns is fiscal_period_exclusions:
+        return _fiscal_period_exclusion_set.candidates(''.join(prepped_period.split()))
+    else:
+        return range(len(patterns))
+
+
+def _is_excluded(prepped_period: str, exclusions: Sequence[Pattern]) -> bool:
+    return any(exclusions[i].search(prepped_period) is not None
+               for i in _candidate_patterns(prepped_period, exclusions))
+
+
+def is_excluded_fiscal_period(period: str, exclusions: Sequence[Pattern] = fiscal_period_exclusions) -> bool:
+    """Returns true if the period string matches one of the exclusion patterns, so that it can't be a fiscal period."""
+    return _is_excluded(_prep_fiscal_period_str(period), exclusions)
+
+
 def parse_fiscal_period(period: str, prefix: str = None,
                         patterns: Sequence[Tuple[Pattern, FunctionType]] = fiscal_period_patterns,
                         exclusions: Sequence[Pattern] = fiscal_period_exclusions) -> Optional[Tuple[str, int]]:
     """
-    Matches a period string against a collection of inclusions and exclusion patterns.
+    Matches a period string against a collection of inclusions and exclusion patterns. The default patterns and
+    exclusions are screened by their literals in a single scan of the period string, and only those that could match
+    it are searched, in order.
     :param period: A possible fiscal period string
     :param prefix: An optional prefix to be prended if 'period' doesn't match alone.
     :param patterns: A sequence of inclusion patterns paired with a function to translate a match to an FP string.
@@ -162,22 +199,16 @@ def parse_fiscal_period(period: str, prefix: str = None,
     :return: if period (or prefix + ' ' + period) doesn't match an exclusion or matches an inclusion, a tuple
     of the FP string and the index of the matching pattern is returned, otherwise None.
     """
-
-    def _prep_fiscal_period_str(p):
-        prepped = str(p).strip().lower()
-        return re.sub(UNAUDITED_EXACT, '', prepped).strip()
-
     prepped_period = _prep_fiscal_period_str(period)
-    if any(re.search(p, prepped_period) is not None for p in exclusions):
+    if _is_excluded(prepped_period, exclusions):
         return None
 
-    if prefix:
-        prepped_prefix = _prep_fiscal_period_str(prefix)
-        if any(re.search(p, prepped_prefix) is not None for p in exclusions):
-            return None
+    if prefix and is_excluded_fiscal_period(prefix, exclusions):
+        return None
 
-    for i, (pattern, f) in enumerate(patterns):
-        match = re.search(pattern, prepped_period)
+    for i in _candidate_patterns(prepped_period, patterns):
+        pattern, f = patterns[i]
+        match = pattern.search(prepped_period)
         if match:
             return f(match), len(patterns) - i
 
@@ -187,14 +218,6 @@ def parse_fiscal_period(period: str, prefix: str = None,
     return None
 
 
-def has_fiscal_period(row: pd.Series) -> bool:
-    """
-    Returns true if any value in this row is a fiscal period (starting at index 1, with index 0 being a possible
-    prefix).
-    """
-    return any(row.iloc[1:].astype(str).map(partial(parse_fiscal_period, prefix=str(row.iloc[0]))))
-
-
 def parse_fiscal_period_row(row: pd.Series) -> List[Tuple[int, str]]:
     """
     For a table row expected to have fiscal periods within, returns a list of Tuples for all elements containing
@@ -208,30 +231,32 @@ def parse_fiscal_period_row(row: pd.Series) -> List[Tuple[int, str]]:
     ]
 
 
+# Matches the lowercased, stripped text of a cell that could be part of a header row.
+header_part_pattern = re_compile('|'.join([
+    rf'(?:(?:three|3|six|6|nine|9|twelve|12)\s+months?(?:\s+periods?)?|quarters?|year|ytd)(?!ly)',
+    rf'\b(?:{MONTH})\b',
+    rf'^(?:end(?:ed|ing))?(?:20)\s*[0-2]\s*[0-9]{FOOTNOTE}$',
+    rf'^\d{1, 2}/\d{1, 2}/\d{2, 4}{FOOTNOTE}$',
+    rf'^q[1-4](?:\s*\(\w+\))?{FOOTNOTE}$',
+    rf'^[1-4]q(?:tr)?(?:\d{2, 4})?',
+    rf'as\s+(?:reported|adjusted)',
+    rf'year-?\s*to-?\s*date',
+    rf'^year-$',
+    rf'^to-date$',
+    rf'full\s+year',
+    rf'^(?:28|29|30|31){FOOTNOTE}$',
+    rf'^(?:month|quarter|year)s?{FOOTNOTE}$',
+    rf'^(?:three|six|nine|twelve){FOOTNOTE}$',
+    rf'^(?:operating|reported|baseline|percent|%|end(?:ed|ing)){FOOTNOTE}$',
+    ORDINAL,
+    rf'^(?:(?:20)\s*[0-2]\s*[0-9]\*\s*)?{UNAUDITED_EXACT}$'
+]))
+
+
 def is_header_part(cell: str) -> bool:
     """
     Return true if the supplied cell could possibly be part of a header row, either as a standalone fiscal period
     or when concatenated with cells above and below it.
     """
-    pattern = '|'.join([
-        rf'(?:(?:three|3|six|6|nine|9|twelve|12)\s+months?(?:\s+periods?)?|quarters?|year|ytd)(?!ly)',
-        rf'\b(?:{MONTH})\b',
-        rf'^(?:end(?:ed|ing))?(?:20)\s*[0-2]\s*[0-9]{FOOTNOTE}$',
-        rf'^\d{1, 2}/\d{1, 2}/\d{2, 4}{FOOTNOTE}$',
-        rf'^q[1-4](?:\s*\(\w+\))?{FOOTNOTE}$',
-        rf'^[1-4]q(?:tr)?(?:\d{2, 4})?',
-        rf'as\s+(?:reported|adjusted)',
-        rf'year-?\s*to-?\s*date',
-        rf'^year-$',
-        rf'^to-date$',
-        rf'full\s+year',
-        rf'^(?:28|29|30|31){FOOTNOTE}$',
-        rf'^(?:month|quarter|year)s?{FOOTNOTE}$',
-        rf'^(?:three|six|nine|twelve){FOOTNOTE}$',
-        rf'^(?:operating|reported|baseline|percent|%|end(?:ed|ing)){FOOTNOTE}$',
-        ORDINAL,
-        rf'^(?:(?:20)\s*[0-2]\s*[0-9]\*\s*)?{UNAUDITED_EXACT}$'
-    ])
     prepped = str(cell).lower().strip()
-    match = re.search(allow_space_between_letters(pattern), prepped)
-    return match is not None or parse_fiscal_period(cell) is not None
+    return header_part_pattern.search(prepped) is not None or parse_fiscal_period(cell) is not None
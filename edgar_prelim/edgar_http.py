@@ -0,0 +1,423 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import wraps
+from pathlib import Path
+from typing import Optional, Mapping, Iterator, Tuple, Union, Callable, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from edgar_prelim.edgar_cache import DiskResponseCache, CachedResponse, CacheMissError, DEFAULT_MAX_BYTES
+
+"""
+The single point through which all http requests to the Edgar system are made.
+
+Setting EDGAR_CACHE_DIR enables an on-disk response cache in that directory, bounded by EDGAR_CACHE_MAX_BYTES. Setting
+EDGAR_CACHE_REPLAY=1 serves requests from the cache only, failing with a CacheMissError for any request that was not
+previously recorded.
+
+Requests that reach the network are limited to EDGAR_REQUESTS_PER_SECOND (10 by default, SEC's fair access limit)
+across all threads in the process by a RequestGovernor, which slows down when SEC throttles or fails requests. Setting
+EDGAR_GOVERNOR_STATE to a file path shares the limit among all the processes that set the same path. Functions that
+make requests are retried with governed_retry, which leaves the waiting after a throttle to the governor.
+
+Requests share a single pooled session that keeps connections alive between requests. EDGAR_USER_AGENT sets the
+User-Agent header that SEC uses to identify the requester.
+"""
+
+DEFAULT_USER_AGENT = 'edgar_prelim (https://github.com/swidoff/edgar_prelim)'
+DEFAULT_POOL_SIZE = 16
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def _cache_from_environment() -> Optional[DiskResponseCache]:
+    cache_dir = os.environ.get('EDGAR_CACHE_DIR')
+    if not cache_dir:
+        return None
+
+    return DiskResponseCache(
+        cache_dir,
+        max_bytes=int(os.environ.get('EDGAR_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+        replay_only=os.environ.get('EDGAR_CACHE_REPLAY', '').lower() in {'1', 'true', 'yes'})
+
+
+_response_cache = _cache_from_environment()
+
+
+def set_response_cache(cache: Optional[DiskResponseCache]):
+    """Replaces the response cache used by all requests. None disables caching."""
+    global _response_cache
+    _response_cache = cache
+
+
+def get_response_cache() -> Optional[DiskResponseCache]:
+    return _response_cache
+
+
+# The counts of a governor's activity in this process. waited_seconds is the time spent waiting for the rate limit, of
+# which throttled_seconds is the part spent waiting out a throttle (a 429 or 503) or the slower rate that follows it.
+GovernorStats = namedtuple('GovernorStats', ['requests', 'retries', 'throttled', 'errors', 'waited_seconds',
+                                             'throttled_seconds'])
+
+
+class _GovernorState(object):
+    """The throttle state of a governor, which is shared by all of the processes using the same state file."""
+
+    def __init__(self, rate: float, next_slot: float = 0., paused_until: float = 0., updated: float = 0.) -> None:
+        self.rate = rate
+        self.next_slot = next_slot
+        self.paused_until = paused_until
+        self.updated = updated
+
+
+class RequestGovernor(object):
+    """
+    Limits the rate of requests to 'rate' per second, allowing bursts of up to 'burst' requests, across all threads and,
+    if a 'state_path' is supplied, all processes that share that file. Callers reserve a slot and then sleep until it
+    comes due, so waiting callers are served in order.
+
+    The rate adapts to the responses: a throttled response (429 or 503) pauses all requests for its Retry-After, or
+    'throttle_pause' seconds if it has none, and it halves the rate, as does a server or connection error. The rate
+    then recovers linearly to its maximum over 'recovery_seconds'.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0, min_rate: float = 0.5, recovery_seconds: float = 60.,
+                 throttle_pause: float = 5., state_path: Union[str, Path] = None) -> None:
+        self.max_rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate)
+        self.recovery_seconds = recovery_seconds
+        self.throttle_pause = throttle_pause
+        self.state_path = Path(state_path) if state_path else None
+        self._state = _GovernorState(rate)
+        self._lock = threading.Lock()
+        self._stats = GovernorStats(0, 0, 0, 0, 0., 0.)
+
+    def _update(self, fn: Callable[[_GovernorState, float], Any]) -> Any:
+        """Applies fn to the state and the current time, holding the lock on the state file, if any."""
+        with self._lock:
+            if self.state_path is None:
+                return fn(self._state, time.time())
+
+            with open(self.state_path, 'a+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                raw = f.read()
+                state = _GovernorState(**json.loads(raw)) if raw else _GovernorState(self.max_rate)
+                res = fn(state, time.time())
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state.__dict__))
+                return res
+
+    def _recover(self, state: _GovernorState, now: float):
+        if state.updated:
+            recovered = (now - state.updated) * self.max_rate / self.recovery_seconds
+            state.rate = max(self.min_rate, min(self.max_rate, state.rate + max(recovered, 0.)))
+        state.updated = now
+
+    def acquire(self) -> float:
+        """Blocks until the next request may be made and returns the time spent waiting."""
+
+        def reserve(state: _GovernorState, now: float):
+            self._recover(state, now)
+            slot = max(state.next_slot, now - (self.burst - 1) / state.rate, state.paused_until)
+            state.next_slot = slot + 1 / state.rate
+            wait = max(slot - now, 0.)
+            paused = min(max(state.paused_until - now, 0.), wait)
+            return wait, paused + (wait - paused) * (1 - state.rate / self.max_rate)
+
+        wait, throttled = self._update(reserve)
+        self._count(requests=1, waited_seconds=wait, throttled_seconds=throttled)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record_response(self, response: requests.Response):
+        """Adapts the rate to the status of a response."""
+        if response.status_code in (requests.codes.too_many_requests, requests.codes.service_unavailable):
+            self.throttle(_retry_after_seconds(response.headers.get('Retry-After')))
+        elif response.status_code >= 500:
+            self.record_error()
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """Pauses all requests for 'retry_after' seconds and halves the rate."""
+        pause = retry_after if retry_after is not None else self.throttle_pause
+
+        def slow(state: _GovernorState, now: float):
+            self._recover(state, now)
+            state.rate = max(self.min_rate, state.rate / 2)
+            state.paused_until = max(state.paused_until, now + pause)
+
+        self._update(slow)
+        self._count(throttled=1)
+
+    def record_error(self):
+        """Halves the rate after a server or connection error."""
+
+        def slow(state: _GovernorState, now: float):
+            self._recover(state, now)
+            state.rate = max(self.min_rate, state.rate / 2)
+
+        self._update(slow)
+        self._count(errors=1)
+
+    def record_retry(self):
+        self._count(retries=1)
+
+    def _count(self, **increments):
+        with self._lock:
+            self._stats = self._stats._replace(**{k: getattr(self._stats, k) + v for k, v in increments.items()})
+
+    @property
+    def rate(self) -> float:
+        def current(state: _GovernorState, now: float):
+            self._recover(state, now)
+            return state.rate
+
+        return self._update(current)
+
+    @property
+    def stats(self) -> GovernorStats:
+        return self._stats
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header, which is either a number of seconds or an http date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.)
+    except (TypeError, ValueError):
+        return None
+
+
+def _governor_from_environment(requests_per_second: float = None, burst: float = 1.0) -> RequestGovernor:
+    return RequestGovernor(
+        requests_per_second or float(os.environ.get('EDGAR_REQUESTS_PER_SECOND', 10)),
+        burst,
+        state_path=os.environ.get('EDGAR_GOVERNOR_STATE') or None)
+
+
+_governor = _governor_from_environment()
+
+
+def set_rate_limit(requests_per_second: float, burst: float = 1.0):
+    """Replaces the governor of the requests made to the Edgar system with one limited to the given rate."""
+    global _governor
+    _governor = _governor_from_environment(requests_per_second, burst)
+
+
+def set_governor(governor: RequestGovernor):
+    global _governor
+    _governor = governor
+
+
+def get_governor() -> RequestGovernor:
+    return _governor
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _new_session(user_agent: str = None, pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'User-Agent': user_agent or os.environ.get('EDGAR_USER_AGENT', DEFAULT_USER_AGENT),
+        'Accept-Encoding': 'gzip, deflate',
+    })
+    return session
+
+
+def open_session(user_agent: str = None, pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Replaces the shared session with a new one that keeps up to 'pool_size' connections alive per host, requests
+    gzip transfer encoding and identifies itself with 'user_agent'.
+    """
+    global _session
+    session = _new_session(user_agent, pool_size)
+    with _session_lock:
+        previous, _session = _session, session
+    if previous is not None:
+        previous.close()
+    return session
+
+
+def close_session():
+    """Closes the shared session and its pooled connections. The next request opens a new session."""
+    global _session
+    with _session_lock:
+        previous, _session = _session, None
+    if previous is not None:
+        previous.close()
+
+
+def get_session() -> requests.Session:
+    """Returns the shared session, opening it with the default settings if necessary."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _new_session()
+        return _session
+
+
+@contextmanager
+def edgar_session(user_agent: str = None, pool_size: int = DEFAULT_POOL_SIZE) -> Iterator[requests.Session]:
+    """Opens the shared session for the duration of a block, closing it and its connections on exit."""
+    session = open_session(user_agent, pool_size)
+    try:
+        yield session
+    finally:
+        close_session()
+
+
+def is_retryable(exception: Exception) -> bool:
+    """
+    Whether a request that failed with the exception could succeed if repeated. A miss in a replay-only cache never
+    will, nor will a client error other than a timeout or a throttle.
+    """
+    if isinstance(exception, CacheMissError):
+        return False
+    if isinstance(exception, requests.HTTPError) and exception.response is not None:
+        status = exception.response.status_code
+        return not (400 <= status < 500) or status in (requests.codes.request_timeout, requests.codes.too_many_requests)
+    return True
+
+
+def governed_retry(max_attempts: int = 7, wait_multiplier: float = 1., wait_max: float = 10.):
+    """
+    Decorates a function that makes requests to retry it when it raises a retryable exception, up to max_attempts
+    times. Throttling is handled by the governor, which pauses every request, so a retry only waits on its own for
+    other errors, exponentially from wait_multiplier up to wait_max seconds.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            attempt = 1
+            while True:
+                try:
+                    return f(*args, **kwargs)
+                except Exception as e:
+                    if attempt >= max_attempts or not is_retryable(e):
+                        raise
+                    _governor.record_retry()
+                    throttled = isinstance(e, requests.HTTPError) and e.response is not None and \
+                        e.response.status_code in (requests.codes.too_many_requests, requests.codes.service_unavailable)
+                    if not throttled:
+                        time.sleep(min(wait_multiplier * 2 ** (attempt - 1), wait_max))
+                    attempt += 1
+
+        return wrapper
+
+    return decorator
+
+
+def _governed_get(url: str, **kwargs) -> requests.Response:
+    """Issues a request through the shared session when the governor allows, and reports the outcome to it."""
+    _governor.acquire()
+    try:
+        result = get_session().get(url, **kwargs)
+    except (requests.ConnectionError, requests.Timeout):
+        _governor.record_error()
+        raise
+    _governor.record_response(result)
+    return result
+
+
+def _to_response(cached: CachedResponse) -> requests.Response:
+    response = requests.Response()
+    response.url = cached.url
+    response.status_code = cached.status_code
+    response.encoding = cached.encoding
+    response._content = cached.content
+    response._content_consumed = True
+    return response
+
+
+def http_get(url: str, params: Mapping = None, headers: Mapping = None, use_cache: bool = True) -> requests.Response:
+    """
+    Issues a GET request, serving it from the response cache when possible. The headers are added to the request, but
+    are not part of the cache key. Responses that change between requests, such as feeds, should not use the cache.
+    """
+    cache = _response_cache if use_cache else None
+    if cache is not None:
+        cached = cache.get(url, params)
+        if cached is not None:
+            return _to_response(cached)
+
+    result = _governed_get(url, params=params, headers=headers)
+    if cache is not None and result.status_code == requests.codes.ok:
+        cache.put(url, params, CachedResponse(result.url, result.status_code, result.encoding, result.content))
+    return result
+
+
+def _recording(cache: DiskResponseCache, url: str, params: Mapping, result: requests.Response,
+               chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Passes the chunks through, recording them in the cache once the last one has been read."""
+    with cache.writer(url, params, CachedResponse(result.url, result.status_code, result.encoding, None)) as f:
+        for chunk in chunks:
+            f.write(chunk)
+            yield chunk
+
+
+@contextmanager
+def http_stream(url: str, params: Mapping = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                headers: Mapping = None) -> Iterator[Tuple[requests.Response, Iterator[bytes]]]:
+    """
+    Issues a GET request whose body is read incrementally, yielding the response and an iterator over the chunks of
+    its body. The response's content must not be accessed. A 200 response that is read to the end is recorded in the
+    response cache, and the connection is released when the block exits. The headers are added to the request, but
+    are not part of the cache key.
+    """
+    cache = _response_cache
+    if cache is not None:
+        opened = cache.open(url, params)
+        if opened is not None:
+            cached, body = opened
+            with body:
+                yield _to_response(cached), iter(lambda: body.read(chunk_size), b'')
+            return
+
+    result = _governed_get(url, params=params, headers=headers, stream=True)
+    chunks = result.iter_content(chunk_size)
+    if cache is not None and result.status_code == requests.codes.ok:
+        chunks = _recording(cache, url, params, result, chunks)
+    try:
+        yield result, chunks
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        result.close()
+
+
+def http_get_prefix(url: str, size: int, params: Mapping = None) -> Tuple[requests.Response, bytes]:
+    """
+    Returns the response and the first 'size' bytes of its body. Only those bytes are requested, with a Range header,
+    and from a server that ignores the header the body is read only as far as needed before the connection is dropped.
+    A cached response is served from the cache, but a partial response is never recorded.
+    """
+    range_headers = {'Range': f'bytes=0-{size - 1}', 'Accept-Encoding': 'identity'}
+    with http_stream(url, params, chunk_size=min(size, DEFAULT_CHUNK_SIZE), headers=range_headers) as (result, chunks):
+        prefix = bytearray()
+        if result.status_code in (requests.codes.ok, requests.codes.partial_content):
+            for chunk in chunks:
+                prefix += chunk
+                if len(prefix) >= size:
+                    break
+        return result, bytes(prefix[:size])
@@ -0,0 +1,233 @@
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Iterable, Iterator, Optional, Tuple, Union
+
+import pandas as pd
+import requests
+from sqlalchemy import and_, between, func, or_
+# noinspection PyProtectedMember
+from sqlalchemy.engine import Connection
+
+from edgar_prelim.edgar_db import prelim_engine, prelim_metadata, filing_index_table, filing_index_source_table, \
+    PRELIM_START
+from edgar_prelim.edgar_http import http_get, governed_retry
+from edgar_prelim.edgar_query import Filing
+from edgar_prelim.logging_config import init_logging
+
+logger = init_logging(__name__)
+
+"""
+Discovers filings from Edgar's quarterly full-index and daily-index files. One index file lists every filing made in
+its period, so loading the files for a date range into the filing_index table answers "all 8-Ks for these CIKs" with
+a single query instead of paging through each company's filing list.
+"""
+
+EDGAR_ARCHIVES = 'https://www.sec.gov/Archives'
+
+# The columns of a parsed index file, which are the columns of the filing_index table.
+INDEX_COLUMNS = ['cik', 'filing_date', 'filing_type', 'filing_href', 'company_name']
+
+
+def full_index_url(year: int, quarter: int, kind: str = 'master') -> str:
+    """The url of the quarterly index file of the given kind ('master' or 'form')."""
+    return f'{EDGAR_ARCHIVES}/edgar/full-index/{year}/QTR{quarter}/{kind}.idx'
+
+
+def daily_index_url(day: date, kind: str = 'master') -> str:
+    """The url of the daily index file of the given kind ('master' or 'form')."""
+    return f'{EDGAR_ARCHIVES}/edgar/daily-index/{day.year}/QTR{(day.month - 1) // 3 + 1}/{kind}.{day:%Y%m%d}.idx'
+
+
+def filing_href_from_filename(filename: str) -> str:
+    """
+    Translates an index file name, e.g. edgar/data/51143/0001047469-18-001117.txt, into the href of the filing's index
+    page, e.g. https://www.sec.gov/Archives/edgar/data/51143/000104746918001117/0001047469-18-001117-index.htm, which
+    is the href returned by query_edgar_for_filings.
+    """
+    match = re.match(r'edgar/data/(\d+)/(\d{10}-\d{2}-\d{6})\.txt$', filename.strip())
+    if not match:
+        raise ValueError(f'Unrecognized index file name: {filename}')
+    cik, accession = match.groups()
+    return f'{EDGAR_ARCHIVES}/edgar/data/{cik}/{accession.replace("-", "")}/{accession}-index.htm'
+
+
+def _parse_date(raw: str) -> date:
+    raw = raw.strip()
+    return datetime.strptime(raw, '%Y-%m-%d' if '-' in raw else '%Y%m%d').date()
+
+
+def _iter_master_index(lines: Iterator[str]) -> Iterator[Tuple[str, str, str, str, str]]:
+    """Parses the pipe-delimited rows of a master.idx file into cik, company name, form type, date and file name."""
+    for line in lines:
+        parts = line.rstrip('\r\n').split('|')
+        if len(parts) == 5:
+            yield tuple(parts)
+
+
+def _iter_form_index(header: str, lines: Iterator[str]) -> Iterator[Tuple[str, str, str, str, str]]:
+    """Parses the fixed-width rows of a form.idx file, using the offsets of the column names in the header."""
+    starts = [header.index(name) for name in ['Form Type', 'Company Name', 'CIK', 'Date Filed', 'File Name']]
+    bounds = list(zip(starts, starts[1:] + [None]))
+    for line in lines:
+        if not line.strip():
+            continue
+        form_type, company_name, cik, filed, filename = (line[s:e].strip() for s, e in bounds)
+        yield cik, company_name, form_type, filed, filename
+
+
+def parse_index(text: str, filing_types: Iterable[str] = None) -> pd.DataFrame:
+    """
+    Parses the text of a master.idx or form.idx file into a table with the columns of the filing_index table.
+    :param text: The contents of the index file.
+    :param filing_types: If supplied, only the filings whose type starts with one of these prefixes are returned.
+    :return: a pd.DataFrame of the filings listed in the index.
+    """
+    lines = iter(text.splitlines())
+    header = ''
+    for line in lines:
+        if line.startswith('-----'):
+            break
+        if line.strip():
+            header = line
+
+    if header.startswith('CIK|'):
+        rows = _iter_master_index(lines)
+    elif header.startswith('Form Type'):
+        rows = _iter_form_index(header, lines)
+    else:
+        raise ValueError(f'Unrecognized index header: {header}')
+
+    prefixes = tuple(t.upper() for t in filing_types) if filing_types else None
+    records = [
+        (cik.strip().zfill(10), _parse_date(filed), form_type.strip(), filing_href_from_filename(filename),
+         company_name.strip())
+        for cik, company_name, form_type, filed, filename in rows
+        if prefixes is None or form_type.strip().upper().startswith(prefixes)
+    ]
+    return pd.DataFrame(records, columns=INDEX_COLUMNS).drop_duplicates(subset=INDEX_COLUMNS[:4])
+
+
+@governed_retry()
+def _download_index(url: str) -> str:
+    result = http_get(url)
+    if result.status_code != requests.codes.ok:
+        result.raise_for_status()
+    else:
+        return result.text
+
+
+def _read_index(url: str, path: Union[str, Path] = None) -> str:
+    if path is not None:
+        return Path(path).read_text(encoding='latin-1')
+    else:
+        return _download_index(url)
+
+
+def _type_prefixes(filing_types: Optional[Iterable[str]]) -> Optional[List[str]]:
+    return sorted({t.upper() for t in filing_types}) if filing_types else None
+
+
+def _source_key(source: str, filing_types: Optional[Iterable[str]]) -> str:
+    """The key of an index file in filing_index_source, which names the prefixes of the filing types loaded from it
+    unless all of them were."""
+    prefixes = _type_prefixes(filing_types)
+    return f"{source} ({', '.join(prefixes)})" if prefixes else source
+
+
+def _save_index(df: pd.DataFrame, source: str, filing_types: Optional[Iterable[str]], period_start: date,
+                period_end: date, conn: Connection) -> int:
+    """Replaces the index rows for the period of the filing types loaded with those in df and records the source as
+    loaded with them."""
+    prelim_metadata.create_all(conn, tables=[filing_index_table, filing_index_source_table], checkfirst=True)
+    t = filing_index_table
+    clauses = [between(t.c.filing_date, period_start, period_end)]
+    prefixes = _type_prefixes(filing_types)
+    if prefixes:
+        clauses.append(or_(*[func.upper(t.c.filing_type).startswith(prefix, autoescape=True) for prefix in prefixes]))
+    key = _source_key(source, filing_types)
+    with conn.begin() as c:
+        c.execute(t.delete().where(and_(*clauses)))
+        c.execute(filing_index_source_table.delete().where(filing_index_source_table.c.source == key))
+        df.to_sql(t.name, c, if_exists='append', index=False, chunksize=10000)
+        c.execute(filing_index_source_table.insert().values(
+            source=key, period_start=period_start, period_end=period_end, row_count=len(df),
+            loaded_at=datetime.now()))
+    logger.info(f'Loaded {len(df)} filings from {source}.')
+    return len(df)
+
+
+def _quarter_bounds(year: int, quarter: int) -> Tuple[date, date]:
+    start = date(year, 3 * (quarter - 1) + 1, 1)
+    end = date(year + 1, 1, 1) if quarter == 4 else date(year, 3 * quarter + 1, 1)
+    return start, end - timedelta(days=1)
+
+
+def is_index_loaded(source: str, filing_types: Iterable[str] = None, conn: Connection = prelim_engine) -> bool:
+    """Whether the filings of the types, or of all types if None, have been loaded from the index file."""
+    if not filing_index_source_table.exists(conn):
+        return False
+    keys = {source, _source_key(source, filing_types)}
+    res = conn.execute(filing_index_source_table.select().where(filing_index_source_table.c.source.in_(keys)))
+    return res.fetchone() is not None
+
+
+def load_quarterly_index(year: int, quarter: int, path: Union[str, Path] = None, filing_types=('8-K',),
+                         reload: bool = False, conn: Connection = prelim_engine) -> int:
+    """
+    Loads the filings in a quarter's index file into the filing_index table.
+    :param year: The year of the quarter.
+    :param quarter: The calendar quarter, 1 through 4.
+    :param path: A local copy of the quarter's master.idx or form.idx file. If None, the master.idx is downloaded.
+    :param filing_types: The prefixes of the filing types to keep, or None for all filings.
+    :param reload: If False, a quarter that has already been loaded is skipped, unless it is the current quarter,
+    whose index grows daily.
+    :return: the number of filings loaded.
+    """
+    source = f'full-index/{year}/QTR{quarter}'
+    period_start, period_end = _quarter_bounds(year, quarter)
+    if not reload and period_end < date.today() and is_index_loaded(source, filing_types, conn):
+        return 0
+
+    df = parse_index(_read_index(full_index_url(year, quarter), path), filing_types)
+    return _save_index(df, source, filing_types, period_start, period_end, conn)
+
+
+def load_daily_index(day: date, path: Union[str, Path] = None, filing_types=('8-K',),
+                     conn: Connection = prelim_engine) -> int:
+    """Loads the filings in a day's index file into the filing_index table. See load_quarterly_index."""
+    df = parse_index(_read_index(daily_index_url(day), path), filing_types)
+    return _save_index(df, f'daily-index/{day:%Y%m%d}', filing_types, day, day, conn)
+
+
+def load_indexes_between(start: date = PRELIM_START, end: date = None, filing_types=('8-K',),
+                         conn: Connection = prelim_engine) -> int:
+    """Loads the quarterly index files for every quarter between start and end that has not already been loaded."""
+    end = end if end else date.today()
+    count = 0
+    year, quarter = start.year, (start.month - 1) // 3 + 1
+    while _quarter_bounds(year, quarter)[0] <= end:
+        count += load_quarterly_index(year, quarter, filing_types=filing_types, conn=conn)
+        year, quarter = (year + 1, 1) if quarter == 4 else (year, quarter + 1)
+    return count
+
+
+def query_index_for_filings(ciks: Iterable[str], filing_type: str = '8-K', start: date = None, end: date = None,
+                            conn: Connection = prelim_engine) -> Dict[str, List[Filing]]:
+    """
+    Queries the filing_index table for the filings of the CIKs whose type starts with filing_type, between start and
+    end inclusive.
+    :return: A dict from CIK to its filings, most recent first, in the same form as query_edgar_for_filings.
+    """
+    ciks = list(ciks)
+    query = filing_index_table.select().where(and_(
+        filing_index_table.c.cik.in_(ciks),
+        filing_index_table.c.filing_type.like(f'{filing_type}%'),
+        between(filing_index_table.c.filing_date, start if start else PRELIM_START, end if end else date.today())
+    )).order_by(filing_index_table.c.filing_date.desc())
+
+    res = defaultdict(list)
+    for row in conn.execute(query):
+        res[row.cik].append(Filing(date=row.filing_date, type=row.filing_type, href=row.filing_href))
+    return {cik: res[cik] for cik in ciks}
@@ -1,5 +1,8 @@
 from edgar_prelim.edgar_re import *
 from collections import namedtuple
+from typing import Iterable, Tuple
+
+import numpy as np
 
 # PrelimItem, currently only an income statement item, has the following components:
 # 1) The name of the item.
@@ -93,3 +96,51 @@ prelim_items = [
             r'\(book\s+value\s+per\s+(?:common\s+)?share\)'
         ]),
 ]
+
+
+class ItemMatcher(object):
+    """
+    Matches the label cells of tables against the patterns of all of the items at once. The patterns are compiled once,
+    as a PatternSet, so that each cell is only searched with the patterns whose literals it contains, and the matches of
+    recent cells are remembered, as the same labels recur from table to table.
+    """
+
+    def __init__(self, items: Iterable[PrelimItem], cache_size: int = 10000) -> None:
+        self.items = tuple(items)
+        self._item_ranks = tuple(
+            (item_index, rank) for item_index, item in enumerate(self.items) for rank in range(len(item.patterns)))
+        self._patterns = PatternSet(
+            (re.compile(allow_space_between_letters(pattern), flags=re.IGNORECASE)
+             for item in self.items for pattern in item.patterns),
+            cache_size=0)
+        self._cache = {}
+        self._cache_size = cache_size
+
+    def match(self, cell: str) -> Tuple[Tuple[int, int], ...]:
+        """Returns the item index and pattern rank of each pattern that the cell matches, in order."""
+        matched = self._cache.get(cell)
+        if matched is None:
+            if len(self._cache) >= self._cache_size:
+                self._cache.clear()
+            candidates = self._patterns.candidates(''.join(cell.lower().split()))
+            matched = self._cache[cell] = tuple(
+                self._item_ranks[i] for i in candidates if self._patterns[i].search(cell))
+        return matched
+
+    def match_table(self, values: np.ndarray, label_columns: int) -> np.ndarray:
+        """
+        Matches each cell of the leading columns of a table once.
+        :param values: The cells of the table.
+        :param label_columns: The number of leading columns with labels.
+        :return: The matches, one per row, of (row, column, item index, pattern rank), by column and then by row.
+        """
+        matches = [
+            (row, col, item_index, rank)
+            for col in range(label_columns)
+            for row, cell in enumerate(values[:, col]) if isinstance(cell, str)
+            for item_index, rank in self.match(cell)
+        ]
+        return np.array(matches, dtype=int).reshape(-1, 4)
+
+
+prelim_item_matcher = ItemMatcher(prelim_items)
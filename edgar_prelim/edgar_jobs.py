@@ -0,0 +1,259 @@
+import os
+import socket
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Callable, Any, List
+
+from sqlalchemy import and_, or_, select, func
+from sqlalchemy.engine import Connection
+
+from edgar_prelim.edgar_db import prelim_engine, prelim_job_table, upgrade_schema
+from edgar_prelim.logging_config import init_logging
+
+logger = init_logging(__name__)
+
+"""
+Runs a job over many CIKs, such as loading each of their statements, a few CIKs at a time and with its progress kept in
+the prelim_job table, so that a job that is stopped or crashes resumes with the CIKs it hadn't finished. A scheduler
+leases each CIK before loading it and renews the lease while it runs, so that schedulers in other processes running the
+same job skip it, and a CIK whose scheduler died is taken up again once its lease expires, or at once by a scheduler on
+the same host.
+"""
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# The outcome of a CIK's part of a job: the number of filings visited and whether any statement was loaded.
+JobResult = namedtuple('JobResult', ['filings', 'loaded'])
+
+# The progress of a job: the count of its CIKs in each state, the filings visited by its finished CIKs, the rate at
+# which this scheduler has visited filings, per minute, and the estimated time until the job is finished, if known.
+JobProgress = namedtuple('JobProgress', ['total', 'pending', 'running', 'done', 'failed', 'filings',
+                                         'filings_per_minute', 'eta'])
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobScheduler(object):
+    """
+    Schedules the CIKs of a job, running up to 'workers' of them at once in threads.
+    :param job: The name of the job, under which its progress is kept.
+    :param workers: The number of CIKs to run at once.
+    :param lease_seconds: How long a CIK is leased for. Leases are renewed every third of this while the CIK runs, so
+    it only needs to outlast a stalled renewal; it is how long a CIK of a scheduler that died waits to be taken up.
+    :param owner: The name of the scheduler holding leases, by default the host and process id.
+    """
+
+    def __init__(self, job: str, workers: int = 4, lease_seconds: float = 300., owner: str = None,
+                 conn: Connection = prelim_engine) -> None:
+        self.job = job
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}'
+        self.conn = conn
+        self._started = time.monotonic()
+        self._filings = 0
+        self._finished = 0
+
+    def _of_job(self, *clauses):
+        return and_(prelim_job_table.c.job == self.job, *clauses)
+
+    def _claimable(self, now: datetime):
+        t = prelim_job_table
+        return self._of_job(or_(t.c.status == PENDING, and_(t.c.status == RUNNING, t.c.lease_expires < now)))
+
+    def _leased(self, ciks: List[str]):
+        t = prelim_job_table
+        return self._of_job(t.c.cik.in_(ciks), t.c.status == RUNNING, t.c.lease_owner == self.owner)
+
+    def _dead_owners(self, c: Connection) -> List[str]:
+        """The owners of leases on this host whose processes are no longer running."""
+        host = f'{socket.gethostname()}:'
+        t = prelim_job_table
+        owners = [owner for (owner,) in c.execute(
+            select([t.c.lease_owner]).where(self._of_job(t.c.status == RUNNING)).distinct())]
+        dead = []
+        for owner in owners:
+            pid = owner[len(host):] if owner and owner.startswith(host) else ''
+            if owner != self.owner and pid.isdigit() and not _is_running(int(pid)):
+                dead.append(owner)
+        return dead
+
+    def schedule(self, ciks: Iterable[str]) -> int:
+        """
+        Adds the CIKs to the job, in order, and removes any others. If every CIK of the job had already finished, the
+        job starts over. Otherwise it resumes with the CIKs that hadn't, including those leased by schedulers on this
+        host that died.
+        :return: The number of CIKs pending.
+        """
+        t = prelim_job_table
+        ciks = list(ciks)
+        upgrade_schema(self.conn)
+        with self.conn.begin() as c:
+            c.execute(t.delete().where(self._of_job(t.c.cik.notin_(ciks))))
+            dead = self._dead_owners(c)
+            if dead:
+                logger.info(f"Taking up the CIKs of {self.job} leased by {', '.join(dead)}, which are no longer running.")
+                c.execute(t.update().where(self._of_job(t.c.status == RUNNING, t.c.lease_owner.in_(dead))).values(
+                    status=PENDING, lease_owner=None, lease_expires=None))
+            existing = {row.cik for row in c.execute(select([t.c.cik]).where(self._of_job()))}
+            unfinished = c.execute(select([func.count()]).where(self._of_job(t.c.status.in_([PENDING, RUNNING]))))
+            if existing and unfinished.scalar() == 0:
+                logger.info(f"Starting {self.job} over.")
+                c.execute(t.update().where(self._of_job()).values(
+                    status=PENDING, lease_owner=None, lease_expires=None, started_at=None, finished_at=None,
+                    filings=None, loaded=None, error=None))
+
+            new_rows = [dict(job=self.job, cik=cik, position=i, status=PENDING)
+                        for i, cik in enumerate(ciks) if cik not in existing]
+            if new_rows:
+                c.execute(t.insert(), new_rows)
+            return c.execute(select([func.count()]).where(self._of_job(t.c.status == PENDING))).scalar()
+
+    def next_expiry(self) -> Optional[datetime]:
+        """When the first lease held by another scheduler expires, or None if no CIK is leased by another."""
+        t = prelim_job_table
+        return self.conn.execute(select([func.min(t.c.lease_expires)]).where(
+            self._of_job(t.c.status == RUNNING, t.c.lease_owner != self.owner))).scalar()
+
+    def claim_next(self) -> Optional[str]:
+        """Leases the next CIK that is pending, or whose lease has expired, and returns it, or None if there is none."""
+        t = prelim_job_table
+        now = datetime.utcnow()
+        candidates = self.conn.execute(
+            select([t.c.cik]).where(self._claimable(now)).order_by(t.c.position).limit(self.workers + 1))
+        for (cik,) in candidates.fetchall():
+            # Another scheduler may lease the CIK first, in which case nothing is updated.
+            claimed = self.conn.execute(t.update().where(and_(self._claimable(now), t.c.cik == cik)).values(
+                status=RUNNING, lease_owner=self.owner, lease_expires=now + timedelta(seconds=self.lease_seconds),
+                started_at=now))
+            if claimed.rowcount == 1:
+                return cik
+        return None
+
+    def renew(self, ciks: Iterable[str]):
+        """Extends the leases of the running CIKs."""
+        ciks = list(ciks)
+        if not ciks:
+            return
+        expires = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        self.conn.execute(prelim_job_table.update().where(self._leased(ciks)).values(lease_expires=expires))
+
+    def release(self, ciks: Iterable[str]):
+        """Returns the leased CIKs to pending, so that they are run again."""
+        ciks = list(ciks)
+        if not ciks:
+            return
+        self.conn.execute(prelim_job_table.update().where(self._leased(ciks)).values(
+            status=PENDING, lease_owner=None, lease_expires=None))
+
+    def finish(self, cik: str, result: JobResult = None, error: Exception = None):
+        """Records the outcome of a leased CIK, which is done unless there was an error."""
+        self.conn.execute(prelim_job_table.update().where(self._leased([cik])).values(
+            status=DONE if error is None else FAILED,
+            lease_owner=None,
+            lease_expires=None,
+            finished_at=datetime.utcnow(),
+            filings=result.filings if result is not None else None,
+            loaded=result.loaded if result is not None else None,
+            error=str(error)[:1024] if error is not None else None))
+        if result is not None:
+            self._filings += result.filings
+        self._finished += 1
+
+    def progress(self) -> JobProgress:
+        t = prelim_job_table
+        rows = self.conn.execute(
+            select([t.c.status, func.count(), func.sum(t.c.filings)]).where(self._of_job()).group_by(t.c.status))
+        counts = {status: (count, filings or 0) for status, count, filings in rows}
+        total = sum(count for count, _ in counts.values())
+        unfinished = sum(counts.get(status, (0, 0))[0] for status in [PENDING, RUNNING])
+
+        minutes = (time.monotonic() - self._started) / 60.
+        eta = timedelta(minutes=unfinished * minutes / self._finished) if self._finished else None
+        return JobProgress(
+            total=total,
+            pending=counts.get(PENDING, (0, 0))[0],
+            running=counts.get(RUNNING, (0, 0))[0],
+            done=counts.get(DONE, (0, 0))[0],
+            failed=counts.get(FAILED, (0, 0))[0],
+            filings=int(sum(filings for _, filings in counts.values())),
+            filings_per_minute=self._filings / minutes if minutes > 0 else 0.,
+            eta=eta)
+
+    def run(self, load: Callable[[str], JobResult], max_loaded: int = None,
+            on_loaded: Callable[[str], Any] = None) -> JobProgress:
+        """
+        Runs 'load' on each scheduled CIK that this or another scheduler hasn't already run, until there are none
+        left, logging the progress after each. The CIKs leased by other schedulers are waited for, and taken up if
+        their leases expire. If this is interrupted, the CIKs running are returned to pending; a second interrupt stops
+        them.
+        :param load: Loads a CIK. If it raises an exception, the CIK is recorded as failed.
+        :param max_loaded: If supplied, no more CIKs are started once this many have loaded a statement.
+        :param on_loaded: Called, in this thread, with each CIK that loaded a statement.
+        """
+        self._started = time.monotonic()
+        self._filings = self._finished = 0
+        loaded = 0
+        running = {}
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.job)
+        try:
+            while True:
+                while len(running) < self.workers and (max_loaded is None or loaded < max_loaded):
+                    cik = self.claim_next()
+                    if cik is None:
+                        break
+                    running[executor.submit(load, cik)] = cik
+
+                if not running:
+                    expires = self.next_expiry() if max_loaded is None or loaded < max_loaded else None
+                    if expires is None:
+                        break
+                    wait_seconds = min(max((expires - datetime.utcnow()).total_seconds(), 0.), self.lease_seconds / 3)
+                    logger.info(f"{self.job}: waiting for CIKs leased by other schedulers, the first until {expires}.")
+                    time.sleep(wait_seconds + 0.01)
+                    continue
+
+                done, _ = wait(running, timeout=self.lease_seconds / 3, return_when=FIRST_COMPLETED)
+                for future in done:
+                    cik = running[future]
+                    try:
+                        result, error = future.result(), None
+                    except Exception as e:
+                        result, error = None, e
+                    # An interrupt raised by the load doesn't reach here, and leaves its CIK to be returned to pending.
+                    del running[future]
+
+                    self.finish(cik, result, error)
+                    if error is not None:
+                        logger.error(f"Failure running {self.job} for {cik}: {error}")
+                    elif result.loaded:
+                        loaded += 1
+                        if on_loaded:
+                            on_loaded(cik)
+
+                    p = self.progress()
+                    logger.info(f"{self.job}: {p.done + p.failed}/{p.total} CIKs ({p.failed} failed), "
+                                f"{p.filings_per_minute:.1f} filings/min, ETA {p.eta}")
+                self.renew(running.values())
+        except BaseException:
+            for future in running:
+                future.cancel()
+            self.release(running.values())
+            executor.shutdown(wait=False)
+            raise
+
+        executor.shutdown()
+        return self.progress()
@@ -1,9 +1,11 @@
 # noinspection PyUnresolvedReferences
-from collections import OrderedDict, namedtuple, ChainMap
+import hashlib
+from collections import OrderedDict, namedtuple, ChainMap, deque
+from concurrent.futures import ProcessPoolExecutor, Future, wait
 from datetime import timedelta
 from operator import attrgetter
 from pathlib import Path
-from typing import Union
+from typing import Union, Optional, Iterator, Tuple, Dict
 
 import papermill as pm
 import qgrid
@@ -13,9 +15,18 @@ from sqlalchemy import and_, between
 
 from edgar_prelim.bs4_util import *
 from edgar_prelim.edgar_db import *
+from edgar_prelim.edgar_fetch import Fetched, fetch_filing, prefetch, prefetch_filings
+from edgar_prelim.edgar_fingerprint import pattern_version, register_pattern_version, pattern_components, \
+    query_pattern_components, changed_components, ITEMS, TITLES, FISCAL_PERIODS
+from edgar_prelim.edgar_fiscal_period import parse_fiscal_period_row
+from edgar_prelim.edgar_http import edgar_session
+from edgar_prelim.edgar_index import load_indexes_between, query_index_for_filings
 from edgar_prelim.edgar_items import *
+from edgar_prelim.edgar_jobs import JobScheduler, JobResult, JobProgress
 from edgar_prelim.edgar_query import *
-from edgar_prelim.edgar_submission import load_submission, items_from_tables, parse_tables, choose_item_by_rank
+from edgar_prelim.edgar_submission import Submission, TableTuple, items_from_tables, choose_item_by_rank
+from edgar_prelim.edgar_table_cache import parse_tables_cached
+from edgar_prelim.edgar_triage import Triage, REJECT_TRIAGE, triage_filing
 from edgar_prelim.edgar_validate import validate_prelims
 from edgar_prelim.logging_config import init_logging
 
@@ -42,8 +53,19 @@ logger = init_logging(__name__)
 Top-level module for loading new filings into the database.
 """
 
+# The prelim_filing.reject_reason of a filing without any tables with a relevant title, of one with such tables in which
+# no items were found, and of one whose extraction failed.
+REJECT_NO_TABLES = 'no_tables'
+REJECT_NO_ITEMS = 'no_items'
+REJECT_ERROR = 'error'
 
-def _to_filing_df(cik: str, filing: Filing, report: Report, item_df: pd.DataFrame) -> pd.DataFrame:
+# What the outcome of extracting a filing was decided from: the hashes of its documents, separated by spaces, the number
+# of its tables with a relevant title and the number of those with fiscal periods in their header.
+FilingEvidence = namedtuple('FilingEvidence', ['document_hashes', 'titled_tables', 'fiscal_period_tables'])
+
+
+def _to_filing_df(cik: str, filing: Filing, report: Report, item_df: pd.DataFrame,
+                  items: List[PrelimItem] = None) -> pd.DataFrame:
     """ Adds columns to the item_df produced by items_from_tables for a particular filing."""
 
     def item_fpe_offset(item_quarter: int) -> pd.DateOffset:
@@ -59,19 +81,91 @@ def _to_filing_df(cik: str, filing: Filing, report: Report, item_df: pd.DataFram
         fiscal_year=lambda x: x.fiscal_period.str[:4],
         fiscal_quarter=lambda x: x.fiscal_period.str[-1:],
         fpe_date=lambda x: report.fye_date - x.fiscal_quarter.map(lambda q: item_fpe_offset((int(q)))),
-        is_overridden=False
+        is_overridden=False,
+        pattern_version=pattern_version(items)
     ).loc[:, [c.name for c in prelim_statement_table.columns]]
 
 
 def extract_prelim_statement(cik: str, filing: Filing, items: List[PrelimItem] = None) -> pd.DataFrame:
     """ The complete end-to-end extraction for a particular filing. """
-    if filing.type.upper() != '8-K':
+    fetched = fetch_filing(filing)
+    if fetched is None:
         return pd.DataFrame()
 
-    report = query_edgar_for_submission_text(filing.href)
-    submission = load_submission(report.href)
-    item_df = items_from_tables(parse_tables(submission), items=items)
-    return _to_filing_df(cik, filing, report, item_df) if not item_df.empty else item_df
+    report, submission = fetched
+    return extract_prelim_statement_from_submission(cik, filing, report, submission, items)
+
+
+def extract_prelim_statement_from_submission(cik: str, filing: Filing, report: Report, submission: Submission,
+                                             items: List[PrelimItem] = None) -> pd.DataFrame:
+    """ The extraction for a particular filing whose submission has already been downloaded. """
+    item_df = items_from_tables(parse_tables_cached(submission, items=items), items=items)
+    return _to_filing_df(cik, filing, report, item_df, items) if not item_df.empty else item_df
+
+
+def document_hashes(submission: Submission) -> str:
+    """The hashes of the text of the submission's documents, in order and separated by spaces."""
+    return ' '.join(hashlib.sha256(doc.text.encode('utf-8', 'surrogatepass')).hexdigest()[:16]
+                    for doc in submission.documents)
+
+
+def filing_evidence(submission: Submission, tables: List[TableTuple]) -> FilingEvidence:
+    """The evidence of a submission whose tables, parsed for any items, are supplied."""
+    return FilingEvidence(
+        document_hashes=document_hashes(submission),
+        titled_tables=len(tables),
+        fiscal_period_tables=sum(1 for t in tables if not t.df.empty and parse_fiscal_period_row(t.df.iloc[0, :])))
+
+
+def extract_prelim_outcome_from_submission(cik: str, filing: Filing, report: Report, submission: Submission,
+                                           items: List[PrelimItem] = None) -> Tuple[pd.DataFrame, FilingEvidence]:
+    """
+    The extraction for a particular filing whose submission has already been downloaded, with the evidence of its
+    outcome. The tables are parsed for any items, so that the evidence doesn't depend on the items.
+    """
+    tables = parse_tables_cached(submission, items=items, any_items=True)
+    item_df = items_from_tables(tables, items=items)
+    return (_to_filing_df(cik, filing, report, item_df, items) if not item_df.empty else item_df,
+            filing_evidence(submission, tables))
+
+
+def rejection_reason(evidence: FilingEvidence) -> str:
+    """The reject_reason of a filing in which no items were found."""
+    return REJECT_NO_TABLES if evidence.titled_tables == 0 else REJECT_NO_ITEMS
+
+
+def rejection_may_change(reject_reason: Optional[str], titled_tables: Optional[float],
+                         fiscal_period_tables: Optional[float], changed: Optional[Dict[str, list]]) -> bool:
+    """
+    Decides whether the outcome of a filing without items could be different with the current patterns, from its
+    evidence. A filing without titled tables can only gain some from a change to the titles, and one without fiscal
+    periods in them from a change to the titles or fiscal periods. The units only scale the values found. Filings
+    rejected for other reasons, such as an error, may always change, so that they are retried.
+    :param changed: The components changed since the filing was visited (see changed_components), or None if they
+    aren't known.
+    """
+    if reject_reason not in (REJECT_NO_TABLES, REJECT_NO_ITEMS):
+        return True
+    if changed is not None and not changed:
+        return False
+    if changed is None or pd.isnull(titled_tables) or pd.isnull(fiscal_period_tables):
+        return True
+    if titled_tables == 0:
+        return TITLES in changed
+    elif fiscal_period_tables == 0:
+        return TITLES in changed or FISCAL_PERIODS in changed
+    return TITLES in changed or FISCAL_PERIODS in changed or ITEMS in changed
+
+
+def query_changes_since(versions: Iterable[str], items: List[PrelimItem] = None,
+                        conn: Connection = prelim_engine) -> Dict[str, Optional[Dict[str, list]]]:
+    """The components changed since each version of the patterns, or None for the versions that weren't recorded."""
+    current = pattern_components(items)
+    res = {}
+    for version in set(versions):
+        old = query_pattern_components(version, conn) if isinstance(version, str) else None
+        res[version] = changed_components(old, current) if old is not None else None
+    return res
 
 
 def extract_prelim_statements(cik: str, start: date = None, end: date = None,
@@ -230,11 +324,26 @@ class FilingTable(object):
         key = (cik, filing.date, filing.type, filing.href)
         return self.filings.loc[key, :].iloc[0]
 
-    def insert(self, cik: str, filing: Filing, is_prelim: bool, conn: Connection = prelim_engine):
+    def reject_reason(self, cik: str, filing: Filing) -> Optional[str]:
+        key = (cik, filing.date, filing.type, filing.href)
+        return self.filings.loc[key, 'reject_reason'] if self.contains(cik, filing) else None
+
+    def insert(self, cik: str, filing: Filing, is_prelim: bool, reject_reason: str = None,
+               conn: Connection = prelim_engine, version: str = None, evidence: FilingEvidence = None):
+        """Records the outcome of visiting a filing, replacing the outcome of an earlier visit.
+        :param version: The pattern_version of the patterns that produced the outcome.
+        :param evidence: The evidence of the outcome, if the filing's submission was parsed."""
+        values = dict(is_prelim=is_prelim, reject_reason=reject_reason, pattern_version=version,
+                      **(evidence or FilingEvidence(None, None, None))._asdict())
         if not self.contains(cik, filing):
-            stmt = prelim_filing_table.insert().values(
-                cik=cik, filing_date=filing.date, filing_type=filing.type, filing_href=filing.href, is_prelim=is_prelim)
-            conn.execute(stmt)
+            conn.execute(prelim_filing_table.insert().values(
+                cik=cik, filing_date=filing.date, filing_type=filing.type, filing_href=filing.href, **values))
+        else:
+            conn.execute(prelim_filing_table.update().values(**values).where(and_(
+                prelim_filing_table.c.cik == cik,
+                prelim_filing_table.c.filing_date == filing.date,
+                prelim_filing_table.c.filing_type == filing.type,
+                prelim_filing_table.c.filing_href == filing.href)))
 
     def prelim_keys(self):
         return self.filings[self.filings.is_prelim].index.values
@@ -250,7 +359,19 @@ class FilingTable(object):
 
 def load_prelim_statements(cik: str, start: date = None, end: date = None, reload: bool = False,
                            items: List[PrelimItem] = None, conn: Connection = prelim_engine,
-                           fail_on_exception: bool = True) -> bool:
+                           fail_on_exception: bool = True, prefetch_size: int = 4,
+                           filings: List[Filing] = None, triage: bool = False, workers: int = 0) -> bool:
+    """
+    Loads the preliminary statements in the CIK's 8-Ks filed between start and end. The next 'prefetch_size' filings
+    are downloaded in the background while the current filing is parsed. If 'filings' is supplied, for example from
+    query_index_for_filings, they are used instead of querying Edgar for the CIK's filings. If triage is True, filings
+    whose submission header shows they can't be earnings releases are recorded as rejected without being downloaded.
+    Filings rejected by triage are visited again by a load without triage. If 'workers' is more than 0, statements are
+    extracted in a pool of that many processes, and this process only writes them, in the order of the filing dates;
+    'prefetch_size' should then be at least 'workers' to keep them busy. The schema must be up to date and the version
+    of the patterns registered beforehand, once for all of the CIKs, as update_database does (see upgrade_schema and
+    register_pattern_version).
+    """
     logger.info(f"Loading preliminary statements for {cik}.")
 
     if reload:
@@ -267,36 +388,157 @@ def load_prelim_statements(cik: str, start: date = None, end: date = None, reloa
     if end and start >= end:
         return False
 
-    filings = query_edgar_for_filings(cik, "8-K", start=start, end=end, require_xbrl=False)
+    if filings is None:
+        filings = query_edgar_for_filings(cik, "8-K", start=start, end=end, require_xbrl=False)
+    else:
+        filings = [f for f in filings if (start is None or start <= f.date) and (end is None or f.date <= end)]
+
     if not filings:
         return False
 
     filing_table = FilingTable.from_query(cik, start, end, conn)
+    pending_filings = [
+        filing
+        for filing in sorted(filings, key=attrgetter('date'))
+        if not filing_table.contains(cik, filing) or filing_table.is_prelim(cik, filing) or
+           (not triage and filing_table.reject_reason(cik, filing) == REJECT_TRIAGE)
+        if not is_prelim_statement_loaded(conn, cik=cik, filing=filing)
+    ]
 
     loaded = False
-    for filing in sorted(filings, key=attrgetter('date')):
-        if filing_table.contains(cik, filing) and not filing_table.is_prelim(cik, filing):
+    fetched_filings = prefetch_filings(pending_filings, prefetch_size, triage=triage)
+    if workers > 0:
+        for (filing, fetched, error), extracted in extract_in_processes(cik, fetched_filings, items, workers):
+            # The statement is waited for before the write's transaction begins, so that it only spans the writes.
+            wait([extracted] if extracted is not None else [])
+            if save_fetched_filing(cik, filing, fetched, error, filing_table, items, fail_on_exception, conn,
+                                   extracted=extracted):
+                loaded = True
+    else:
+        for filing, fetched, error in fetched_filings:
+            if save_fetched_filing(cik, filing, fetched, error, filing_table, items, fail_on_exception, conn):
+                loaded = True
+    return loaded
+
+
+def extract_in_processes(cik: str, fetched_filings: Iterable[Fetched], items: List[PrelimItem] = None,
+                         workers: int = 4) -> Iterator[Tuple[Fetched, Optional[Future]]]:
+    """
+    Extracts the statements of fetched filings in a pool of 'workers' processes, keeping up to twice as many in
+    flight, and yields each filing with the future of its statement, in the order of the filings. The filings are
+    downloaded by the caller, so that all requests pass through this process's governor.
+    :param fetched_filings: The results of fetch_filing for each filing, as yielded by prefetch_filings.
+    :return: Each Fetched filing, with the future of extract_prelim_outcome_from_submission or, if the filing has
+    no submission to extract from, None.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for fetched in fetched_filings:
+            filing, value, error = fetched
+            extracted = None
+            if error is None and value is not None and not isinstance(value, Triage):
+                extracted = executor.submit(extract_prelim_outcome_from_submission, cik, filing, *value, items)
+            pending.append((fetched, extracted))
+            if len(pending) > 2 * workers:
+                yield pending.popleft()
+
+        while pending:
+            yield pending.popleft()
+
+
+def save_fetched_filing(cik: str, filing: Filing, fetched, error: Optional[Exception], filing_table: FilingTable,
+                        items: List[PrelimItem] = None, fail_on_exception: bool = True,
+                        conn: Connection = prelim_engine, extracted: Future = None) -> bool:
+    """
+    Extracts the preliminary statement from a filing fetched by fetch_filing and saves it, recording the filing as
+    visited either way. Does nothing if the filing's statement has already been loaded.
+    :param fetched: The result of fetch_filing.
+    :param error: The exception raised by fetch_filing, if any.
+    :param extracted: The future of the statement, if it is being extracted elsewhere (see extract_in_processes).
+    :return: True if the filing was a prelim and its statement was saved.
+    """
+    with conn.begin() as c:
+        if is_prelim_statement_loaded(c, cik=cik, filing=filing):
+            return False
+
+        reject_reason = None
+        evidence = None
+        try:
+            if error is not None:
+                raise error
+            if isinstance(fetched, Triage):
+                reject_reason = fetched.reason
+                item_df = pd.DataFrame()
+            elif extracted is not None:
+                item_df, evidence = extracted.result()
+            elif fetched is not None:
+                item_df, evidence = extract_prelim_outcome_from_submission(cik, filing, *fetched, items)
+            else:
+                item_df = pd.DataFrame()
+        except Exception as e:
+            logger.error("Failure loading", filing, str(e))
+            if fail_on_exception:
+                raise e
+            else:
+                reject_reason = REJECT_ERROR
+                item_df = pd.DataFrame()
+
+        is_prelim = not item_df.empty
+        if is_prelim:
+            logger.info(f"Loading filing: {filing}.")
+            item_df.to_sql(prelim_statement_table.name, c, if_exists='append', index=False)
+        elif reject_reason is None and evidence is not None:
+            reject_reason = rejection_reason(evidence)
+
+        filing_table.insert(cik, filing, is_prelim, reject_reason, c, version=pattern_version(items),
+                            evidence=evidence)
+        return is_prelim
+
+
+def load_filing(cik: str, filing: Filing, items: List[PrelimItem] = None, triage: bool = False,
+                fail_on_exception: bool = True, conn: Connection = prelim_engine) -> bool:
+    """
+    Loads the preliminary statement in a single filing, unless the filing has already been visited. See
+    load_prelim_statements.
+    :return: True if the filing was a prelim and its statement was saved.
+    """
+    filing_table = FilingTable.from_query(cik, filing.date, filing.date, conn)
+    if filing_table.contains(cik, filing) and not filing_table.is_prelim(cik, filing):
+        return False
+
+    try:
+        fetched, error = fetch_filing(filing, triage), None
+    except Exception as e:
+        fetched, error = None, e
+    return save_fetched_filing(cik, filing, fetched, error, filing_table, items, fail_on_exception, conn)
+
+
+def triage_recall(ciks: Iterable[str] = None, prefetch_size: int = 4, conn: Connection = prelim_engine) -> pd.DataFrame:
+    """
+    Triages the filings already identified as prelims, to measure how many of them triage would have kept. The recall
+    is the mean of the keep column.
+    :param ciks: The CIKs whose filings to triage, or None for all.
+    :return: a pd.DataFrame of the filings with the outcome of triage.
+    """
+    clauses = [prelim_filing_table.c.is_prelim == True]
+    if ciks is not None:
+        clauses.append(prelim_filing_table.c.cik.in_(list(ciks)))
+    filing_df = pd.read_sql(prelim_filing_table.select().where(and_(*clauses)), conn)
+    filings = [Filing(date=r.filing_date, type=r.filing_type, href=r.filing_href)
+               for r in filing_df.itertuples(index=False)]
+
+    rows = []
+    for (filing, result, error), cik in zip(prefetch(filings, triage_filing, prefetch_size), filing_df.cik):
+        if error is not None:
+            logger.error("Failure triaging", filing, str(error))
             continue
+        rows.append({'cik': cik, 'filing_date': filing.date, 'filing_href': filing.href, 'keep': result.keep,
+                     'items': '; '.join(result.items)})
 
-        with conn.begin() as c:
-            if not is_prelim_statement_loaded(c, cik=cik, filing=filing):
-                try:
-                    item_df = extract_prelim_statement(cik, filing, items)
-                except Exception as e:
-                    logger.error("Failure loading", filing, str(e))
-                    if fail_on_exception:
-                        raise e
-                    else:
-                        item_df = pd.DataFrame()
-
-                is_prelim = not item_df.empty
-                if is_prelim:
-                    logger.info(f"Loading filing: {filing}.")
-                    item_df.to_sql(prelim_statement_table.name, c, if_exists='append', index=False)
-                    loaded = True
-
-                filing_table.insert(cik, filing, is_prelim, conn)
-    return loaded
+    recall_df = pd.DataFrame(rows, columns=['cik', 'filing_date', 'filing_href', 'keep', 'items'])
+    if not recall_df.empty:
+        logger.info(f"Triage recall: {recall_df.keep.mean():.3f} of {len(recall_df)} prelim filings.")
+    return recall_df
 
 
 def save_overrides(filing_df: pd.DataFrame, conn: Connection = prelim_engine):
@@ -330,25 +572,48 @@ def discard_prelim(cik: str, filing_date: date, conn: Connection = prelim_engine
             prelim_filing_table.c.filing_date == filing_date)))
 
 
+def delete_unsettled_filings(cik: str, start: date, end: date, conn: Connection = prelim_engine) -> int:
+    """
+    Deletes the records of the CIK's filings filed between start and end, so that they are visited again, except those
+    of the filings without items whose outcome can't change with the current patterns (see rejection_may_change).
+    :return: The number of records deleted.
+    """
+    t = prelim_filing_table
+    filing_df = pd.read_sql(t.select().where(and_(t.c.cik == cik, between(t.c.filing_date, start, end))), conn)
+    changes = query_changes_since(filing_df.pattern_version.dropna(), conn=conn)
+    unsettled = [
+        row for row in filing_df.itertuples(index=False)
+        if row.is_prelim or rejection_may_change(row.reject_reason, row.titled_tables, row.fiscal_period_tables,
+                                                 changes.get(row.pattern_version))
+    ]
+    logger.info(f"Deleting {len(unsettled)} of {len(filing_df)} filings for {cik}.")
+    with conn.begin() as c:
+        for row in unsettled:
+            c.execute(t.delete().where(and_(
+                t.c.cik == row.cik,
+                t.c.filing_date == pd.Timestamp(row.filing_date).date(),
+                t.c.filing_type == row.filing_type,
+                t.c.filing_href == row.filing_href)))
+    return len(unsettled)
+
+
 def force_reload_prelim(cik: str, filing_date: date, delete_filings=False, conn: Connection = prelim_engine):
     if delete_filings:
-        with conn.begin() as c:
-            c.execute(prelim_filing_table.delete().where(and_(
-                prelim_filing_table.c.cik == cik,
-                prelim_filing_table.c.filing_date == filing_date)))
+        delete_unsettled_filings(cik, filing_date, filing_date, conn)
 
-    load_prelim_statements(cik, start=filing_date - timedelta(days=1), end=filing_date, reload=True)
+    upgrade_schema(conn)
+    register_pattern_version(conn=conn)
+    load_prelim_statements(cik, start=filing_date - timedelta(days=1), end=filing_date, reload=True, conn=conn)
 
 
 def force_reload_prelim_between(cik: str, start: date, end: date, delete_filings=False,
                                 conn: Connection = prelim_engine):
     if delete_filings:
-        with conn.begin() as c:
-            c.execute(prelim_filing_table.delete().where(and_(
-                prelim_filing_table.c.cik == cik,
-                between(prelim_filing_table.c.filing_date, start, end))))
+        delete_unsettled_filings(cik, start, end, conn)
 
-    load_prelim_statements(cik, start=start - timedelta(days=1), end=end, reload=True)
+    upgrade_schema(conn)
+    register_pattern_version(conn=conn)
+    load_prelim_statements(cik, start=start - timedelta(days=1), end=end, reload=True, conn=conn)
 
 
 def run_quality_report(cik: str, regen: bool = False, convert_to_html: bool = False):
@@ -387,20 +652,46 @@ def generate_quality_reports(conn: Connection = prelim_engine, regen: bool = Fal
         run_quality_report(row.cik, regen=regen, convert_to_html=True)
 
 
+def _count_visited_filings(conn: Connection, cik: str) -> int:
+    res = conn.execute(text("select count(*) from prelim_filing where cik = :cik").bindparams(cik=cik))
+    return res.fetchone()[0]
+
+
 def update_database(to: date = datetime.now().date(),
                     num_to_load=None,
-                    conn: Connection = prelim_engine):
+                    use_filing_index: bool = False,
+                    triage: bool = False,
+                    workers: int = 1,
+                    job: str = 'update_database',
+                    conn: Connection = prelim_engine) -> JobProgress:
+    """
+    Loads new preliminary statements for every CIK in the cik table. If use_filing_index is True, the filings are
+    discovered from Edgar's quarterly index files, loaded into the filing_index table, rather than by paging through
+    each CIK's filing list. If triage is True, filings that can't be earnings releases are skipped without being
+    downloaded. See load_prelim_statements. The CIKs are loaded 'workers' at a time, and the progress is kept in the
+    prelim_job table under the name 'job', so an update that is stopped resumes with the CIKs it hadn't finished. See
+    JobScheduler.
+    """
+    upgrade_schema(conn)
+    register_pattern_version(conn=conn)
     cik_df = pd.read_sql("select * from cik c order by c.cik desc", conn)
 
-    loaded = 0
-    for i, c in enumerate(cik_df.itertuples(index=False), start=1):
-        logger.info(c)
-        if load_prelim_statements(c.cik, start=PRELIM_START, end=to, fail_on_exception=False, reload=False):
-            run_quality_report(c.cik)
-            loaded += 1
-            logger.info(f"{loaded} names loaded")
-            if loaded == num_to_load:
-                return
+    with edgar_session():
+        if use_filing_index:
+            load_indexes_between(PRELIM_START, to, conn=conn)
+            cik_filings = query_index_for_filings(cik_df.cik, "8-K", start=PRELIM_START, end=to, conn=conn)
+        else:
+            cik_filings = {}
+
+        def load(cik: str) -> JobResult:
+            visited = _count_visited_filings(conn, cik)
+            loaded = load_prelim_statements(cik, start=PRELIM_START, end=to, fail_on_exception=False, reload=False,
+                                            filings=cik_filings.get(cik), triage=triage, conn=conn)
+            return JobResult(filings=_count_visited_filings(conn, cik) - visited, loaded=loaded)
+
+        scheduler = JobScheduler(job, workers=workers, conn=conn)
+        scheduler.schedule(cik_df.cik)
+        return scheduler.run(load, max_loaded=num_to_load, on_loaded=run_quality_report)
 
 
 if __name__ == '__main__':
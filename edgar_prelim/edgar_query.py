@@ -1,20 +1,22 @@
 import logging
+import re
 from collections import namedtuple
 from datetime import date, datetime
 from types import FunctionType
-from typing import Iterator, List
+from typing import Iterator, List, Optional
 from xml.etree import ElementTree
 from xml.etree.ElementTree import ParseError
 
 import requests
-from requests_html import HTMLSession
-from retrying import retry
+from requests_html import HTML
+
+from edgar_prelim.edgar_http import http_get, governed_retry
 
 logger = logging.getLogger(__name__)
 
 
 # noinspection SpellCheckingInspection
-@retry(stop_max_attempt_number=7, wait_exponential_multiplier=1000, wait_exponential_max=10000)
+@governed_retry()
 def _query_edgar_for_xml(cik_or_ticker: str,
                          filing_type: str = "",
                          before: date = None,
@@ -40,7 +42,7 @@ def _query_edgar_for_xml(cik_or_ticker: str,
         "start": str(start),
         "output": "xml",
     }
-    result = requests.get(url, params=payload)
+    result = http_get(url, params=payload)
     if result.status_code != requests.codes.ok:
         result.raise_for_status()
     else:
@@ -214,17 +216,16 @@ Report = namedtuple("Report", ['fpe_date', 'fye_date', 'fiscal_period', 'href'])
 
 
 # noinspection PyUnresolvedReferences
-@retry(stop_max_attempt_number=7, wait_exponential_multiplier=1000, wait_exponential_max=10000)
+@governed_retry()
 def _query_edgar_for_filing_document(filing_href: str, extract_href_from_html: FunctionType) -> Report:
     """
     Extracts a report from a filing page. The supplied function selects the relevant link from the page.
     """
-    session = HTMLSession()
-    result = session.get(filing_href)
+    result = http_get(filing_href)
     if result.status_code != requests.codes.ok:
         result.raise_for_status()
     else:
-        html = result.html
+        html = HTML(url=result.url, html=result.content, default_encoding=result.encoding)
         fpe_date = _fiscal_period_end_from_filing_html(html)
         fye_date = _fiscal_year_end_from_filing_html(html, fpe_date)
         return Report(
@@ -313,6 +314,12 @@ def _fiscal_year_end_from_filing_html(html, fpe_date: date) -> date:
         "/text()"
     )[0]
 
+    return fiscal_year_end_from_mmdd(fye, fpe_date)
+
+
+def fiscal_year_end_from_mmdd(fye: str, fpe_date: date) -> date:
+    """From a fiscal year end in Edgar's MMDD form and the fpe_date, returns the fiscal year end date following the
+    fpe_date."""
     if len(fye) < 3 or len(fye) > 4:
         return fpe_date
 
@@ -332,3 +339,43 @@ def _fiscal_year_end_from_filing_html(html, fpe_date: date) -> date:
                 raise e
     else:
         raise ValueError(f"Can't deal with Fiscal Year End {fye}.")
+
+
+def submission_text_href(filing_href: str) -> str:
+    """
+    Derives the href of a filing's complete submission text file from the href of its index page, both of which are
+    named for the accession number, e.g. .../000104746918001117/0001047469-18-001117-index.htm becomes
+    .../000104746918001117/0001047469-18-001117.txt
+    """
+    match = re.match(r'^(.*/)(\d{10}-\d{2}-\d{6})-index\.html?$', filing_href)
+    if not match:
+        raise ValueError(f"Not a filing index href: {filing_href}")
+    return f'{match.group(1)}{match.group(2)}.txt'
+
+
+def report_from_submission_header(header: str, href: str) -> Optional[Report]:
+    """
+    Builds a report from the SEC-HEADER of a submission text file, which carries the same period of report and fiscal
+    year end as the filing's index page. Returns None if the header lacks either of them.
+    :param header: The text of the submission's SEC-HEADER.
+    :param href: The href of the submission text file.
+    """
+    period = re.search(r'CONFORMED PERIOD OF REPORT:\s*(\d{8})', header)
+    if not period:
+        return None
+    fpe_date = datetime.strptime(period.group(1), '%Y%m%d').date()
+
+    form = re.search(r'CONFORMED SUBMISSION TYPE:\s*(\S+)', header)
+    if form and form.group(1).endswith('10-K'):
+        fye_date = fpe_date
+    else:
+        fye = re.search(r'FISCAL YEAR END:\s*(\d+)', header)
+        if not fye:
+            return None
+        fye_date = fiscal_year_end_from_mmdd(fye.group(1), fpe_date)
+
+    return Report(
+        fpe_date=fpe_date,
+        fye_date=fye_date,
+        fiscal_period=FiscalPeriod.from_fpe_date(fye_date, fpe_date),
+        href=href)
@@ -1,5 +1,8 @@
 import re
+import sre_constants
+import sre_parse
 from re import Pattern
+from typing import Iterable, List, FrozenSet, Tuple, Iterator
 
 HYPHEN = r'[—\x97\x96–-]'
 FOOTNOTE = r'(?:\s*(?:\([\w$]{1,2}\)|\*))*'
@@ -10,6 +13,10 @@ UNAUDITED = rf'(?:-*\s*{UNAUDITED_EXACT}\s*)?:?\s*'
 APOSTROPHE_LIST = ["'", '\x92', '’']
 APOSTROPHE = rf"[{''.join(APOSTROPHE_LIST)}]"
 
+# The characters of lower case text that a case insensitive pattern matches to an ASCII letter that they are not
+# lowered to: dotless i, long s, and the combining dot that follows the i to which a dotted capital I is lowered.
+_RE_CASELESS_ASCII = re.compile('[\u0131\u017f\u0307]')
+
 
 def allow_space_between_letters(pattern: str) -> str:
     """Alters a regex pattern so that optional spaces can appear between any letter."""
@@ -31,3 +38,135 @@ def is_hyphen(src_value: str) -> bool:
 
 def re_compile(pattern: str) -> Pattern:
     return re.compile(allow_space_between_letters(pattern))
+
+
+def _is_space(op, av) -> bool:
+    if op is sre_constants.IN:
+        return len(av) == 1 and av[0] == (sre_constants.CATEGORY, sre_constants.CATEGORY_SPACE)
+    elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        return len(av[2]) == 1 and _is_space(*av[2][0])
+    else:
+        return False
+
+
+def _required_literals(items) -> List[FrozenSet[str]]:
+    """
+    The literals that any match of the parsed regex must contain once whitespace is removed from the text, as a list of
+    clauses at least one literal of each of which must be present. Whitespace in the regex continues a literal, as
+    whitespace is removed from the text, so that a pattern like allow_space_between_letters('net\\s+income') requires
+    'netincome'.
+    """
+    clauses = []
+    run = []
+
+    def end_run():
+        if run:
+            clauses.append(frozenset([''.join(run)]))
+            run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            if not chr(av).isspace():
+                run.append(chr(av))
+        elif _is_space(op, av):
+            continue
+        elif op is sre_constants.SUBPATTERN:
+            end_run()
+            clauses.extend(_required_literals(av[-1]))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            end_run()
+            if av[0] >= 1:
+                clauses.extend(_required_literals(av[2]))
+        elif op is sre_constants.BRANCH:
+            end_run()
+            branches = [_required_literals(branch) for branch in av[1]]
+            if all(branches):
+                # Any one of the clauses of a branch will do, so take the one whose shortest literal is the longest.
+                clauses.append(frozenset(
+                    literal
+                    for branch in branches
+                    for literal in max(branch, key=lambda clause: min(map(len, clause)))
+                ))
+        else:
+            end_run()
+    end_run()
+    return clauses
+
+
+def required_literals(pattern: Pattern) -> List[FrozenSet[str]]:
+    """
+    The literals that any match of the pattern must contain, in text from which whitespace has been removed, as a list
+    of clauses, each satisfied by any one of its literals. The literals of a case insensitive pattern are lower case,
+    for lower case text.
+    """
+    clauses = _required_literals(sre_parse.parse(pattern.pattern, pattern.flags))
+    if pattern.flags & re.IGNORECASE:
+        return [frozenset(literal.lower() for literal in clause) for clause in clauses]
+    else:
+        return clauses
+
+
+class PatternSet(tuple):
+    """
+    A tuple of patterns that can be searched together, for lower case text, more quickly than one at a time. The
+    literals that a match of each pattern must contain are extracted from it, and a text is only searched with the
+    patterns whose literals it contains. The results for recent texts are remembered, as the same text is searched for
+    the title of each table that follows it. Case insensitive patterns are screened by their lower case literals, except
+    in the rare text with characters that they match to an ASCII letter without being lowered to it.
+    """
+
+    def __new__(cls, patterns: Iterable[Pattern], cache_size: int = 10000):
+        return super().__new__(cls, patterns)
+
+    def __init__(self, patterns: Iterable[Pattern], cache_size: int = 10000) -> None:
+        super().__init__()
+        clauses = [required_literals(p) for p in self]
+
+        # Each clause is a bit, and a literal sets the bits of the clauses it satisfies.
+        literal_masks = {}
+        self._pattern_masks = []
+        bit = 1
+        for pattern_clauses in clauses:
+            pattern_mask = 0
+            for clause in pattern_clauses:
+                for literal in clause:
+                    literal_masks[literal] = literal_masks.get(literal, 0) | bit
+                pattern_mask |= bit
+                bit <<= 1
+            self._pattern_masks.append(pattern_mask)
+
+        self._literal_masks = tuple(literal_masks.items())
+        self._any_literal = re.compile('|'.join(map(re.escape, literal_masks))) if literal_masks else None
+        self._unscreened = tuple(i for i, pattern_mask in enumerate(self._pattern_masks) if not pattern_mask)
+        self._ignore_case = any(p.flags & re.IGNORECASE for p in self)
+        self._cache = {}
+        self._cache_size = cache_size
+
+    def search(self, lower: str) -> Tuple[int, ...]:
+        """Returns the indexes of the patterns that match the lower case text, in order."""
+        matched = self._cache.get(lower)
+        if matched is None:
+            if len(self._cache) >= self._cache_size:
+                self._cache.clear()
+            matched = self._cache[lower] = tuple(self._search(lower))
+        return matched
+
+    def _search(self, lower: str) -> Iterator[int]:
+        return (i for i in self.candidates(''.join(lower.split())) if self[i].search(lower))
+
+    def candidates(self, text: str) -> Tuple[int, ...]:
+        """Returns the indexes of the patterns whose literals are all found in the lower case text, from which
+        whitespace has been removed. Only these patterns can match the text."""
+        if self._ignore_case and _RE_CASELESS_ASCII.search(text):
+            return tuple(range(len(self)))
+
+        if self._any_literal is None or not self._any_literal.search(text):
+            # Most text contains none of the literals, and can only match the patterns that require none.
+            return self._unscreened
+
+        satisfied = 0
+        for literal, mask in self._literal_masks:
+            if literal in text:
+                satisfied |= mask
+
+        return tuple(i for i, pattern_mask in enumerate(self._pattern_masks) if pattern_mask & satisfied == pattern_mask)
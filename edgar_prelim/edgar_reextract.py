@@ -0,0 +1,309 @@
+import sys
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, List, Optional, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, or_, between
+from sqlalchemy.engine import Connection
+
+from edgar_prelim.edgar_archive import SubmissionArchive, get_submission_archive
+from edgar_prelim.edgar_db import *
+from edgar_prelim.edgar_fetch import Fetched, prefetch
+from edgar_prelim.edgar_fingerprint import register_pattern_version, DependencyScreen
+from edgar_prelim.edgar_items import PrelimItem
+from edgar_prelim.edgar_load import REJECT_NO_ITEMS, REJECT_NO_TABLES, FilingEvidence, \
+    extract_prelim_outcome_from_submission, rejection_reason, rejection_may_change, query_changes_since, \
+    document_hashes
+from edgar_prelim.edgar_query import Filing, report_from_submission_header, submission_text_href
+from edgar_prelim.edgar_re import *
+from edgar_prelim.edgar_submission import document_plain_text, submission_from_archive
+from edgar_prelim.logging_config import init_logging
+
+logger = init_logging(__name__)
+
+"""
+Re-extracts the statements of filings after the patterns change, from the submission archive rather than Edgar, and
+reports what changed. Only the filings extracted with another version of the patterns are considered (see
+edgar_fingerprint), and of those only the ones whose documents contain the literals of a pattern that changed are
+extracted again. The others can't have a different result, and are just marked with the current version. Filings
+without items whose evidence shows their outcome can't change (see rejection_may_change) are marked without even being
+read, whether or not they were archived.
+
+    python -m edgar_prelim.edgar_reextract > changes.csv
+"""
+
+# The outcome of re-extracting a filing: its result couldn't depend on the patterns that changed, it was extracted
+# again with the same or a different result, it wasn't archived, or its extraction failed. Filings that weren't archived
+# or failed are left as they were.
+OUTCOME_SCREENED = 'screened'
+OUTCOME_UNCHANGED = 'unchanged'
+OUTCOME_CHANGED = 'changed'
+OUTCOME_NOT_ARCHIVED = 'not_archived'
+OUTCOME_ERROR = 'error'
+
+# The filings considered by a re-extraction, with their outcome, and the items of their statements that were added,
+# removed or changed, with their old and new fiscal periods and values.
+ReextractResult = namedtuple('ReextractResult', ['filings', 'changes'])
+
+# The columns of a statement's item that are compared between extractions.
+_COMPARED_COLUMNS = ['fiscal_period', 'item_value', 'item_rank', 'table_rank', 'src_table', 'src_row', 'src_column',
+                     'src_value', 'src_units']
+
+_CHANGE_COLUMNS = ['cik', 'filing_date', 'filing_href', 'item', 'change', 'old_fiscal_period', 'new_fiscal_period',
+                   'old_value', 'new_value']
+
+
+def _filing(row) -> Filing:
+    return Filing(date=pd.Timestamp(row.filing_date).date(), type=row.filing_type, href=row.filing_href)
+
+
+def _of_filing(table, row):
+    return and_(table.c.cik == row.cik,
+                table.c.filing_date == pd.Timestamp(row.filing_date).date(),
+                table.c.filing_type == row.filing_type,
+                table.c.filing_href == row.filing_href)
+
+
+def _submission_href(filing_href: str) -> str:
+    try:
+        return submission_text_href(filing_href)
+    except ValueError:
+        return filing_href
+
+
+def _query_stale_filings(version: str, ciks: Iterable[str] = None, start: date = None, end: date = None,
+                         conn: Connection = prelim_engine) -> pd.DataFrame:
+    """The filings whose outcome came from their patterns, not triage or an error, and from another version of them."""
+    t = prelim_filing_table
+    clauses = [or_(t.c.pattern_version == None, t.c.pattern_version != version),
+               or_(t.c.reject_reason == None, t.c.reject_reason.in_([REJECT_NO_ITEMS, REJECT_NO_TABLES]))]
+    if ciks is not None:
+        clauses.append(t.c.cik.in_(list(ciks)))
+    if start is not None or end is not None:
+        clauses.append(between(t.c.filing_date, start if start else PRELIM_START, end if end else EOT))
+    return pd.read_sql(t.select().where(and_(*clauses)).order_by(t.c.cik, t.c.filing_date), conn)
+
+
+def _comparable(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    elif isinstance(value, (int, float, Decimal, np.number)):
+        return round(float(value), 5)
+    else:
+        return str(value)
+
+
+def _diff_statements(row, old_df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+    """The items of a filing's statement that were added, removed or changed from old_df to new_df."""
+    old = old_df.set_index('item') if not old_df.empty else pd.DataFrame(columns=_COMPARED_COLUMNS)
+    new = new_df.set_index('item') if not new_df.empty else pd.DataFrame(columns=_COMPARED_COLUMNS)
+
+    rows = []
+    for item in sorted(set(old.index) | set(new.index)):
+        if item not in new.index:
+            change = 'removed'
+        elif item not in old.index:
+            change = 'added'
+        elif any(_comparable(old.at[item, c]) != _comparable(new.at[item, c]) for c in _COMPARED_COLUMNS):
+            change = 'changed'
+        else:
+            continue
+
+        rows.append(dict(
+            cik=row.cik,
+            filing_date=row.filing_date,
+            filing_href=row.filing_href,
+            item=item,
+            change=change,
+            old_fiscal_period=old.at[item, 'fiscal_period'] if item in old.index else None,
+            new_fiscal_period=new.at[item, 'fiscal_period'] if item in new.index else None,
+            old_value=_comparable(old.at[item, 'item_value']) if item in old.index else None,
+            new_value=_comparable(new.at[item, 'item_value']) if item in new.index else None))
+    return pd.DataFrame(rows, columns=_CHANGE_COLUMNS)
+
+
+def _save_statement(row, item_df: pd.DataFrame, evidence: FilingEvidence, overridden: List[str], version: str,
+                    conn: Connection):
+    """Replaces the statement of a filing, except for its overridden items."""
+    t = prelim_statement_table
+    with conn.begin() as c:
+        c.execute(t.delete().where(and_(_of_filing(t, row), t.c.is_overridden == False)))
+        if not item_df.empty:
+            item_df[~item_df.item.isin(overridden)].to_sql(t.name, c, if_exists='append', index=False)
+        c.execute(prelim_filing_table.update().where(_of_filing(prelim_filing_table, row)).values(
+            is_prelim=not item_df.empty,
+            reject_reason=None if not item_df.empty else rejection_reason(evidence),
+            pattern_version=version,
+            **evidence._asdict()))
+
+
+def _mark_version(row, version: str, conn: Connection, evidence: FilingEvidence = None):
+    """Marks the filing and its statement as produced by the version, without changing their outcome, and records the
+    evidence of the outcome, if the filing was extracted again."""
+    t = prelim_statement_table
+    values = dict(pattern_version=version)
+    if evidence is not None:
+        values.update(evidence._asdict())
+        if not row.is_prelim:
+            values.update(reject_reason=rejection_reason(evidence))
+    with conn.begin() as c:
+        c.execute(t.update().where(and_(_of_filing(t, row), t.c.is_overridden == False)).values(
+            pattern_version=version))
+        c.execute(prelim_filing_table.update().where(_of_filing(prelim_filing_table, row)).values(**values))
+
+
+def _extract_all(fetched_rows: Iterable[Fetched], items: List[PrelimItem] = None,
+                 workers: int = 4) -> Iterator[Tuple[Fetched, Optional[Tuple[pd.DataFrame, FilingEvidence]],
+                                                     Optional[Exception]]]:
+    """
+    Extracts the statement of each fetched filing that needs it, in a pool of 'workers' processes if there are any,
+    keeping up to twice as many in flight, and yields each with its statement and evidence or the exception that
+    extracting it raised, in order.
+    """
+    def extract(fetched: Fetched):
+        (row, _), (_, value), _ = fetched
+        return extract_prelim_outcome_from_submission(row.cik, _filing(row), *value, items)
+
+    def needs_extraction(fetched: Fetched) -> bool:
+        return fetched.error is None and fetched.value[1] is not None
+
+    if workers < 1:
+        for fetched in fetched_rows:
+            try:
+                yield fetched, extract(fetched) if needs_extraction(fetched) else None, None
+            except Exception as e:
+                yield fetched, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for fetched in fetched_rows:
+            row, _ = fetched.key
+            extracted = None
+            if needs_extraction(fetched):
+                extracted = executor.submit(extract_prelim_outcome_from_submission, row.cik, _filing(row),
+                                            *fetched.value[1], items)
+            pending.append((fetched, extracted))
+
+            while pending and (len(pending) > 2 * workers or pending[0][1] is None):
+                done, extracted = pending.popleft()
+                try:
+                    yield done, extracted.result() if extracted is not None else None, None
+                except Exception as e:
+                    yield done, None, e
+
+        while pending:
+            done, extracted = pending.popleft()
+            try:
+                yield done, extracted.result() if extracted is not None else None, None
+            except Exception as e:
+                yield done, None, e
+
+
+def reextract_prelim_statements(ciks: Iterable[str] = None, start: date = None, end: date = None,
+                                items: List[PrelimItem] = None, workers: int = 4, archive: SubmissionArchive = None,
+                                dry_run: bool = False, conn: Connection = prelim_engine) -> ReextractResult:
+    """
+    Re-extracts the statements of the filings whose result could depend on the patterns that changed since they were
+    extracted, reading their submissions from the archive, and replaces them. Overridden items are kept.
+    :param ciks: The CIKs whose filings to re-extract, or None for all.
+    :param start: If supplied, only filings filed on or after start are re-extracted.
+    :param end: If supplied, only filings filed on or before end are re-extracted.
+    :param items: The items to extract, prelim_items by default.
+    :param workers: The number of processes extracting statements, or 0 to extract them in this one.
+    :param archive: The archive of submissions, by default the one that load_submission uses.
+    :param dry_run: If True, reports what would change without changing anything.
+    """
+    archive = archive if archive is not None else get_submission_archive()
+    if archive is None:
+        raise ValueError("Re-extraction reads submissions from the archive. Set EDGAR_ARCHIVE_DIR.")
+
+    upgrade_schema(conn)
+    version = register_pattern_version(items, conn)
+    filing_df = _query_stale_filings(version, ciks, start, end, conn)
+    logger.info(f"Considering {len(filing_df)} filings extracted with other versions of the patterns.")
+
+    # A filing extracted with a version that wasn't recorded has no screen, and is always extracted again.
+    changes = query_changes_since(filing_df.pattern_version.dropna(), items, conn)
+    screens = {old_version: DependencyScreen(changed) if changed is not None else None
+               for old_version, changed in changes.items()}
+
+    def read(row_entry):
+        row, entry = row_entry
+        if row.reject_reason is not None and not rejection_may_change(
+                row.reject_reason, row.titled_tables, row.fiscal_period_tables, changes.get(row.pattern_version)):
+            return OUTCOME_SCREENED, None
+        if entry is None:
+            return OUTCOME_NOT_ARCHIVED, None
+
+        # The screen only holds for the documents whose outcome was recorded.
+        submission = submission_from_archive(archive, entry)._replace(raw=None)
+        screen = screens.get(row.pattern_version)
+        recorded = pd.isnull(row.document_hashes) or row.document_hashes == document_hashes(submission)
+        if screen is not None and recorded and \
+                not screen.may_depend(document_plain_text(doc.text) for doc in submission.documents):
+            return OUTCOME_SCREENED, None
+
+        report = report_from_submission_header(submission.header, _submission_href(row.filing_href))
+        if report is None:
+            raise ValueError(f"No period of report in the header of {entry.accession}.")
+        return None, (report, submission)
+
+    entries = {}
+    for cik in filing_df.cik.unique():
+        entries.update((entry.accession, entry) for entry in archive.entries(cik))
+
+    def archived(row):
+        accession = re.search(r'(\d{10}-\d{2}-\d{6})', row.filing_href)
+        return entries.get(accession.group(1)) if accession else None
+
+    filing_rows = []
+    change_dfs = []
+    rows = [(row, archived(row)) for row in filing_df.itertuples(index=False)]
+    for ((row, _), value, error), extracted, extract_error in _extract_all(prefetch(rows, read, max(workers, 1)),
+                                                                           items, workers):
+        error = error or extract_error
+        if error is not None:
+            logger.error(f"Failure re-extracting {row.filing_href}: {error}")
+            outcome = OUTCOME_ERROR
+        elif extracted is None:
+            outcome = value[0]
+            if outcome == OUTCOME_SCREENED and not dry_run:
+                _mark_version(row, version, conn)
+        else:
+            item_df, evidence = extracted
+            statement_df = pd.read_sql(prelim_statement_table.select().where(
+                _of_filing(prelim_statement_table, row)), conn)
+            overridden = statement_df[statement_df.is_overridden == True].item.tolist()
+            change_df = _diff_statements(row, statement_df[statement_df.is_overridden != True],
+                                        item_df[~item_df.item.isin(overridden)] if not item_df.empty else item_df)
+            outcome = OUTCOME_CHANGED if not change_df.empty else OUTCOME_UNCHANGED
+            change_dfs.append(change_df)
+            if not dry_run:
+                if outcome == OUTCOME_CHANGED:
+                    _save_statement(row, item_df, evidence, overridden, version, conn)
+                else:
+                    _mark_version(row, version, conn, evidence)
+
+        filing_rows.append(dict(cik=row.cik, filing_date=row.filing_date, filing_type=row.filing_type,
+                                filing_href=row.filing_href, pattern_version=row.pattern_version, outcome=outcome,
+                                error=str(error) if error is not None else None))
+
+    result = ReextractResult(
+        filings=pd.DataFrame(filing_rows, columns=['cik', 'filing_date', 'filing_type', 'filing_href',
+                                                   'pattern_version', 'outcome', 'error']),
+        changes=pd.concat(change_dfs, sort=False) if change_dfs else pd.DataFrame(columns=_CHANGE_COLUMNS))
+
+    outcomes = result.filings.outcome.value_counts().to_dict()
+    logger.info(f"Re-extracted with {version}{' (dry run)' if dry_run else ''}: "
+                + ', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items()))
+                + f"; {len(result.changes)} items changed.")
+    return result
+
+
+if __name__ == '__main__':
+    reextract_prelim_statements().changes.to_csv(sys.stdout, index=False)
@@ -1,34 +1,63 @@
+import codecs
+import html
 from collections import namedtuple
-from functools import partial
+from datetime import datetime
+from functools import lru_cache
 from itertools import zip_longest, takewhile
 from operator import attrgetter, itemgetter
-from typing import Iterator, Optional, List, Iterable, Tuple
+from typing import Iterator, Optional, List, Iterable, Tuple, FrozenSet, Callable
 
 import numpy as np
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
-from retrying import retry
 
-from edgar_prelim.bs4_util import read_table_tag, sanitize_text
-from edgar_prelim.edgar_fiscal_period import has_fiscal_period, is_header_part, parse_fiscal_period_row
-from edgar_prelim.edgar_items import PrelimItem, prelim_items
+from edgar_prelim.bs4_util import read_table_tag, sanitize_text, TextIndex
+from edgar_prelim.edgar_archive import SubmissionArchive, ArchiveEntry, get_submission_archive
+from edgar_prelim.edgar_cell import classify_cell, classify_cells, has_fiscal_period, is_header_cell, \
+    parse_item_values, CELL_HEADER_PART, CELL_ROW_PART, CELL_UNITS, CELL_UNAUDITED
+from edgar_prelim.edgar_fiscal_period import parse_fiscal_period_row
+from edgar_prelim.edgar_http import http_stream, governed_retry
+from edgar_prelim.edgar_items import PrelimItem, prelim_items, ItemMatcher, prelim_item_matcher
 from edgar_prelim.edgar_re import *
-from edgar_prelim.edgar_title import title_from_table_tag, is_units, units_from_table
+from edgar_prelim.edgar_title import title_from_table_tag, units_from_table, may_contain_title
 from edgar_prelim.func_util import head_option
+from edgar_prelim.logging_config import init_logging
 
+logger = init_logging(__name__)
+
+# The raw text of a submission is only kept when it is parsed from a string. Submissions read from a stream have a raw
+# of None, and in either case the documents are only the html documents.
 Submission = namedtuple('Submission', ['cik', 'raw', 'number', 'header', 'documents'])
 SubmissionDocument = namedtuple("SubmissionDocument", ['type', 'filename', 'text'])
 
 
-@retry(stop_max_attempt_number=7, wait_exponential_multiplier=1000, wait_exponential_max=10000)
+# The accession number in the url of a submission text file.
+_RE_SUBMISSION_ACCESSION = re.compile(r'(\d{10}-\d{2}-\d{6})\.txt$')
+
+
+@governed_retry()
 def load_submission(href: str) -> Submission:
-    """ Downloads and parses a submission into its component documents."""
-    result = requests.get(href)
-    if result.status_code != requests.codes.ok:
-        result.raise_for_status()
-    else:
-        return parse_submission(result.text)
+    """
+    Downloads and parses a submission into its component documents, reading it incrementally. If there is a submission
+    archive, a submission that it has is read from it instead, and one that it doesn't is archived once downloaded.
+    """
+    archive = get_submission_archive()
+    accession = _RE_SUBMISSION_ACCESSION.search(href) if archive is not None else None
+    if accession is not None:
+        entry = archive.entry(accession.group(1))
+        if entry is not None:
+            return submission_from_archive(archive, entry)._replace(raw=None)
+
+    with http_stream(href) as (result, chunks):
+        if result.status_code != requests.codes.ok:
+            result.raise_for_status()
+        elif accession is not None:
+            content = b''.join(chunks)
+            return archive_submission(archive, accession.group(1), content, result.encoding or 'ISO-8859-1')._replace(
+                raw=None)
+        else:
+            return read_submission(chunks, result.encoding or 'ISO-8859-1')
 
 
 def _iter_submission_tags(raw: str, tag: str) -> Iterator[str]:
@@ -42,21 +71,162 @@ def _iter_submission_tags(raw: str, tag: str) -> Iterator[str]:
         start_index = raw.find(start_tag, end_index)
 
 
+def _is_html_document(doc_type: str, filename: str) -> bool:
+    return doc_type != 'GRAPHIC' and (filename.endswith(".htm") or filename.endswith(".html"))
+
+
+class SubmissionSplitter(object):
+    """
+    Splits submission text, fed in chunks of any size, into its header and its html documents. Only the document
+    currently being read is buffered, and documents that are dropped (graphics, pdfs, xbrl, plain text) are skipped
+    over without being buffered at all.
+    """
+
+    _HEADER, _BETWEEN, _DOCUMENT_HEAD, _DOCUMENT, _SKIPPED = range(5)
+
+    def __init__(self) -> None:
+        self.number = None
+        self.header = None
+        self._state = self._HEADER
+        self._pending = ''
+        self._parts = []
+        self._doc_type = None
+        self._filename = None
+
+    def _scan(self, text: str, tag: str, keep: bool) -> int:
+        """
+        Returns the index of the tag in text, or -1. While the tag has not been found, the text is appended to the
+        buffered parts if keep is True and discarded otherwise, holding back just enough to find a tag that is split
+        across chunks.
+        """
+        index = text.find(tag)
+        if index == -1:
+            split = max(len(text) - len(tag) + 1, 0)
+            if keep:
+                self._parts.append(text[:split])
+            self._pending = text[split:]
+        return index
+
+    def feed(self, text: str) -> Iterator[SubmissionDocument]:
+        """Consumes the next chunk of the submission, yielding the html documents that it completes."""
+        text = self._pending + text
+        self._pending = ''
+        while True:
+            if self._state == self._HEADER:
+                end = text.find('</SEC-HEADER>')
+                if end == -1:
+                    self._pending = text
+                    return
+                end += len('</SEC-HEADER>')
+                self.number = re.search(r'<SEC-DOCUMENT>(.+)\n', text).group(1)
+                self.header = list(_iter_submission_tags(text[:end], 'SEC-HEADER'))[0]
+                text = text[end:]
+                self._state = self._BETWEEN
+
+            elif self._state == self._BETWEEN:
+                start = self._scan(text, '<DOCUMENT>', keep=False)
+                if start == -1:
+                    return
+                text = text[start + len('<DOCUMENT>'):]
+                self._state = self._DOCUMENT_HEAD
+
+            elif self._state == self._DOCUMENT_HEAD:
+                ends = [i for i in (text.find('<TEXT>'), text.find('</DOCUMENT>')) if i != -1]
+                if not ends:
+                    self._pending = text
+                    return
+                head = text[:min(ends)]
+                doc_type = re.search(r'<TYPE>(.+)\s', head)
+                filename = re.search(r'<FILENAME>(.+)\s', head)
+                if doc_type and filename and _is_html_document(doc_type.group(1), filename.group(1)):
+                    self._doc_type, self._filename = doc_type.group(1), filename.group(1)
+                    self._state = self._DOCUMENT
+                else:
+                    self._state = self._SKIPPED
+
+            elif self._state == self._DOCUMENT:
+                end = self._scan(text, '</DOCUMENT>', keep=True)
+                if end == -1:
+                    return
+                self._parts.append(text[:end])
+                doc = ''.join(self._parts)
+                self._parts = []
+                for txt in _iter_submission_tags(doc, 'TEXT'):
+                    yield SubmissionDocument(self._doc_type, self._filename, txt)
+                text = text[end + len('</DOCUMENT>'):]
+                self._state = self._BETWEEN
+
+            else:
+                end = self._scan(text, '</DOCUMENT>', keep=False)
+                if end == -1:
+                    return
+                text = text[end + len('</DOCUMENT>'):]
+                self._state = self._BETWEEN
+
+
+def _submission_from_splitter(splitter: SubmissionSplitter, documents: List[SubmissionDocument],
+                              raw: Optional[str]) -> Submission:
+    if splitter.header is None:
+        raise ValueError('Submission has no SEC-HEADER.')
+    cik = re.search(r'CENTRAL INDEX KEY:\s+(\d+)', splitter.header).group(1)
+    return Submission(cik, raw, splitter.number, splitter.header, documents)
+
+
+def read_submission(chunks: Iterable[bytes], encoding: str = 'ISO-8859-1') -> Submission:
+    """Parses a submission from the chunks of its encoded text, as they arrive."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    splitter = SubmissionSplitter()
+    documents = [doc for chunk in chunks for doc in splitter.feed(decoder.decode(chunk))]
+    documents.extend(splitter.feed(decoder.decode(b'', final=True)))
+    return _submission_from_splitter(splitter, documents, None)
+
+
 def parse_submission(raw: str) -> Submission:
     """Parses submission text into a Submission tuple."""
+    splitter = SubmissionSplitter()
+    return _submission_from_splitter(splitter, list(splitter.feed(raw)), raw)
+
+
+def archive_submission(archive: SubmissionArchive, accession: str, content: bytes,
+                       encoding: str = 'ISO-8859-1') -> Submission:
+    """Parses the encoded text of a submission and adds it to the archive, indexed by the offsets of its parts."""
+    raw = content.decode(encoding, errors='replace')
+    submission = parse_submission(raw)
+
+    header_start = raw.find('<SEC-HEADER>') + len('<SEC-HEADER>')
+    documents = []
+    start = header_start + len(submission.header)
+    for doc in submission.documents:
+        # The documents are in the order of the text, so each is found after the one before.
+        start = raw.find(doc.text, start)
+        documents.append((doc.type, doc.filename, start, start + len(doc.text)))
+        start += len(doc.text)
+
+    filed = re.search(r':\s*(\d{8})', submission.number)
+    archive.put(ArchiveEntry(
+        accession=accession,
+        cik=submission.cik,
+        filing_date=datetime.strptime(filed.group(1), '%Y%m%d').date() if filed else None,
+        path=None,
+        offset=None,
+        length=None,
+        encoding=encoding,
+        header=(header_start, header_start + len(submission.header)),
+        documents=documents), content)
+    return submission
+
+
+def submission_from_archive(archive: SubmissionArchive, entry: ArchiveEntry) -> Submission:
+    """
+    Reads an archived submission, slicing its header and documents out of its text at their archived offsets rather
+    than splitting it again. The result is the same as parse_submission of the text.
+    """
+    raw = archive.read(entry).decode(entry.encoding, errors='replace')
     number = re.search(r'<SEC-DOCUMENT>(.+)\n', raw).group(1)
-    header = list(_iter_submission_tags(raw, 'SEC-HEADER'))[0]
-    cik = re.search(r'CENTRAL INDEX KEY:\s+(\d+)', header).group(1)
-    documents = [
-        SubmissionDocument(doc_type, filename, txt)
-        for doc in _iter_submission_tags(raw, 'DOCUMENT')
-        for doc_type in [re.search(r'<TYPE>(.+)\s', doc).group(1)]
-        if doc_type != 'GRAPHIC'
-        for filename in [re.search(r'<FILENAME>(.+)\s', doc).group(1)]
-        if filename.endswith(".htm") or filename.endswith(".html")
-        for txt in _iter_submission_tags(doc, 'TEXT')
-    ]
-    return Submission(cik, raw, number, header, documents)
+    header = raw[entry.header[0]:entry.header[1]]
+    documents = [SubmissionDocument(doc_type, filename, raw[start:end])
+                 for doc_type, filename, start, end in entry.documents]
+    return Submission(entry.cik, raw, number, header, documents)
 
 
 def _split_tables(raw_df: pd.DataFrame, prior_df: Optional[pd.DataFrame] = None) -> List[pd.DataFrame]:
@@ -70,12 +240,12 @@ def _split_tables(raw_df: pd.DataFrame, prior_df: Optional[pd.DataFrame] = None)
         return []
 
     n_rows, n_cols = df.shape
-    header_rows = df.apply(_is_header_row, axis=1)
+    header_rows = _header_rows(df)
     if prior_df is not None and not any(header_rows[0:min(len(header_rows), 5)]) and n_cols == prior_df.shape[1]:
         # Special Case
         # If the table is missing a header, perhaps it is a continuation of the prior table?
         # If the prior table has the same number of columns, "borrow" those headers by pre-pending them.
-        prior_header_rows = prior_df.apply(_is_header_row, axis=1)
+        prior_header_rows = _header_rows(prior_df)
         return _split_tables(pd.concat([prior_df[prior_header_rows], df]))
 
     start_idx = [
@@ -83,27 +253,116 @@ def _split_tables(raw_df: pd.DataFrame, prior_df: Optional[pd.DataFrame] = None)
         for i, v in enumerate(header_rows)
         if v
         # Take the first row of each block of header rows.
-        if i == 0 or not header_rows.iloc[i - 1]
+        if i == 0 or not header_rows[i - 1]
         # A standalone header row must have at least one fiscal period in it.
-        if i == n_rows - 1 or header_rows.iloc[i + 1] or has_fiscal_period(df.iloc[i, :])
+        if i == n_rows - 1 or header_rows[i + 1] or has_fiscal_period(df.iloc[i, :])
     ]
     return [df.iloc[slice(i, j), :] for i, j in zip_longest(start_idx, start_idx[1:])]
 
 
-TableTuple = namedtuple('TableTuple', ['title', 'df', 'raw_df', 'tag', 'rank'])
+TableTuple = namedtuple('TableTuple', ['title', 'df', 'raw_df', 'tag', 'rank', 'units', 'units_multiplier'])
+
+
+# The tags of a document's raw html, removed to read its text without parsing it.
+_RE_MARKUP = re.compile(r'<[a-zA-Z/!?][^>]*>')
+
+
+def document_gate(text: str, items: Iterable[PrelimItem] = None, any_items: bool = False) -> Optional[str]:
+    """
+    Decides from the raw html of a document, without parsing it, whether any of its tables could have items: it must
+    have a table and, somewhere in its text, the literals of a title pattern, of an item pattern and the digits of a
+    fiscal period's year. The document is decided as if it were the only one of its submission (see gate_documents).
+    :param text: The raw html of the document.
+    :param items: The items being extracted, prelim_items by default.
+    :param any_items: If True, the document isn't gated by the literals of the items, so that it passes if any items
+    could be found in its tables.
+    :return: The reason the document can't have items, or None if it could.
+    """
+    return gate_documents([text], items, any_items)[0]
+
+
+def gate_documents(texts: List[str], items: Iterable[PrelimItem] = None,
+                   any_items: bool = False) -> List[Optional[str]]:
+    """
+    Decides which of the documents of a submission parse_tables must parse, from their raw html. A document without a
+    table or the literals of a title pattern has no titled tables, and is skipped. The items and fiscal periods are
+    looked for in the submission as a whole, not in each document, because a titled table lends its headers to a
+    headerless table after it, even in a later document (see _split_tables). So if none of the documents with titled
+    tables has the literals of an item pattern, or none has the digits of a fiscal period's year, they are all skipped,
+    and otherwise they are all parsed.
+    :param texts: The raw html of each document.
+    :param items: The items being extracted, prelim_items by default.
+    :param any_items: If True, the documents aren't gated by the literals of the items.
+    :return: The reason each document is skipped, as document_gate, or None if it must be parsed.
+    """
+    reasons = []
+    plains = []
+    for text in texts:
+        if not re.search(r'<table', text, flags=re.IGNORECASE):
+            reasons.append('no table')
+            continue
+        plain = document_plain_text(text)
+        if not may_contain_title(plain):
+            reasons.append('no title')
+        else:
+            reasons.append(None)
+            plains.append(plain)
+
+    item_patterns = tuple(p for item in (items or prelim_items) for p in item.patterns)
+    if not any_items and not any(_may_contain_item(plain, item_patterns) for plain in plains):
+        reason = 'no item'
+    elif not any(re.search(r'\d\d', plain) for plain in plains):
+        reason = 'no fiscal period'
+    else:
+        return reasons
+    return [r or reason for r in reasons]
+
+
+def document_plain_text(text: str) -> str:
+    """The text of a document's raw html without its markup, lower case and with whitespace removed, which contains
+    the literals of every pattern that matches the text of its tables and titles."""
+    return ''.join(html.unescape(_RE_MARKUP.sub(' ', text)).lower().split())
+
 
+def _may_contain_item(plain: str, item_patterns: Tuple[str, ...]) -> bool:
+    return any(
+        all(any(literal in plain for literal in clause) for clause in clauses)
+        for clauses in _item_pattern_literals(item_patterns)
+    )
+
+
+@lru_cache(maxsize=16)
+def _item_pattern_literals(item_patterns: Tuple[str, ...]) -> List[List[FrozenSet[str]]]:
+    return [required_literals(re.compile(allow_space_between_letters(p), flags=re.IGNORECASE)) for p in item_patterns]
 
-def parse_tables(submission: Submission) -> List[TableTuple]:
-    """Extracts all of the tables with relevant titles in the submission."""
+
+def parse_tables(submission: Submission, items: Iterable[PrelimItem] = None, gate: bool = True,
+                 any_items: bool = False) -> List[TableTuple]:
+    """
+    Extracts all of the tables with relevant titles in the submission.
+    :param submission: The submission.
+    :param items: The items being extracted, by which documents are gated.
+    :param gate: If True, documents that gate_documents decides can't have items are skipped without being parsed.
+    :param any_items: If True, documents are gated without regard to the items, so that the tables are those from
+    which any items could be extracted.
+    """
     tables = []
     prior_table = None
-    for doc in submission.documents:
-        for table_tag in BeautifulSoup(doc.text, features='lxml').find_all('table'):
+    reasons = gate_documents([doc.text for doc in submission.documents], items, any_items) if gate \
+        else [None] * len(submission.documents)
+    for doc, reason in zip(submission.documents, reasons):
+        if reason:
+            logger.debug(f"Skipped {doc.type} {doc.filename} ({len(doc.text)} bytes): {reason}")
+            continue
+
+        soup = BeautifulSoup(doc.text, features='lxml')
+        index = TextIndex(soup)
+        for table_tag in soup.find_all('table'):
             if table_tag.find_all('table'):
                 # Ignore tables with nested tables for now.
                 continue
 
-            table_title = title_from_table_tag(table_tag, submission.cik)
+            table_title = title_from_table_tag(table_tag, submission.cik, index=index)
             if table_title is None:
                 # No title or irrelevant title.
                 continue
@@ -113,8 +372,10 @@ def parse_tables(submission: Submission) -> List[TableTuple]:
             if raw_df is None:
                 continue
 
+            units, units_multiplier = units_from_table(table_tag, title, index=index)
             for split_df in _split_tables(raw_df, prior_df=prior_table):
-                table_tuple = TableTuple(title, clean_table(split_df), split_df, table_tag, rank)
+                table_tuple = TableTuple(title, clean_table(split_df), split_df, table_tag, rank, units,
+                                         units_multiplier)
                 tables.append(table_tuple)
                 prior_table = split_df
 
@@ -127,7 +388,7 @@ def _drop_single_value_rows_and_columns(df: pd.DataFrame) -> pd.DataFrame:
 
     def is_header_related(s: pd.Series):
         unique_values = s.dropna().unique()
-        return len(unique_values) != 0 and is_header_part(unique_values[0])
+        return len(unique_values) != 0 and is_header_cell(unique_values[0])
 
     if df.empty:
         return df
@@ -142,118 +403,119 @@ def _drop_single_value_rows_and_columns(df: pd.DataFrame) -> pd.DataFrame:
         return df.loc[:, keep_columns]
 
 
-# noinspection PyTypeChecker
-def _collapse_identical_rows(df: pd.DataFrame, start_row: int = 0) -> pd.DataFrame:
-    n_rows, _ = df.shape
-    if start_row >= n_rows - 1:
-        return df
-    else:
-        row1 = df.iloc[start_row, :]
-        row2 = df.iloc[start_row + 1, :]
-        if all(row1 == row2):
-            retained_idx = [i for i in range(0, n_rows) if i != start_row]
-            return _collapse_identical_rows(df.iloc[retained_idx, :], start_row)
-        else:
-            return _collapse_identical_rows(df, start_row + 1)
+def _drop_null_rows_and_columns(df: pd.DataFrame) -> pd.DataFrame:
+    return df.dropna(axis=0, how='all').dropna(axis=1, how='all')
 
 
-# noinspection PyTypeChecker
-def _collapse_identical_columns(df: pd.DataFrame, start_col: int = 0) -> pd.DataFrame:
-    _, n_cols = df.shape
-    if start_col >= n_cols - 1:
-        return df
-    else:
-        col1 = df.iloc[:, start_col]
-        col2 = df.iloc[:, start_col + 1]
-        col1_span = col1.mask(col1 == '', col2)
-        col2_span = col2.mask(col2 == '', col1)
-
-        if any(col1 == col2) and all(col1_span == col2_span):
-            collapsed = df.pipe(_replace_columns, col1_span, start_col)
-            return _collapse_identical_columns(collapsed, start_col)
-        else:
-            return _collapse_identical_columns(df, start_col + 1)
+# Runs of whitespace within a cell, collapsed to a single space when a table is cleaned.
+_RE_CELL_WHITESPACE = re.compile(r'\s+')
 
 
-def _concat(row: pd.Series, sep=''):
-    if row.nunique() == 1:
-        return row.iloc[0]
+def _collapse_identical_rows(values: np.ndarray, index: pd.Index) -> Tuple[np.ndarray, pd.Index]:
+    """Drops each row that is identical to the row after it, so that of a run of identical rows only the last is kept."""
+    keep = np.ones(len(values), dtype=bool)
+    keep[:-1] = ~(values[:-1] == values[1:]).all(axis=1)
+    if keep.all():
+        return values, index
     else:
-        res = row.iloc[0]
-        for i in range(1, len(row)):
-            if not res.endswith(row.iloc[i]):
-                res += sep + row.iloc[i]
-        return res
+        positions = np.flatnonzero(keep)
+        return values[positions], index.take(positions)
 
 
-def _collapse_header_rows(df: pd.DataFrame, start_row: int = 0) -> pd.DataFrame:
-    n_rows, _ = df.shape
-    if start_row + 1 >= n_rows:
-        return df
-    else:
-        second_row = df.iloc[1, 0:-1]
-        if _is_header_row(second_row) or all(second_row == ''):
-            parts = []
-            if start_row > 0:
-                parts.append(df.iloc[:start_row, :])
-
-            if not _is_ignorable_header_row(second_row):
-                rows = df.iloc[start_row:start_row + 2, :]
-                row_combined = rows.apply(partial(_concat, sep=' '), axis=0)
-            else:
-                row_combined = df.iloc[start_row]
-
-            parts.append(pd.DataFrame(row_combined).T)
-
-            if start_row + 2 < n_rows:
-                parts.append(df.iloc[start_row + 2:, :])
-
-            combined_row_df = pd.concat(parts, axis=0, ignore_index=True)
-            return _collapse_header_rows(combined_row_df, start_row)
+def _collapse_columns(values: np.ndarray, columns: pd.Index, start_col: int,
+                      combine: Callable[[np.ndarray, np.ndarray], Optional[np.ndarray]]) -> Tuple[np.ndarray, pd.Index]:
+    """
+    Collapses adjacent columns left to right, each into the column after it for as long as they combine.
+    :param values: The cells of the table.
+    :param columns: The column labels, which are renumbered if any columns are collapsed, as pd.concat would.
+    :param start_col: The first column that may be collapsed into the columns after it.
+    :param combine: A function of two columns that returns the column they collapse into, or None if they don't.
+    """
+    _, n_cols = values.shape
+    kept = [values[:, i] for i in range(start_col)]
+    col = values[:, start_col] if start_col < n_cols else None
+    for i in range(start_col + 1, n_cols):
+        combined = combine(col, values[:, i])
+        if combined is None:
+            kept.append(col)
+            col = values[:, i]
         else:
-            return df
+            col = combined
 
+    if col is None or len(kept) + 1 == n_cols:
+        return values, columns
+    else:
+        kept.append(col)
+        return np.column_stack(kept), pd.RangeIndex(len(kept))
 
-def _cols_share_header(df: pd.DataFrame) -> bool:
-    return not df.empty and df.iloc[0, 0] != '' and df.iloc[0, :].where(df.iloc[0, :] != '').nunique() == 1
 
+def _combine_identical_columns(col1: np.ndarray, col2: np.ndarray) -> Optional[np.ndarray]:
+    """Two columns are identical if they are equal wherever both are non-empty, as they are when a cell spans them."""
+    col1_span = np.where(col1 == '', col2, col1)
+    col2_span = np.where(col2 == '', col1, col2)
+    return col1_span if (col1 == col2).any() and (col1_span == col2_span).all() else None
 
-def _collapse_columns_with_identical_header(df: pd.DataFrame, start_col: int = 1) -> pd.DataFrame:
-    _, n_cols = df.shape
-    if start_col + 1 >= n_cols:
-        return df
+
+def _combine_columns_with_identical_header(col1: np.ndarray, col2: np.ndarray) -> Optional[np.ndarray]:
+    """Two columns share a header if the second's is empty or the same as the first's, which must not be empty."""
+    if len(col1) == 0 or col1[0] == '' or col2[0] not in ('', col1[0]):
+        return None
     else:
-        cols = df.iloc[:, start_col:start_col + 2]
-        if _cols_share_header(cols):
-            col_combined = cols.apply(_concat, axis=1)
-            collapsed = df.pipe(_replace_columns, col_combined, start_col)
-            return _collapse_columns_with_identical_header(collapsed, start_col)
-        else:
-            return _collapse_columns_with_identical_header(df, start_col + 1)
+        return np.array([_concat(v1, v2) for v1, v2 in zip(col1, col2)], dtype=object)
 
 
-def _replace_columns(df: pd.DataFrame, col_combined: pd.Series, start_col: int, num_cols: int = 2) -> pd.DataFrame:
-    _, total_cols = df.shape
-    parts = []
+def _concat(value1: str, value2: str, sep: str = '') -> str:
+    return value1 if value1.endswith(value2) else value1 + sep + value2
 
-    if start_col > 0:
-        parts.append(df.iloc[:, :start_col])
 
-    parts.append(col_combined)
+def _drop_bogus_header_rows(values: np.ndarray, index: pd.Index) -> Tuple[np.ndarray, pd.Index]:
+    """Drops the leading rows without a header part in any but their first column."""
+    n_rows = sum(1 for _ in takewhile(lambda row: not any(map(is_header_cell, row[1:])), values))
+    return (values[n_rows:], index[n_rows:]) if n_rows else (values, index)
 
-    if start_col + num_cols < total_cols:
-        parts.append(df.iloc[:, start_col + num_cols:])
 
-    return pd.concat(parts, axis=1, ignore_index=True)
+def _collapse_header_rows(values: np.ndarray, index: pd.Index) -> Tuple[np.ndarray, pd.Index]:
+    """
+    Collapses the header rows following the first row into it, ignoring those that only have units or unaudited. The
+    last column plays no part in deciding whether a row is a header row.
+    """
+    n_rows = len(values)
+    header = values[0] if n_rows else None
+    end_row = 1
+    while end_row < n_rows:
+        row = values[end_row]
+        if not (_is_header_row(row[:-1]) or all(row[:-1] == '')):
+            break
+        if not _is_ignorable_header_row(row[:-1]):
+            header = np.array([_concat(v1, v2, sep=' ') for v1, v2 in zip(header, row)], dtype=object)
+        end_row += 1
+
+    if end_row == 1:
+        return values, index
+    else:
+        return np.vstack([header[np.newaxis, :], values[end_row:]]), pd.RangeIndex(n_rows - end_row + 1)
 
 
-def _drop_null_rows_and_columns(df: pd.DataFrame) -> pd.DataFrame:
-    return df.dropna(axis=0, how='all').dropna(axis=1, how='all')
+def _collapse_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Blanks the null cells of a table and normalizes the whitespace within its cells, then collapses identical rows,
+    identical columns, the header rows into the first row and the columns that share a header. The collapses work
+    over the table's cells as an array, and the DataFrame is built once at the end.
+    """
+    if df.empty:
+        return df.fillna(value='')
 
+    values = np.array([
+        '' if pd.isnull(v) else _RE_CELL_WHITESPACE.sub(' ', v) for v in df.values.flat
+    ], dtype=object).reshape(df.shape)
+    index, columns = df.index, df.columns
 
-def _drop_bogus_header_rows(df: pd.DataFrame) -> pd.DataFrame:
-    row_idx = list(takewhile(lambda i: not any(df.iloc[i, 1:].map(is_header_part)), range(len(df))))
-    return df.iloc[max(row_idx) + 1:, :] if row_idx else df
+    values, index = _collapse_identical_rows(values, index)
+    values, columns = _collapse_columns(values, columns, 0, _combine_identical_columns)
+    values, index = _drop_bogus_header_rows(values, index)
+    values, index = _collapse_header_rows(values, index)
+    values, columns = _collapse_columns(values, columns, 1, _combine_columns_with_identical_header)
+    return pd.DataFrame(values, index=index, columns=columns)
 
 
 def _filter_bad_table(df: pd.DataFrame, raw_df: pd.DataFrame) -> pd.DataFrame:
@@ -266,109 +528,94 @@ def clean_table(df: pd.DataFrame) -> pd.DataFrame:
     """Transforms a table into one where the header is in the first row and the items are in the leading columns."""
     return df.pipe(_drop_single_value_rows_and_columns) \
         .pipe(_drop_null_rows_and_columns) \
-        .fillna(value='') \
-        .apply(lambda c: c.str.replace(r'\s+', ' ')) \
-        .pipe(_collapse_identical_rows) \
-        .pipe(_collapse_identical_columns) \
-        .pipe(_drop_bogus_header_rows) \
-        .pipe(_collapse_header_rows) \
-        .pipe(_collapse_columns_with_identical_header) \
+        .pipe(_collapse_table) \
         .pipe(_filter_bad_table, df)
 
 
-def _is_row_part(cell: str) -> bool:
-    """Returns true if the cell can reasonably be inferred to be from a row values."""
-    prepped = str(cell).lower().strip()
-    if re.match(r'^[$(]?\s*[\d,]+\.?\d*[)%]*$', prepped) is not None:
-        value = _parse_item_value(prepped)
-        return value is not None and not ((2000 <= value <= 2050) or (28 <= value <= 31))
-    else:
-        return is_hyphen(prepped)
+def _non_empty_cells(row: Iterable[str]) -> List[str]:
+    return [cell for cell in row if not pd.isnull(cell) and cell != '']
 
 
-def _is_ignorable_header_row(row: pd.Series) -> bool:
+def _is_ignorable_header_row(row: Iterable[str]) -> bool:
     """Returns true if this is a row that might appear inside a header, but plays no part in forming
     the fiscal periods."""
-    s = row.replace('', np.nan).dropna()
-    return all(s.map(is_units)) or all(s.str.contains(UNAUDITED_EXACT, flags=re.IGNORECASE))
+    bits = [classify_cell(cell) for cell in _non_empty_cells(row)]
+    return all(b & CELL_UNITS for b in bits) or all(b & CELL_UNAUDITED for b in bits)
 
 
-def _is_header_row(row: pd.Series) -> bool:
+def _is_header_row(row: Iterable[str]) -> bool:
     """Returns true if the row can reasonably be assumed to be a header row."""
-    s = row.replace('', np.nan).dropna()
-    return (any(s.map(is_header_part)) and not any(s.map(_is_row_part))) or _is_ignorable_header_row(s)
+    s = _non_empty_cells(row)
+    bits = [classify_cell(cell) for cell in s]
+    return (any(b & CELL_HEADER_PART for b in bits) and not any(b & CELL_ROW_PART for b in bits)) or \
+        _is_ignorable_header_row(s)
 
 
-def _parse_item_value(src_value: str) -> Optional[float]:
-    """
-    Does its darndest to extract a value from a table cell. Hyphens are considered zero. Values in parent (or with at
-    least a leading parent are negative."""
-    value = re.sub(r'[$%,*]', '', src_value)
-    if is_hyphen(value):
-        return 0.
+def _header_rows(df: pd.DataFrame) -> np.ndarray:
+    """_is_header_row of each row of the table, from the classification of all of its cells at once."""
+    values = df.values
+    bits = classify_cells(values)
+    empty = pd.isnull(values) | (values == '')
 
-    if value == '' or re.search(rf'\d', value) is None:
-        return None
+    def any_cell(bit: int) -> np.ndarray:
+        return (bits & bit).any(axis=1)
 
-    signum = 1.0
-    value = re.sub(r'\s+', '', value)
-    neg = re.match(r'\(([\d.]+)\)?', value)
-    if neg:
-        value = neg.group(1)
-        signum = -1.0
-    else:
-        pos = re.search(r'([\d.]+)', value)
-        if pos:
-            value = pos.group(1)
+    def all_cells(bit: int) -> np.ndarray:
+        return ((bits & bit).astype(bool) | empty).all(axis=1)
 
-    try:
-        return signum * float(value)
-    except ValueError:
-        return np.nan
+    return (any_cell(CELL_HEADER_PART) & ~any_cell(CELL_ROW_PART)) | all_cells(CELL_UNITS) | all_cells(CELL_UNAUDITED)
 
 
 ItemValue = namedtuple('ItemValue', ['fiscal_period', 'src_row', 'src_column', 'src_value', 'value', 'rank'])
 
 
-def _item_value_from_table(df: pd.DataFrame, item_pattern: str, pattern_rank: int, multiplier: float,
+def _item_value_from_table(values: np.ndarray, numbers: Tuple[np.ndarray, np.ndarray], matches: np.ndarray,
+                           pattern_rank: int, multiplier: float,
                            fiscal_periods: List[Tuple[int, str]]) -> Optional[ItemValue]:
     """
     Looks for an item matching the pattern in the leading columns of the table and returns the parsable value with the
     latest fiscal period.
-    :param df: the cleaned table in a pd.DataFrame
-    :param item_pattern: the pattern to match against an item name
+    :param values: the cells of the cleaned table
+    :param numbers: the values of the cells of the cleaned table and the mask of those that have one (parse_item_values)
+    :param matches: the (row, column, item index, pattern rank) matches of the pattern, by column and then by row
     :param pattern_rank: the relative rank of this pattern over other patterns for the same item
     :param multiplier: the units multiplier
-    :param fiscal_periods: the fiscal periods (column and name) in order from most to least recent.
+    :param fiscal_periods: the fiscal periods (column position and name) in order from most to least recent.
     :return:
     """
-    first_fp_column = min(map(itemgetter(0), fiscal_periods))
-    for item_col in range(0, min(first_fp_column, len(df.columns))):
-        item_df = df[df.iloc[:, item_col].str.contains(allow_space_between_letters(item_pattern), flags=re.IGNORECASE)]
-        if item_df.empty:
-            continue
-
-        for fp_index, fiscal_period in fiscal_periods:
-            for src_row, src_value in item_df.loc[:, [df.columns[item_col], fp_index]].itertuples(index=False):
-                value = _parse_item_value(src_value)
-                if value is not None:
-                    return ItemValue(
-                        fiscal_period=fiscal_period,
-                        src_row=sanitize_text(src_row),
-                        src_column=sanitize_text(df.iloc[0, :].loc[fp_index]),
-                        src_value=sanitize_text(src_value),
-                        value=multiplier * value,
-                        rank=pattern_rank)
+    cell_values, has_value = numbers
+    for item_col in np.unique(matches[:, 1]):
+        rows = matches[matches[:, 1] == item_col, 0]
+        for fp_col, fiscal_period in fiscal_periods:
+            found = rows[has_value[rows, fp_col]]
+            if len(found) > 0:
+                row = found[0]
+                return ItemValue(
+                    fiscal_period=fiscal_period,
+                    src_row=sanitize_text(values[row, item_col]),
+                    src_column=sanitize_text(values[0, fp_col]),
+                    src_value=sanitize_text(values[row, fp_col]),
+                    value=multiplier * cell_values[row, fp_col],
+                    rank=pattern_rank)
     return None
 
 
+def _item_matcher(items: Iterable[PrelimItem]) -> ItemMatcher:
+    if items is None or items is prelim_items:
+        return prelim_item_matcher
+    return _item_matcher_of(tuple((item.name, item.min_abs_value, tuple(item.patterns)) for item in items))
+
+
+@lru_cache(maxsize=16)
+def _item_matcher_of(items: Tuple[Tuple[str, float, Tuple[str, ...]], ...]) -> ItemMatcher:
+    return ItemMatcher(PrelimItem(*item) for item in items)
+
+
 # noinspection PyProtectedMember
 def items_from_table(table: TableTuple, items: Iterable[PrelimItem] = None) -> pd.DataFrame:
     """Extracts all items from the table into a pd.DataFrame whose columns describe the item and its value along
-    with the source row, column, value and units"""
-    if items is None:
-        items = prelim_items
-
+    with the source row, column, value and units. The labels of the table are matched against the patterns of all of
+    the items at once."""
     df = table.df
     if df.empty:
         return pd.DataFrame()
@@ -377,15 +624,28 @@ def items_from_table(table: TableTuple, items: Iterable[PrelimItem] = None) -> p
     if not fiscal_periods:
         return pd.DataFrame()
 
-    units, units_multiplier = units_from_table(table.tag, table.title)
+    values = df.values
+    first_fp_column = min(map(itemgetter(0), fiscal_periods))
+    matcher = _item_matcher(items)
+    matches = matcher.match_table(values, min(first_fp_column, len(df.columns)))
+    fp_columns = [(df.columns.get_loc(fp_index), fiscal_period) for fp_index, fiscal_period in fiscal_periods]
+
+    # Only the fiscal period cells of the rows with a match are read for values, so only these are parsed.
+    numbers = np.full(values.shape, np.nan), np.zeros(values.shape, dtype=bool)
+    value_cells = np.ix_(np.unique(matches[:, 0]), [fp_col for fp_col, _ in fp_columns])
+    numbers[0][value_cells], numbers[1][value_cells] = parse_item_values(values[value_cells])
+
+    units, units_multiplier = table.units, table.units_multiplier
     item_rows = []
-    for item in items:
+    for item_index, item in enumerate(matcher.items):
         src_units = units
         per_share = 'per share' in item.name
         multiplier = 1.0 if per_share else units_multiplier
+        item_matches = matches[matches[:, 2] == item_index]
         item_value = head_option(
-            _item_value_from_table(df, pattern, item_rank, multiplier, fiscal_periods)
-            for item_rank, pattern in enumerate(item.patterns))
+            _item_value_from_table(values, numbers, item_matches[item_matches[:, 3] == item_rank], item_rank,
+                                   multiplier, fp_columns)
+            for item_rank in range(len(item.patterns)))
 
         if item_value is not None:
             if not per_share and units_multiplier == 1.0 and abs(item_value.value) < item.min_abs_value:
@@ -422,7 +682,7 @@ def items_from_tables(df_iter: Iterable[TableTuple], items: List[PrelimItem] = N
     item_dfs = [
         item_df
         for table_tuple in df_iter
-        for item_df in [items_from_table(table_tuple)]
+        for item_df in [items_from_table(table_tuple, items)]
         if not item_df.empty
     ]
     return choose_item_by_rank(pd.concat(item_dfs, sort=False, ignore_index=True)) if item_dfs else pd.DataFrame()
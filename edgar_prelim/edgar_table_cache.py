@@ -0,0 +1,224 @@
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Union, List, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from edgar_prelim.edgar_fingerprint import table_pattern_version
+from edgar_prelim.edgar_items import PrelimItem
+from edgar_prelim.edgar_re import *
+from edgar_prelim.edgar_submission import Submission, TableTuple, parse_tables, items_from_tables
+from edgar_prelim.logging_config import init_logging
+
+logger = init_logging(__name__)
+
+"""
+A cache of the tables parsed from each submission, so that items can be extracted from them again, with new or changed
+PrelimItems, without parsing the submission again. The tables of a submission are kept in a compressed npz file named
+by its accession number, in columns: the title, rank, units and multiplier of each table, and the cells of all of the
+tables, row by row, with the shape and the row and column labels of each table. The text is packed as utf-8 with its
+offsets. Only the cleaned tables are kept, so the raw_df and tag of a cached TableTuple are None.
+
+The tables are parsed without gating documents by the items (see gate_documents), so that they serve any items. Each
+file records the version of the title, fiscal period and units patterns that parsed its tables (table_pattern_version),
+and the files of other versions are parsed again.
+
+Setting EDGAR_TABLE_CACHE_DIR keeps a cache in that directory, which extract_prelim_statement_from_submission reads the
+tables of a submission from, parsing and caching the tables of the submissions that it doesn't have.
+"""
+
+# The kinds of a cell: text, None, or a float such as nan.
+_CELL_STR = 0
+_CELL_NONE = 1
+_CELL_FLOAT = 2
+
+
+def _pack_strings(strings: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """The utf-8 of the strings, one after the other, and their offsets. None is packed as an empty string."""
+    encoded = [s.encode('utf-8', 'surrogatepass') if s is not None else b'' for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = data.tobytes()
+    return [raw[start:end].decode('utf-8', 'surrogatepass') for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _cell_kind(cell) -> int:
+    if isinstance(cell, str):
+        return _CELL_STR
+    elif cell is None:
+        return _CELL_NONE
+    elif isinstance(cell, float):
+        return _CELL_FLOAT
+    else:
+        raise TypeError(f"Can't cache a cell of {type(cell).__name__}: {cell!r}")
+
+
+def tables_to_arrays(tables: List[TableTuple]) -> dict:
+    """The columns of the tables, as numpy arrays. Raises a TypeError for a table that can't be cached."""
+    cells = [cell for t in tables for cell in t.df.values.ravel()]
+    kinds = np.array([_cell_kind(cell) for cell in cells], dtype=np.int8)
+    text, text_offsets = _pack_strings([cell if kind == _CELL_STR else None for cell, kind in zip(cells, kinds)])
+    titles, title_offsets = _pack_strings([t.title for t in tables])
+    units, units_offsets = _pack_strings([t.units for t in tables])
+
+    columns = [c for t in tables for c in t.df.columns]
+    index = [i for t in tables for i in t.df.index]
+    if not all(isinstance(label, (int, np.integer)) for label in columns + index):
+        raise TypeError(f"Can't cache tables with labels other than integers: {columns}, {index}")
+
+    return dict(
+        title=titles,
+        title_offsets=title_offsets,
+        rank=np.array([t.rank for t in tables], dtype=np.int64),
+        units=units,
+        units_offsets=units_offsets,
+        has_units=np.array([t.units is not None for t in tables], dtype=bool),
+        units_multiplier=np.array([t.units_multiplier for t in tables], dtype=np.float64),
+        shape=np.array([t.df.shape for t in tables], dtype=np.int64).reshape(-1, 2),
+        columns=np.array(columns, dtype=np.int64),
+        index=np.array(index, dtype=np.int64),
+        cell_kind=kinds,
+        cell_text=text,
+        cell_text_offsets=text_offsets,
+        cell_float=np.array([cell if kind == _CELL_FLOAT else np.nan for cell, kind in zip(cells, kinds)],
+                            dtype=np.float64))
+
+
+def tables_from_arrays(arrays) -> List[TableTuple]:
+    """The tables whose columns are the arrays, as returned by tables_to_arrays."""
+    kinds = arrays['cell_kind']
+    cells = np.array(_unpack_strings(arrays['cell_text'], arrays['cell_text_offsets']), dtype=object)
+    cells[kinds == _CELL_NONE] = None
+    cells[kinds == _CELL_FLOAT] = arrays['cell_float'][kinds == _CELL_FLOAT]
+
+    titles = _unpack_strings(arrays['title'], arrays['title_offsets'])
+    units = _unpack_strings(arrays['units'], arrays['units_offsets'])
+    tables = []
+    cell_start = column_start = index_start = 0
+    for i, (rows, cols) in enumerate(arrays['shape']):
+        df = pd.DataFrame(cells[cell_start:cell_start + rows * cols].reshape(rows, cols),
+                          index=pd.Index(arrays['index'][index_start:index_start + rows]),
+                          columns=pd.Index(arrays['columns'][column_start:column_start + cols]),
+                          dtype=object)
+        tables.append(TableTuple(
+            title=titles[i],
+            df=df,
+            raw_df=None,
+            tag=None,
+            rank=int(arrays['rank'][i]),
+            units=units[i] if arrays['has_units'][i] else None,
+            units_multiplier=float(arrays['units_multiplier'][i])))
+        cell_start += rows * cols
+        column_start += cols
+        index_start += rows
+    return tables
+
+
+class TableCache(object):
+    """
+    Keeps the tables parsed from each submission in 'directory', in a file for each accession number. Caches are safe
+    to share between threads and processes.
+    :param version: The version of the patterns of the tables, by default the current table_pattern_version.
+    """
+
+    def __init__(self, directory: Union[str, Path], version: str = None) -> None:
+        self.directory = Path(directory)
+        self.version = version or table_pattern_version()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, accession: str) -> Path:
+        return self.directory / accession[-2:] / f'{accession}.npz'
+
+    def get(self, accession: str) -> Optional[List[TableTuple]]:
+        """Returns the tables of the submission, or None if they aren't cached with the current patterns."""
+        try:
+            with np.load(self._path(accession), allow_pickle=False) as arrays:
+                if str(arrays['version']) != self.version:
+                    return None
+                return tables_from_arrays(arrays)
+        except FileNotFoundError:
+            return None
+
+    def put(self, accession: str, tables: List[TableTuple]) -> bool:
+        """Caches the tables of the submission, replacing any cached before. Returns False if they can't be cached."""
+        try:
+            arrays = tables_to_arrays(tables)
+        except TypeError as e:
+            logger.warn(f"Not caching the tables of {accession}: {e}")
+            return False
+
+        path = self._path(accession)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, version=np.array(self.version), **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                tmp_path.unlink()
+            except FileNotFoundError:
+                pass
+            raise
+        return True
+
+
+def _table_cache_from_environment() -> Optional[TableCache]:
+    cache_dir = os.environ.get('EDGAR_TABLE_CACHE_DIR')
+    return TableCache(cache_dir) if cache_dir else None
+
+
+_table_cache = _table_cache_from_environment()
+
+
+def set_table_cache(cache: Optional[TableCache]):
+    """Replaces the table cache used by parse_tables_cached. None disables caching."""
+    global _table_cache
+    _table_cache = cache
+
+
+def get_table_cache() -> Optional[TableCache]:
+    return _table_cache
+
+
+def submission_accession(submission: Submission) -> Optional[str]:
+    """The accession number of a submission, from the name of its text file."""
+    match = re.match(r'\s*(\d{10}-\d{2}-\d{6})', submission.number or '')
+    return match.group(1) if match else None
+
+
+def parse_tables_cached(submission: Submission, items: Iterable[PrelimItem] = None,
+                        any_items: bool = False) -> List[TableTuple]:
+    """
+    The tables of the submission from the table cache, if there is one. The tables of a submission that isn't cached
+    are parsed for any items, and cached. Without a cache, this is parse_tables.
+    """
+    cache = get_table_cache()
+    accession = submission_accession(submission) if cache is not None else None
+    if accession is None:
+        return parse_tables(submission, items=items, any_items=any_items)
+
+    tables = cache.get(accession)
+    if tables is None:
+        tables = parse_tables(submission, any_items=True)
+        cache.put(accession, tables)
+    return tables
+
+
+def items_from_cached_tables(accessions: Iterable[str], items: List[PrelimItem] = None,
+                             cache: TableCache = None) -> Iterable[Tuple[str, pd.DataFrame]]:
+    """
+    Extracts the items from the cached tables of each submission, skipping the submissions that aren't cached.
+    :return: Each accession number with the items_from_tables of its tables.
+    """
+    cache = cache if cache is not None else get_table_cache()
+    for accession in accessions:
+        tables = cache.get(accession)
+        if tables is not None:
+            yield accession, items_from_tables(tables, items=items)
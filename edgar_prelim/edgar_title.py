@@ -1,11 +1,12 @@
 from collections import namedtuple, Iterable, ChainMap
+from functools import lru_cache
 from re import Pattern
-from typing import Optional, Tuple, Sequence
+from typing import Optional, Tuple, Sequence, List
 
 # noinspection PyProtectedMember
 from bs4 import Tag
 
-from edgar_prelim.bs4_util import match_table_title_text
+from edgar_prelim.bs4_util import match_table_title_text, TextIndex
 from edgar_prelim.edgar_re import *
 
 ######################################################################
@@ -119,19 +120,20 @@ title_inclusion_patterns = (
     title_pattern(fr'^{UNAUDITED}earnings{TITLE_SUFFIX}'),
 )
 
-title_exclusion_patterns = (
+title_exclusion_patterns = PatternSet((
     re_compile(fr'^(?:definitions\s+and\s+reconciliation\s+of\s+gaap\s+to\s+)?'
                fr'non-gaap\s+financial\s+measures{UNAUDITED}{FOOTNOTE}$'),
     re_compile(r'business\s+segment'),
     re_compile(r'segment\s+results'),
     re_compile(r'-\s+subsidiaries'),
     re_compile(fr'^impact\s+of\s+restatement\s+on\s+prior\s+period\s+balances{FOOTNOTE}$')
-)
+))
 
 
 def title_from_table_tag(table: Tag, cik: str = '',
                          inclusion_patterns: Sequence[TitlePattern] = title_inclusion_patterns,
-                         exclusion_patterns: Sequence[Pattern] = title_exclusion_patterns) -> Optional[Tuple[str, int]]:
+                         exclusion_patterns: Sequence[Pattern] = title_exclusion_patterns,
+                         index: TextIndex = None) -> Optional[Tuple[str, int]]:
     """
     Finds the highest ranking matching title within or above the table.
     :param table: the table Tag
@@ -139,14 +141,43 @@ def title_from_table_tag(table: Tag, cik: str = '',
     :param inclusion_patterns: The patterns to match against in their order of preference.
     :param exclusion_patterns: The search will not continue past a tag where an exclusion pattern is reached (or
     return any matches within that tag).
+    :param index: If supplied, the TextIndex of the table's document.
     :return: The highest ranking matching pattern and its index in the inclusion_patterns list, or None for no title.
     """
-    patterns = [
+    if inclusion_patterns is title_inclusion_patterns:
+        patterns = _title_pattern_set(cik)
+    else:
+        patterns = _patterns_for_cik(inclusion_patterns, cik)
+    return match_table_title_text(table, patterns, exclusion_patterns, index=index)
+
+
+def _patterns_for_cik(inclusion_patterns: Sequence[TitlePattern], cik: str) -> List[Pattern]:
+    return [
         pattern
         for pattern, inc_cik, exc_cik in inclusion_patterns
         if (not inc_cik or cik in inc_cik) and (not exc_cik or cik not in exc_cik)
     ]
-    return match_table_title_text(table, patterns, exclusion_patterns)
+
+
+def _title_pattern_set(cik: str) -> PatternSet:
+    """The title_inclusion_patterns relevant to the cik, to be searched together. Only a few ciks have patterns of
+    their own, so most share the same PatternSet."""
+    return _title_pattern_set_of(tuple(
+        i
+        for i, (_, inc_cik, exc_cik) in enumerate(title_inclusion_patterns)
+        if (not inc_cik or cik in inc_cik) and (not exc_cik or cik not in exc_cik)
+    ))
+
+
+@lru_cache(maxsize=None)
+def _title_pattern_set_of(pattern_indexes: Tuple[int, ...]) -> PatternSet:
+    return PatternSet(title_inclusion_patterns[i].pattern for i in pattern_indexes)
+
+
+def may_contain_title(text: str) -> bool:
+    """Whether the lower case text of a document, with whitespace removed, has the literals of any of the
+    title_inclusion_patterns, without which none of its text can be a title."""
+    return len(_title_pattern_set_of(tuple(range(len(title_inclusion_patterns)))).candidates(text)) > 0
 
 
 ######################################################################
@@ -160,7 +191,7 @@ units_table = ChainMap(
 
 any_unit = '|'.join(units_table.keys())
 
-unit_patterns = (
+unit_patterns = PatternSet((
     re_compile(rf"(?:dollars|\$)(?:\s+and\s+shares)?\s+in\s+(?:{any_unit})"),
     re_compile(rf"in\s+(?:dollars|\$)\s+(?:{any_unit})"),
     re_compile(rf"\$(?:{any_unit})"),
@@ -169,18 +200,18 @@ unit_patterns = (
     re_compile(rf"in\s+(?:{any_unit})\)?$"),
     re_compile(rf"in\s+(?:{any_unit})[,\w\s]+"),
     re_compile(rf"\((?:{any_unit})\)")
-)
+))
 
 
 def is_units(cell: str) -> bool:
     """Returns true if this cell contains units for the table values."""
-    return any(re.search(p, cell.lower()) for p in unit_patterns)
+    return len(unit_patterns.search(cell.lower())) > 0
 
 
-def units_from_table(table: Tag, title: str) -> (str, float):
+def units_from_table(table: Tag, title: str, index: TextIndex = None) -> (str, float):
     """Returns true if the table contains or its previous siblings contains the units for the table values."""
     unit_match = match_table_title_text(
-        table, unit_patterns, first_match=True, continue_to_next_table_after_match=title)
+        table, unit_patterns, first_match=True, continue_to_next_table_after_match=title, index=index)
 
     if not unit_match:
         return None, 1.0
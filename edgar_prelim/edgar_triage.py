@@ -0,0 +1,62 @@
+import re
+from collections import namedtuple
+
+import requests
+
+from edgar_prelim.edgar_http import http_get_prefix, governed_retry
+from edgar_prelim.edgar_query import Filing, submission_text_href
+
+"""
+Decides from the first few KB of an 8-K's submission text whether it could be an earnings release, so that the
+filings that can't be are never downloaded in full. The SEC-HEADER of a filing lists the 8-K items it reports under
+ITEM INFORMATION, and earnings releases are filed under Results of Operations and Financial Condition. A filing is
+kept if it reports that item, if an EX-99 exhibit starts within the bytes read, or if its header lists no items at all,
+as filings made before the items were added to the header don't.
+"""
+
+TRIAGE_BYTES = 16 * 1024
+
+# The ITEM INFORMATION descriptions of the items under which earnings are reported.
+EARNINGS_ITEMS = ('Results of Operations and Financial Condition',)
+
+# The prelim_filing.reject_reason of a filing skipped by triage.
+REJECT_TRIAGE = 'triage'
+
+# The outcome of triage: whether to keep the filing, the reason it was rejected, and the items listed in its header.
+Triage = namedtuple('Triage', ['keep', 'reason', 'items'])
+
+
+def triage_submission_head(head: str) -> Triage:
+    """Triages a filing from the text at the start of its submission."""
+    header_end = head.find('</SEC-HEADER>')
+    header = head[:header_end] if header_end != -1 else head
+    items = [item.strip() for item in re.findall(r'ITEM INFORMATION:[ \t]*(.+)', header)]
+
+    if not items:
+        return Triage(True, None, items)
+    if any(item.lower() == e.lower() for item in items for e in EARNINGS_ITEMS):
+        return Triage(True, None, items)
+    if re.search(r'<TYPE>EX-99', head):
+        return Triage(True, None, items)
+    return Triage(False, REJECT_TRIAGE, items)
+
+
+@governed_retry()
+def _read_submission_head(href: str, size: int) -> str:
+    result, prefix = http_get_prefix(href, size)
+    if result.status_code not in (requests.codes.ok, requests.codes.partial_content):
+        result.raise_for_status()
+    else:
+        return prefix.decode(result.encoding or 'ISO-8859-1', errors='replace')
+
+
+def triage_filing(filing: Filing, size: int = TRIAGE_BYTES) -> Triage:
+    """Triages a filing from the first 'size' bytes of its submission text. Filings whose href doesn't name the
+    submission are kept."""
+    try:
+        href = submission_text_href(filing.href)
+    except ValueError:
+        return Triage(True, None, [])
+
+    return triage_submission_head(_read_submission_head(href, size))
+
@@ -0,0 +1,245 @@
+import re
+import threading
+from collections import namedtuple, OrderedDict, deque
+from datetime import datetime, timezone
+from typing import List, Iterable, Optional, Dict
+from xml.etree import ElementTree
+from xml.etree.ElementTree import ParseError
+
+import numpy as np
+import pandas as pd
+import requests
+from sqlalchemy.engine import Connection
+
+from edgar_prelim.edgar_db import prelim_engine, prelim_cik_table, upgrade_schema
+from edgar_prelim.edgar_fingerprint import register_pattern_version
+from edgar_prelim.edgar_http import http_get
+from edgar_prelim.edgar_items import PrelimItem
+from edgar_prelim.edgar_load import load_filing
+from edgar_prelim.edgar_query import Filing
+from edgar_prelim.logging_config import init_logging
+
+logger = init_logging(__name__)
+
+"""
+Watches Edgar's latest-filings feed and loads the 8-Ks of the companies in the cik table as soon as they appear, rather
+than waiting for the next batch update_database. The feed is polled with conditional requests, so polls that find
+nothing new cost SEC a 304 and no body.
+"""
+
+LATEST_FILINGS_URL = 'https://www.sec.gov/cgi-bin/browse-edgar'
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+# A filing listed in the feed. 'updated' is the time Edgar accepted the filing.
+FeedEntry = namedtuple('FeedEntry', ['cik', 'accession', 'filing', 'company_name', 'updated'])
+
+
+def latest_filings_params(filing_type: str = '8-K', count: int = 100) -> Dict[str, str]:
+    return {
+        'action': 'getcurrent',
+        'type': filing_type,
+        'company': '',
+        'dateb': '',
+        'owner': 'include',
+        'start': '0',
+        'count': str(count),
+        'output': 'atom',
+    }
+
+
+def parse_feed(content: bytes) -> List[FeedEntry]:
+    """Parses the entries of the latest-filings Atom feed, most recent first."""
+    try:
+        root = ElementTree.fromstring(content)
+    except ParseError:
+        return []
+
+    entries = []
+    for entry in root.iter(f'{ATOM}entry'):
+        title = entry.findtext(f'{ATOM}title', '')
+        cik = re.search(r'\((\d{10})\)', title)
+        accession = re.search(r'accession-number=(\d{10}-\d{2}-\d{6})', entry.findtext(f'{ATOM}id', ''))
+        link = entry.find(f'{ATOM}link')
+        category = entry.find(f'{ATOM}category')
+        if not (cik and accession and link is not None and category is not None):
+            continue
+
+        updated = datetime.fromisoformat(entry.findtext(f'{ATOM}updated'))
+        filed = re.search(r'Filed:</b>\s*(\d{4}-\d{2}-\d{2})', entry.findtext(f'{ATOM}summary', ''))
+        filing_date = datetime.strptime(filed.group(1), '%Y-%m-%d').date() if filed else updated.date()
+        company_name = re.sub(r'^.+? - (.+) \(\d{10}\).*$', r'\1', title)
+        entries.append(FeedEntry(
+            cik=cik.group(1),
+            accession=accession.group(1),
+            filing=Filing(date=filing_date, type=category.get('term'), href=link.get('href')),
+            company_name=company_name,
+            updated=updated))
+    return entries
+
+
+class WatchMetrics(object):
+    """Counts of the watcher's activity and the latencies, in seconds, from Edgar accepting a filing to the watcher
+    detecting it and to its statement rows being written."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.polls = 0
+        self.not_modified = 0
+        self.entries = 0
+        self.filings = 0
+        self.prelims = 0
+        self.errors = 0
+        self.detect_latency = deque(maxlen=window)
+        self.row_latency = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_poll(self, modified: bool, entries: int = 0):
+        with self._lock:
+            self.polls += 1
+            self.not_modified += 0 if modified else 1
+            self.entries += entries
+
+    def record_filing(self, detect_latency: float, row_latency: Optional[float], error: bool = False):
+        with self._lock:
+            self.filings += 1
+            self.errors += 1 if error else 0
+            self.detect_latency.append(detect_latency)
+            if row_latency is not None:
+                self.prelims += 1
+                self.row_latency.append(row_latency)
+
+    def summary(self) -> Dict[str, float]:
+        """The counts, and the median, 95th percentile and maximum of each latency over the recent window."""
+        with self._lock:
+            res = {k: getattr(self, k) for k in ['polls', 'not_modified', 'entries', 'filings', 'prelims', 'errors']}
+            for name, latencies in [('detect', self.detect_latency), ('row', self.row_latency)]:
+                values = np.array(latencies) if latencies else np.array([np.nan])
+                res[f'{name}_p50'] = float(np.percentile(values, 50))
+                res[f'{name}_p95'] = float(np.percentile(values, 95))
+                res[f'{name}_max'] = float(np.max(values))
+            return res
+
+
+class FeedWatcher(object):
+    """
+    Polls the latest-filings feed and loads the new filings of the CIKs being watched.
+    :param ciks: The CIKs to watch.
+    :param url: The url of the feed.
+    :param params: The query parameters of the feed. By default, the latest 100 8-Ks.
+    :param seen_size: The number of accession numbers to remember, which must be more than the feed lists.
+    :param max_attempts: The number of times a filing that fails to load is tried, once per poll, before giving up.
+    """
+
+    def __init__(self, ciks: Iterable[str], url: str = LATEST_FILINGS_URL, params: Dict[str, str] = None,
+                 items: List[PrelimItem] = None, triage: bool = False, seen_size: int = 10000,
+                 max_attempts: int = 5, conn: Connection = prelim_engine) -> None:
+        self.ciks = set(ciks)
+        self.url = url
+        self.params = params if params is not None else latest_filings_params()
+        self.items = items
+        self.triage = triage
+        self.conn = conn
+        self.metrics = WatchMetrics()
+        self._etag = None
+        self._last_modified = None
+        self._seen = OrderedDict()
+        self._seen_size = seen_size
+        # The entries of watched CIKs that haven't been loaded yet, with the number of times each has failed.
+        self._pending = OrderedDict()
+        self._max_attempts = max_attempts
+        self._stop = threading.Event()
+
+    @staticmethod
+    def from_cik_table(conn: Connection = prelim_engine, **kwargs):
+        """A watcher for the CIKs in the cik table."""
+        cik_df = pd.read_sql(prelim_cik_table.select(), conn)
+        return FeedWatcher(cik_df.cik, conn=conn, **kwargs)
+
+    def _see(self, entry: FeedEntry):
+        self._seen[(entry.accession, entry.cik)] = True
+        while len(self._seen) > self._seen_size:
+            self._seen.popitem(last=False)
+
+    def poll(self) -> List[FeedEntry]:
+        """Requests the feed, if it has changed, and returns the entries of watched CIKs that haven't been loaded,
+        oldest first: those new to the feed and those that failed to load before."""
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+
+        result = http_get(self.url, params=self.params, headers=headers, use_cache=False)
+        if result.status_code == requests.codes.not_modified:
+            self.metrics.record_poll(modified=False)
+            return [entry for entry, _ in self._pending.values()]
+        elif result.status_code != requests.codes.ok:
+            result.raise_for_status()
+
+        self._etag = result.headers.get('ETag')
+        self._last_modified = result.headers.get('Last-Modified')
+        entries = parse_feed(result.content)
+        self.metrics.record_poll(modified=True, entries=len(entries))
+
+        new_entries = [e for e in entries if (e.accession, e.cik) not in self._seen]
+        if self._seen and entries and len(new_entries) == len(entries):
+            logger.warn(f"All {len(entries)} feed entries are new, some filings may have been missed.")
+
+        # The entries of watched CIKs are only seen once they are loaded (see process).
+        for e in reversed(new_entries):
+            if e.cik not in self.ciks:
+                self._see(e)
+            elif (e.accession, e.cik) not in self._pending:
+                self._pending[(e.accession, e.cik)] = (e, 0)
+
+        return [entry for entry, _ in self._pending.values()]
+
+    def process(self, entry: FeedEntry) -> bool:
+        """Loads the entry's filing, recording its latencies. Returns True if it was a prelim. A filing that fails to
+        load is tried again with the next poll, up to max_attempts times."""
+        key = (entry.accession, entry.cik)
+        detect_latency = (datetime.now(timezone.utc) - entry.updated).total_seconds()
+        try:
+            loaded = load_filing(entry.cik, entry.filing, self.items, triage=self.triage, conn=self.conn)
+        except Exception as e:
+            self.metrics.record_filing(detect_latency, None, error=True)
+            attempts = self._pending.get(key, (entry, 0))[1] + 1
+            if attempts < self._max_attempts:
+                logger.error("Failure loading", entry.filing, str(e), f"(attempt {attempts}, will retry)")
+                self._pending[key] = (entry, attempts)
+            else:
+                logger.error("Failure loading", entry.filing, str(e), f"(attempt {attempts}, giving up)")
+                self._pending.pop(key, None)
+                self._see(entry)
+            return False
+
+        self._pending.pop(key, None)
+        self._see(entry)
+
+        row_latency = (datetime.now(timezone.utc) - entry.updated).total_seconds() if loaded else None
+        self.metrics.record_filing(detect_latency, row_latency)
+        if loaded:
+            logger.info(f"Loaded {entry.company_name} {entry.filing} {row_latency:.1f}s after acceptance.")
+        return loaded
+
+    def run_once(self) -> int:
+        """Polls the feed once and loads the new filings. Returns the number of prelims loaded."""
+        return sum(self.process(entry) for entry in self.poll())
+
+    def run(self, interval: float = 30.):
+        """Polls the feed every 'interval' seconds until stopped."""
+        upgrade_schema(self.conn)
+        register_pattern_version(self.items, self.conn)
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Failure polling feed", str(e))
+            logger.info(f"Watch metrics: {self.metrics.summary()}")
+            self._stop.wait(interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == '__main__':
+    FeedWatcher.from_cik_table().run()
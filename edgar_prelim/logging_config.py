@@ -25,6 +25,9 @@ class Logger(object):
         super().__init__()
         self.logger = logging.getLogger(name)
 
+    def debug(self, *vargs):
+        self.logger.debug(' '.join(map(str, list(vargs))))
+
     def info(self, *vargs):
         self.logger.info(' '.join(map(str, list(vargs))))
 
@@ -0,0 +1,119 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from edgar_prelim import bs4_util
+from edgar_prelim.bs4_util import *
+from edgar_prelim.bs4_util import _read_table_grid, _UnsupportedTable
+from edgar_prelim.edgar_title import title_from_table_tag, units_from_table
+
+ROW = '<tr><td>{}</td><td>{}</td><td>{}</td></tr>'
+
+# Tables as they appear in 8-K exhibits, each of which _read_table_grid must read exactly as pd.read_html does.
+TABLES = [
+    ROW.format('Net income', '$', '1,234'),
+    '<tr><td colspan="2">Three Months Ended</td><td>March 31,</td></tr>' + ROW.format('Revenue', '', '(12.5)'),
+    '<tr><td rowspan="2">Assets</td><td>2019</td><td>2018</td></tr><tr><td>1</td><td>2</td></tr>',
+    '<tr><td rowspan="3">A</td><td colspan="2" rowspan="2">B</td></tr><tr></tr><tr><td>C</td></tr>',
+    ROW.format('Net&nbsp;interest&#160;income', '&amp;', '&lt;1&gt;'),
+    ROW.format('Total<br/>deposits', '<b>  Non-interest\n   expense </b>', '<font><i>1</i>,<u>2</u></font>'),
+    ROW.format('<p style="margin:0">Earnings per share:</p><p>Diluted</p>', '—', '  '),
+    '<tr style="visibility: hidden"><td>x</td><td>y</td><td>z</td></tr>' + ROW.format('a', 'b', 'c'),
+    '<tr><th>Item</th><th colspan="2">Amount</th></tr>' + ROW.format('Loans', '$', '5'),
+    '<tr><td>Title</td></tr><tr><td> </td></tr><tr><td>Value</td></tr>',
+    ROW.format('N/A', 'NA', 'nan') + ROW.format('-', 'null', '#N/A'),
+    ROW.format('1,234,567', ',', '(1,234)') + ROW.format('-1,2.5', '1,234 ', '$1,234'),
+    '<tr><td colspan="2">a</td><td>b</td></tr><tr><th colspan="3">c</th></tr><tr><th>d</th><th>e</th></tr>',
+    ROW.format('1', '2', '3') + '<tr></tr><tr><th></th></tr>',
+    '<tr><td>a</td></tr><tr></tr><tr><th></th></tr><tr><td>b</td></tr>',
+    '<tr><td>a</td></tr><tr><td>b</td><td>c</td><td>d</td></tr>',
+    '<tr><td>a</td><td>b</td></tr><tr><td>c</td><td colspan="2">d</td></tr>',
+    ROW.format('a<!-- comment -->b', '<o:p>x</o:p>', '<span>1</span> <span>2</span>'),
+    '<tbody>' + ROW.format('in', 'a', 'tbody') + '</tbody>',
+    '\n' + ROW.format('\n1', '2\n', '\r\n3') + '\n',
+]
+
+# Tables that _read_table_grid leaves to pd.read_html.
+UNSUPPORTED_TABLES = [
+    '<thead>' + ROW.format('a', 'b', 'c') + '</thead>' + ROW.format('1', '2', '3'),
+    '<caption>Title</caption>' + ROW.format('1', '2', '3'),
+    ROW.format('<pre>a\n  b</pre>', '2', '3'),
+    ROW.format('<span style="display:none">a</span>', '2', '3'),
+    '<tr></tr>' + ROW.format('1', '2', '3'),
+    ROW.format('a', 'b', 'c') + '<tr><th>1</th><th>2</th><th>3</th><th>4</th></tr>',
+]
+
+
+def _table(html: str, style: str = '') -> Tag:
+    return BeautifulSoup(f'<html><body><table{style}>{html}</table></body></html>', features='lxml').table
+
+
+@pytest.mark.parametrize('html', TABLES)
+def test_read_table_grid_matches_read_html(html, monkeypatch):
+    df = read_table_tag(_table(html))
+    monkeypatch.setattr(bs4_util, '_read_table_grid', _unsupported)
+    expected = read_table_tag(_table(html))
+    assert df is not None and expected is not None
+    assert df.equals(expected)
+    assert list(df.columns) == list(expected.columns)
+    assert type(df.index) == type(expected.index)
+    assert list(df.dtypes) == list(expected.dtypes)
+    assert all(type(v) is type(e) for v, e in zip(df.values.flat, expected.values.flat))
+
+
+@pytest.mark.parametrize('html', UNSUPPORTED_TABLES)
+def test_read_table_grid_leaves_unusual_tables_to_read_html(html):
+    with pytest.raises(_UnsupportedTable):
+        _read_table_grid(_table(html), 3)
+    assert read_table_tag(_table(html)) is not None
+
+
+def test_read_table_grid_leaves_hidden_tables_to_read_html():
+    with pytest.raises(_UnsupportedTable):
+        _read_table_grid(_table(ROW.format('1', '2', '3'), ' style="display: none"'), 3)
+
+
+def _unsupported(table: Tag, col_count: int):
+    raise _UnsupportedTable()
+
+
+STATEMENT = '<table><tr><td>Net income</td><td>$</td><td>1,234</td></tr>' \
+            '<tr style="visibility:hidden"><td>Financial Highlights</td></tr></table>'
+
+# Documents whose tables are titled from the text within and above them.
+DOCUMENTS = [
+    '<p>(Dollars in thousands)</p><p>Consolidated Statements of Income</p>' + STATEMENT,
+    '<p>Consolidated Balance Sheets</p><div><p>(in millions)</p><div>' + STATEMENT + '</div></div>' + STATEMENT,
+    '<table><tr><td>Financial Highlights</td></tr></table><p>Business Segment Results</p>' + STATEMENT * 3,
+    '<div><p><b>Consolidated Statements of</b> <font>Income</font></p>' + STATEMENT + '</div>' +
+    '<p>Selected Financial Data</p><div><div>' + STATEMENT + '<p>$ in thousands</p>' + STATEMENT + '</div></div>',
+]
+
+
+@pytest.mark.parametrize('html', DOCUMENTS)
+def test_text_index_matches_tag_text(html):
+    def titles_and_units(index: bool):
+        soup = BeautifulSoup(f'<html><body>{html}</body></html>', features='lxml')
+        text_index = TextIndex(soup) if index else None
+        res = []
+        for table in soup.find_all('table'):
+            title = title_from_table_tag(table, index=text_index)
+            res.append(title)
+            if title is not None:
+                res.append(units_from_table(table, title[0], index=text_index))
+        return res
+
+    expected = titles_and_units(index=False)
+    assert any(expected)
+    assert titles_and_units(index=True) == expected
+
+
+def test_text_index_skips_removed_hidden_rows():
+    soup = BeautifulSoup(f'<html><body>{STATEMENT}</body></html>', features='lxml')
+    index = TextIndex(soup)
+    expected_soup = BeautifulSoup(f'<html><body>{STATEMENT}</body></html>', features='lxml')
+
+    # The hidden row is removed by read_table_tag once the first iteration reaches the end of the table.
+    for _ in range(2):
+        assert [txt for txt, _ in index.iter_text(soup.body)] == list(iter_tag_text(expected_soup.body))
+    assert 'Financial Highlights' not in [txt for txt, _ in index.iter_text(soup.body)]
+    assert index.contains_table(soup.body) and not index.contains_table(soup.find('tr'))
@@ -0,0 +1,193 @@
+import re
+import threading
+from datetime import date
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from edgar_prelim.edgar_archive import get_submission_archive, set_submission_archive
+from edgar_prelim.edgar_http import get_response_cache, set_response_cache
+from edgar_prelim.edgar_query import Filing
+from edgar_prelim.edgar_table_cache import get_table_cache, set_table_cache
+
+
+class StandInServer(object):
+    """A local stand-in for the Edgar web site that serves canned pages and records the requests it receives."""
+
+    def __init__(self) -> None:
+        self.pages = {}
+        self.requests = []
+        self.client_ports = set()
+        self.honor_range = True
+        self.etags = {}
+        self.failures = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                server.client_ports.add(self.client_address[1])
+                failures = server.failures.get(self.path.split('?')[0])
+                if failures:
+                    status, headers = failures.pop(0)
+                    self.send_response(status)
+                    for k, v in headers.items():
+                        self.send_header(k, v)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                page = server.pages.get(self.path.split('?')[0])
+                if page is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                body, content_type = page
+                etag = server.etags.get(self.path.split('?')[0])
+                if etag and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                match = re.match(r'bytes=(\d+)-(\d+)$', self.headers.get('Range', ''))
+                if match and server.honor_range:
+                    start, end = int(match.group(1)), int(match.group(2))
+                    body = body[start:end + 1]
+                    self.send_response(206)
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def add_page(self, path: str, body: str, content_type: str = 'text/html', etag: str = None):
+        self.pages[path] = (body.encode('utf-8'), content_type)
+        if etag:
+            self.etags[path] = etag
+        return self.url + path
+
+    def fail(self, path: str, status: int, times: int = 1, headers=None):
+        """Responds to the next 'times' requests for the path with the status and headers."""
+        self.failures.setdefault(path, []).extend([(status, headers or {})] * times)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture()
+def edgar_server():
+    server = StandInServer()
+    previous_cache, previous_archive = get_response_cache(), get_submission_archive()
+    previous_tables = get_table_cache()
+    set_response_cache(None)
+    set_submission_archive(None)
+    set_table_cache(None)
+    yield server
+    set_response_cache(previous_cache)
+    set_submission_archive(previous_archive)
+    set_table_cache(previous_tables)
+    server.close()
+
+
+def stand_in_index_page(submission_href: str, period: str = '2019-03-31', fye: str = '1231') -> str:
+    """An 8-K filing index page with the elements used by edgar_query."""
+    return f"""<html><body>
+    <div id="formName"><strong>Form 8-K</strong> - Current report:</div>
+    <div class="formGrouping"><div class="infoHead">Period of Report</div><div class="info">{period}</div></div>
+    <table class="tableFile" summary="Document Format Files">
+    <tr><td>3</td><td>Complete submission text file</td><td><a href="{submission_href}">x.txt</a></td></tr>
+    </table>
+    <p class="identInfo">State of Incorp.: <strong>DE</strong> | Fiscal Year End: <strong>{fye}</strong><br />Type: 8-K
+    </p>
+    </body></html>"""
+
+
+def stand_in_submission(accession: str, cik: str, documents=(), period: str = '20190331', items=()) -> str:
+    """A submission text file containing the supplied (type, filename, text) documents and ITEM INFORMATION items. A
+    period of None leaves the CONFORMED PERIOD OF REPORT out of the header."""
+    docs = ''.join(
+        f'<DOCUMENT>\n<TYPE>{doc_type}\n<SEQUENCE>{i}\n<FILENAME>{filename}\n<TEXT>\n{text}\n</TEXT>\n</DOCUMENT>\n'
+        for i, (doc_type, filename, text) in enumerate(documents, start=1))
+    return (f'<SEC-DOCUMENT>{accession}.txt : 20190415\n'
+            f'<SEC-HEADER>{accession}.hdr.sgml : 20190415\n'
+            f'ACCESSION NUMBER:\t\t{accession}\n'
+            f'CONFORMED SUBMISSION TYPE:\t8-K\n'
+            + (f'CONFORMED PERIOD OF REPORT:\t{period}\n' if period else '')
+            + ''.join(f'ITEM INFORMATION:\t\t{item}\n' for item in items)
+            + f'FILER:\n\n\tCOMPANY DATA:\t\n\t\tCENTRAL INDEX KEY:\t\t\t{cik}\n'
+            f'\t\tFISCAL YEAR END:\t\t\t1231\n'
+            f'</SEC-HEADER>\n{docs}</SEC-DOCUMENT>\n')
+
+
+# A press release with an income statement from which edgar_submission extracts items.
+STAND_IN_EARNINGS_HTML = """<html><body>
+<p>CONSOLIDATED STATEMENTS OF INCOME (Unaudited)</p>
+<p>(Dollars in thousands, except per share data)</p>
+<table>
+<tr><td></td><td>Three Months Ended</td><td></td></tr>
+<tr><td></td><td>March 31, 2019</td><td>March 31, 2018</td></tr>
+<tr><td>Total interest income</td><td>12,345</td><td>11,000</td></tr>
+<tr><td>Total interest expense</td><td>2,345</td><td>2,000</td></tr>
+<tr><td>Net interest income</td><td>10,000</td><td>9,000</td></tr>
+<tr><td>Provision for loan losses</td><td>500</td><td>400</td></tr>
+<tr><td>Net income</td><td>3,210</td><td>3,000</td></tr>
+<tr><td>Diluted earnings per share</td><td>1.23</td><td>1.10</td></tr>
+</table></body></html>"""
+
+# A press release without any statements.
+STAND_IN_OTHER_EVENTS_HTML = '<html><p>Other events</p></html>'
+
+
+def stand_in_filing(server: StandInServer, i: int, documents=None, cik: str = '0000000001', items=(),
+                    index_page: bool = False, serve: bool = True) -> Filing:
+    """
+    The i'th 8-K filing of the CIK, filed on 2019-04-i, whose submission text file the server serves with the
+    (type, filename, text) documents and ITEM INFORMATION items. By default the submission has a press release with
+    STAND_IN_EARNINGS_HTML when i is odd, and with STAND_IN_OTHER_EVENTS_HTML when it's even. With index_page, the
+    server serves the filing's index page too, and without serve, neither.
+    """
+    accession = f'{cik}-19-{i:06d}'
+    if documents is None:
+        documents = [('EX-99.1', 'ex991.htm', STAND_IN_EARNINGS_HTML if i % 2 else STAND_IN_OTHER_EVENTS_HTML)]
+    path = f'/Archives/edgar/data/{int(cik)}/{accession}'
+    if serve:
+        submission_href = server.add_page(f'{path}.txt', stand_in_submission(accession, cik, documents, items=items),
+                                          'text/plain')
+        if index_page:
+            server.add_page(f'{path}-index.htm', stand_in_index_page(submission_href))
+    return Filing(date=date(2019, 4, i), type='8-K', href=f'{server.url}{path}-index.htm')
+
+
+def stand_in_feed_entry(cik: str, accession: str, href: str, company_name: str = 'STAND-IN BANCORP',
+                        updated: str = '2019-04-15T08:03:21-04:00') -> str:
+    """An entry of the latest-filings Atom feed."""
+    return f"""<entry>
+    <title>8-K - {company_name} ({cik}) (Filer)</title>
+    <link rel="alternate" type="text/html" href="{href}"/>
+    <summary type="html"> &lt;b&gt;Filed:&lt;/b&gt; 2019-04-15 &lt;b&gt;AccNo:&lt;/b&gt; {accession} </summary>
+    <updated>{updated}</updated>
+    <category scheme="https://www.sec.gov/" label="form type" term="8-K"/>
+    <id>urn:tag:sec.gov,2008:accession-number={accession}</id>
+    </entry>"""
+
+
+def stand_in_feed(entries) -> str:
+    return ('<?xml version="1.0" encoding="ISO-8859-1" ?>\n<feed xmlns="http://www.w3.org/2005/Atom">\n'
+            '<title>Latest Filings</title>\n' + ''.join(entries) + '</feed>\n')
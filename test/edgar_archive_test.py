@@ -0,0 +1,65 @@
+import gzip
+from datetime import date
+from typing import Tuple
+
+from sqlalchemy import create_engine
+
+from conftest import stand_in_submission, STAND_IN_EARNINGS_HTML
+from edgar_prelim.edgar_archive import *
+from edgar_prelim.edgar_submission import load_submission, parse_submission
+
+DOCUMENTS = [
+    ('8-K', 'form8k.htm', '<html><p>Item 2.02 Results of Operations</p></html>'),
+    ('GRAPHIC', 'logo.jpg', 'begin 644 logo.jpg\nM_]C_X  02D9)1@'),
+    ('EX-99.1', 'ex991.htm', STAND_IN_EARNINGS_HTML),
+    ('EX-99.2', 'ex992.htm', '<html><p>Item 2.02 Results of Operations</p></html>'),
+]
+
+
+def _archive(tmp_path) -> SubmissionArchive:
+    return SubmissionArchive(tmp_path / 'archive', conn=create_engine(f'sqlite:///{tmp_path / "prelim.db"}'))
+
+
+def _add_submission(server, cik: str, i: int) -> Tuple[str, str]:
+    accession = f'{cik}-19-{i:06d}'
+    raw = stand_in_submission(accession, cik, DOCUMENTS + [('EX-99.3', 'ex993.htm', f'<html>{i}</html>')])
+    return server.add_page(f'/Archives/edgar/data/{int(cik)}/{accession}.txt', raw, 'text/plain'), raw
+
+
+def test_load_submission_from_archive(edgar_server, tmp_path):
+    hrefs, raws = zip(*[_add_submission(edgar_server, cik, i) for cik in ['0000000001', '0000000002']
+                        for i in range(1, 4)])
+    archive = _archive(tmp_path)
+    set_submission_archive(archive)
+
+    downloaded = [load_submission(href) for href in hrefs]
+    assert len(edgar_server.requests) == len(hrefs)
+    assert downloaded == [parse_submission(raw)._replace(raw=None) for raw in raws]
+
+    assert [load_submission(href) for href in hrefs] == downloaded
+    assert len(edgar_server.requests) == len(hrefs)
+
+    entries = archive.entries(cik='0000000001')
+    assert [e.accession for e in entries] == [f'0000000001-19-{i:06d}' for i in range(1, 4)]
+    assert {e.filing_date for e in entries} == {date(2019, 4, 15)}
+    assert [d[:2] for d in entries[0].documents] == [(t, f) for t, f, _ in DOCUMENTS if t != 'GRAPHIC'] + \
+        [('EX-99.3', 'ex993.htm')]
+
+    # Each CIK's archive file is an ordinary gzip file of its submissions, one after the other.
+    with gzip.open(tmp_path / 'archive' / entries[0].path, 'rb') as f:
+        assert f.read() == b''.join(archive.read(e) for e in entries)
+
+
+def test_archive_grows_while_read(tmp_path):
+    archive = _archive(tmp_path)
+    raws = [stand_in_submission(f'0000000001-19-{i:06d}', '0000000001', DOCUMENTS) for i in range(1, 4)]
+
+    entries = []
+    for i, raw in enumerate(raws, start=1):
+        entry = ArchiveEntry(f'0000000001-19-{i:06d}', '0000000001', None, None, None, None, 'ISO-8859-1', (0, 0), [])
+        entries.append(archive.put(entry, raw.encode('latin-1')))
+        assert [archive.read(e).decode('latin-1') for e in entries] == raws[:i]
+
+    assert archive.put(entries[0]._replace(path=None), b'ignored') == entries[0]
+    assert archive.entry('0000000001-19-000004') is None
+    assert archive.entries(start=date(2019, 1, 1)) == []
@@ -0,0 +1,71 @@
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from conftest import stand_in_filing, STAND_IN_EARNINGS_HTML
+from edgar_prelim.edgar_backfill import *
+from edgar_prelim.edgar_db import upgrade_schema
+from edgar_prelim.edgar_fingerprint import register_pattern_version
+from edgar_prelim.edgar_items import prelim_items
+from edgar_prelim.edgar_load import load_prelim_statements, save_overrides
+
+WITHOUT_NET_INCOME = [item for item in prelim_items if item.name != 'net income']
+
+
+def _statements(engine) -> pd.DataFrame:
+    return pd.read_sql('select * from prelim_statement order by cik, filing_date, item', engine)
+
+
+def test_backfill_items(edgar_server, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "prelim.db"}')
+    upgrade_schema(engine)
+    for items in [prelim_items, WITHOUT_NET_INCOME]:
+        register_pattern_version(items, conn=engine)
+    for cik in [1, 2]:
+        filings = [stand_in_filing(edgar_server, i, cik=f'{cik:010d}') for i in range(1, 6)]
+        # The first filing is loaded with net income, and the others without it.
+        load_prelim_statements(f'{cik:010d}', start=date(2019, 1, 1), filings=filings[:1], conn=engine)
+        load_prelim_statements(f'{cik:010d}', start=date(2019, 1, 1), filings=filings[1:], items=WITHOUT_NET_INCOME,
+                               conn=engine)
+    # A prelim without net income.
+    without = STAND_IN_EARNINGS_HTML.replace('<tr><td>Net income</td><td>3,210</td><td>3,000</td></tr>', '')
+    filing = stand_in_filing(edgar_server, 7, [('EX-99.1', 'ex991.htm', without)])
+    load_prelim_statements('0000000001', start=date(2019, 1, 1), filings=[filing], items=WITHOUT_NET_INCOME,
+                           conn=engine)
+
+    loaded = _statements(engine)
+    net_income = loaded[loaded.item == 'net income']
+    assert len(net_income) == 2
+    save_overrides(net_income[net_income.cik == '0000000001'].assign(item_value=1.0), conn=engine)
+    before = _statements(engine)
+    assert query_ciks_with_prelims(engine) == ['0000000001', '0000000002']
+
+    progress = backfill_items(['net income'], workers=2, conn=engine)
+    assert (progress.done, progress.failed, progress.filings) == (2, 0, 5)
+
+    # Net income is added to the other prelims, and the rows already loaded, overridden or not, are left alone.
+    after = _statements(engine)
+    added = after[(after.item == 'net income') & (after.filing_date > '2019-04-01')]
+    assert len(after) == len(before) + 4
+    assert added.item_value.tolist() == [3210000.] * 4
+    assert set(added.pattern_version) == {pattern_version()}
+    compared = [c for c in before.columns if c != 'pattern_version']
+    assert pd.merge(after[compared], before[compared], how='inner').shape[0] == len(before)
+    assert after[after.is_overridden == True].item_value.tolist() == [1.0]
+
+    # The backfilled filings and their statements are marked as if they had been loaded with net income, including
+    # the one without it, except for the overridden item.
+    assert set(after[after.is_overridden == False].pattern_version) == {pattern_version()}
+    filing_df = pd.read_sql('select * from prelim_filing where is_prelim', engine)
+    assert set(filing_df.pattern_version) == {pattern_version()}
+
+    # So backfilling the item again visits nothing.
+    assert backfill_items(['net income'], workers=2, conn=engine).filings == 0
+    assert _statements(engine).equals(after)
+
+    # The statements are those that reloading the filings produces.
+    for cik in [1, 2]:
+        filings = [stand_in_filing(edgar_server, i, cik=f'{cik:010d}') for i in range(1, 6)] + [filing] * (cik == 1)
+        load_prelim_statements(f'{cik:010d}', start=date(2019, 1, 1), reload=True, filings=filings, conn=engine)
+    assert _statements(engine).equals(after)
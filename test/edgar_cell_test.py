@@ -0,0 +1,60 @@
+import pytest
+
+from edgar_prelim.edgar_cell import *
+from edgar_prelim.edgar_cell import _classify_lower
+from edgar_prelim.edgar_fiscal_period import is_header_part
+
+CELLS = [
+    '', 'Three Months Ended', 'March 31,', '2019', '(Unaudited)', '(In thousands)', '$', '1,234', '(12)', '—', '2,019',
+    'Net income', 'Q1 2019', 'Q4\n2018', '1Q19', 'First Quarter', '30', '3/31/2019', 'Mar. 31, 2019', '% change',
+    'Year-to-date', 'As Reported', '$ in millions', 'nan', '2019 (Unaudited)', 'Nine months ended September 30, 2018',
+    'Q1 2019 vs Q4 2018', 'At or for the year ended',
+]
+
+
+@pytest.mark.parametrize('cell', CELLS)
+def test_classify_cell(cell):
+    bits = classify_cell(cell)
+    assert bool(bits & CELL_HEADER_PART) == is_header_part(cell)
+    assert bool(bits & CELL_UNITS) == is_units(cell)
+    assert bool(bits & CELL_UNAUDITED) == (re.search(UNAUDITED_EXACT, cell, flags=re.IGNORECASE) is not None)
+    assert bool(bits & CELL_FISCAL_PERIOD) == (parse_fiscal_period(cell) is not None)
+    assert classify_cell(cell.upper()) == bits
+
+
+def test_classify_cell_row_parts():
+    assert [c for c in CELLS if classify_cell(c) & CELL_ROW_PART] == ['1,234', '(12)', '—']
+
+
+def test_is_fiscal_period_cell_matches_parse_fiscal_period():
+    for prefix in ['', 'Three Months Ended', 'Quarter Ended', 'Full Year', '% change']:
+        for cell in CELLS:
+            assert is_fiscal_period_cell(cell, prefix) == (parse_fiscal_period(cell, prefix=prefix) is not None)
+
+
+def test_classify_cell_is_cached():
+    _classify_lower.cache_clear()
+    for _ in range(3):
+        for cell in CELLS:
+            classify_cell(cell)
+    assert _classify_lower.cache_info().misses == len(set(map(str.lower, CELLS)))
+
+
+def test_classify_cells():
+    cells = np.array(CELLS + [np.nan, None], dtype=object).reshape(-1, 3)
+    assert classify_cells(cells).tolist() == [
+        [classify_cell(cell) if isinstance(cell, str) else 0 for cell in row] for row in cells]
+
+
+def test_parse_item_values():
+    cells = CELLS + ['$ 1,234.5', '(1.2.3)', '12%', '--', '*', np.nan, 7]
+    values, valid = parse_item_values(np.array(cells, dtype=object))
+    for cell, value, is_valid in zip(cells, values, valid):
+        expected = parse_item_value(cell) if isinstance(cell, str) else None
+        assert is_valid == (expected is not None)
+        assert np.isnan(value) if expected is None or np.isnan(expected) else value == expected
+
+    values, valid = parse_item_values(np.array([['$', '(12)'], ['—', np.nan]], dtype=object))
+    assert valid.tolist() == [[False, True], [True, False]]
+    assert values[valid].tolist() == [-12., 0.]
+    assert parse_item_values(np.empty((0, 2), dtype=object))[0].shape == (0, 2)
@@ -0,0 +1,89 @@
+import threading
+import time
+from datetime import date
+
+from conftest import stand_in_filing, stand_in_index_page, stand_in_submission
+from edgar_prelim.edgar_fetch import *
+from edgar_prelim.edgar_http import RequestGovernor, set_rate_limit, http_get
+from edgar_prelim.edgar_query import FiscalPeriod, Report
+
+
+def _add_filing(server, i: int) -> Filing:
+    return stand_in_filing(server, i, [('EX-99.1', 'ex991.htm', f'<html><p>{i}</p></html>')], index_page=True)
+
+
+def test_prefetch_filings_in_order(edgar_server):
+    filings = [_add_filing(edgar_server, i) for i in range(1, 8)]
+    filings.append(Filing(date=date(2019, 4, 9), type='10-Q', href=edgar_server.url + '/missing'))
+
+    results = list(prefetch_filings(filings, prefetch_size=3))
+    assert [r.key for r in results] == filings
+
+    for i, (filing, fetched, error) in enumerate(results[:7], start=1):
+        assert error is None
+        report, submission = fetched
+        assert report.fiscal_period == FiscalPeriod(2019, 1)
+        assert report.fpe_date == date(2019, 3, 31)
+        assert submission.documents[0].text.strip() == f'<html><p>{i}</p></html>'
+
+    assert results[7].value is None and results[7].error is None
+
+
+def test_prefetch_overlaps_slow_fetches():
+    def slow(key):
+        time.sleep(0.2)
+        if key == 3:
+            raise ValueError(key)
+        return key * 2
+
+    started = time.monotonic()
+    results = list(prefetch(range(8), slow, prefetch_size=8))
+    assert time.monotonic() - started < 0.2 * 4
+    assert [r.value for r in results] == [0, 2, 4, None, 8, 10, 12, 14]
+    assert isinstance(results[3].error, ValueError)
+
+
+def test_governor_limits_rate_across_threads():
+    governor = RequestGovernor(rate=50)
+    started = time.monotonic()
+    threads = [threading.Thread(target=lambda: [governor.acquire() for _ in range(5)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 20 tokens at 50/s, the first of which is available immediately.
+    assert time.monotonic() - started >= 19 / 50 - 0.01
+
+
+def test_rate_limit_applies_to_requests(edgar_server):
+    url = edgar_server.add_page('/page', '<html></html>')
+    set_rate_limit(20)
+    try:
+        started = time.monotonic()
+        list(prefetch([url] * 6, http_get, prefetch_size=6))
+        assert time.monotonic() - started >= 5 / 20 - 0.01
+        assert len(edgar_server.requests) == 6
+    finally:
+        set_rate_limit(10)
+
+
+def test_fetch_filing_skips_index_page(edgar_server):
+    filing = _add_filing(edgar_server, 1)
+    report, submission = fetch_filing(filing)
+    assert report == Report(date(2019, 3, 31), date(2019, 12, 31), FiscalPeriod(2019, 1),
+                            filing.href.replace('-index.htm', '.txt'))
+    assert [path for path, _ in edgar_server.requests] == ['/Archives/edgar/data/1/0000000001-19-000001.txt']
+
+
+def test_fetch_filing_falls_back_to_index_page(edgar_server):
+    accession = '0000000001-19-000001'
+    submission_href = edgar_server.add_page(f'/Archives/edgar/data/1/{accession}.txt',
+                                            stand_in_submission(accession, '0000000001', period=None),
+                                            content_type='text/plain')
+    index_href = edgar_server.add_page(f'/Archives/edgar/data/1/{accession}-index.htm',
+                                       stand_in_index_page(submission_href, period='2019-06-30', fye='0930'))
+
+    report, submission = fetch_filing(Filing(date=date(2019, 7, 1), type='8-K', href=index_href))
+    assert report == Report(date(2019, 6, 30), date(2019, 9, 30), FiscalPeriod(2019, 3), submission_href)
+    assert len(edgar_server.requests) == 2
@@ -0,0 +1,71 @@
+from sqlalchemy import create_engine
+
+from edgar_prelim.edgar_db import upgrade_schema
+from edgar_prelim.edgar_fingerprint import *
+from edgar_prelim.edgar_fingerprint import _code_digest
+
+
+def _without(items, name):
+    return [item for item in items if item.name != name]
+
+
+def test_pattern_version():
+    assert pattern_version() == pattern_version(list(prelim_items))
+    assert pattern_version(_without(prelim_items, 'net income')) != pattern_version()
+
+    changed = [item._replace(min_abs_value=1) if item.name == 'net income' else item for item in prelim_items]
+    assert pattern_version(changed) != pattern_version()
+
+
+def _parse_year(m):
+    return m.group(1)
+
+
+def test_code_digest(monkeypatch):
+    parsers = [lambda m: m.group(1), lambda m: m.group(2), lambda m: _parse_year(m)]
+    assert _code_digest(parsers[0]) != _code_digest(parsers[1])
+    assert _code_digest(parsers[0]) == _code_digest(lambda m: m.group(1))
+
+    # A change to a helper that a parser calls changes the parser's digest.
+    digest = _code_digest(parsers[2])
+    monkeypatch.setitem(globals(), '_parse_year', lambda m: m.group(2))
+    assert _code_digest(parsers[2]) != digest
+
+
+def test_register_pattern_version():
+    engine = create_engine('sqlite://')
+    upgrade_schema(engine)
+    items = _without(prelim_items, 'net income')
+    version = register_pattern_version(items, conn=engine)
+    assert register_pattern_version(items, conn=engine) == version
+    assert query_pattern_components(version, conn=engine) == pattern_components(items)
+    assert query_pattern_components('unknown', conn=engine) is None
+
+
+def test_changed_components():
+    current = pattern_components()
+    assert changed_components(current, current) == {}
+
+    changed = changed_components(current, pattern_components(_without(prelim_items, 'net income')))
+    assert list(changed) == [ITEMS]
+    assert {c.key for c in changed[ITEMS]} == {'net income/0', 'net income/1'}
+
+    # Dropping a title pattern changes the rank of every pattern after it.
+    titles = current[TITLES]
+    changed = changed_components(current, dict(current, titles=titles[:2] + [
+        c._replace(key=f'inclusion/{int(c.key.split("/")[1]) - 1}') if c.key.startswith('inclusion') else c
+        for c in titles[3:]]))
+    inclusions = [c for c in titles if c.key.startswith('inclusion')]
+    assert {c.key for c in changed[TITLES]} == {c.key for c in inclusions[2:]}
+
+
+def test_dependency_screen():
+    current = pattern_components()
+    screen = DependencyScreen(changed_components(current, pattern_components(_without(prelim_items, 'net income'))))
+    assert not screen.unscreened
+    assert screen.may_depend(['otherevents', 'consolidatedstatementsofincomenetincome3,210'])
+    assert not screen.may_depend(['otherevents', 'totalinterestincome'])
+    assert not DependencyScreen({}).may_depend(['netincome'])
+
+    fiscal_periods = dict(current, fiscal_periods=current[FISCAL_PERIODS][1:])
+    assert DependencyScreen(changed_components(current, fiscal_periods)).may_depend(['otherevents'])
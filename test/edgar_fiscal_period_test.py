@@ -0,0 +1,35 @@
+import pytest
+
+from edgar_prelim.edgar_fiscal_period import *
+
+# Header strings as they appear in 8-K exhibits, matched by each of the fiscal period patterns or by none of them.
+HEADERS = [
+    '1Q 2019', '4qtr19', 'Q1 2019', 'qtr 4 2018', "2019 Q1", "'19Q2", '2019 First Quarter', 'Fourth Quarter 2018',
+    '3rd Qtr. 2018', 'Quarter 2019 First', 'Three Months Ended March 31, 2019', 'For the Quarter Ended June 30,2019 (a)',
+    'Three Months Ended September 30, 18', 'March 31, 2019', 'Mar. 31, 2019', 'Dec 31 2018*', 'June 30, 2019 (Unaudited)',
+    'Three Months Ended 3/31/2019', 'Quarter Ended 31-March 2019', 'Three Months Ended 2019 March 31',
+    '31-Mar-19', '3/31/19', '12/31/2018', 'Q3 2018', '2019 QTD', 'QTR 2018', '2019 March 31',
+    'Six Months Ended June 30, 2019', 'Year Ended December 31, 2018', 'Q1 2019 vs Q1 2018', '% Change', 'Year-to-date',
+    'Three Months Ended', 'March 31,', '2019', 'Net income', '1,234', '', 'M a r c h 3 1 , 2 0 1 9', '1q1999',
+]
+
+
+@pytest.mark.parametrize('header', HEADERS)
+def test_parse_fiscal_period_matches_pattern_by_pattern(header):
+    # Sequences other than the defaults are searched pattern by pattern, without being screened.
+    expected = parse_fiscal_period(header, patterns=list(fiscal_period_patterns),
+                                   exclusions=list(fiscal_period_exclusions))
+    assert parse_fiscal_period(header) == expected
+    for prefix in ['Three Months Ended', 'Quarter Ended', 'Six Months Ended']:
+        assert parse_fiscal_period(header, prefix) == parse_fiscal_period(
+            header, prefix, patterns=list(fiscal_period_patterns), exclusions=list(fiscal_period_exclusions))
+
+
+def test_parse_fiscal_period():
+    assert parse_fiscal_period('Three Months Ended March 31, 2019') == ('2019Q1', 12)
+    assert parse_fiscal_period('Q1 2019') == ('2019Q1', 17)
+    assert parse_fiscal_period('3/31/19') == ('2019Q1', 5)
+    assert parse_fiscal_period('March 31,', prefix='Three Months Ended') is None
+    assert parse_fiscal_period('2019', prefix='Three Months Ended March 31,') == ('2019Q1', 12)
+    assert parse_fiscal_period('Six Months Ended June 30, 2019') is None
+    assert parse_fiscal_period('Net income') is None
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+import requests
+
+from edgar_prelim.edgar_cache import *
+from edgar_prelim.edgar_http import *
+
+
+def test_cache_key_ignores_param_order():
+    assert cache_key('https://www.sec.gov/x', {'a': 1, 'b': 2}) == cache_key('https://www.sec.gov/x', {'b': 2, 'a': 1})
+    assert cache_key('https://www.sec.gov/x', {'a': 1}) != cache_key('https://www.sec.gov/x', {'a': 2})
+    assert cache_key('https://www.sec.gov/x') == cache_key('https://www.sec.gov/x', {})
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskResponseCache(tmp_path)
+    url = 'https://www.sec.gov/Archives/edgar/data/1/0000000001-19-000001.txt'
+    assert cache.get(url) is None
+
+    response = CachedResponse(url, 200, 'ISO-8859-1', b'<SEC-DOCUMENT>0000000001-19-000001.txt\n')
+    cache.put(url, None, response)
+    assert cache.get(url) == response
+    assert cache.get(url, {'a': 1}) is None
+    assert DiskResponseCache(tmp_path).size == cache.size > 0
+    assert list(DiskResponseCache(tmp_path).responses()) == [response]
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    def response(i):
+        return CachedResponse(f'https://www.sec.gov/{i}', 200, None, str(i).encode('utf-8') * 100)
+
+    cache = DiskResponseCache(tmp_path)
+    cache.put(response(1).url, None, response(1))
+    cache.max_bytes = int(cache.size * 2.5)
+    cache.put(response(2).url, None, response(2))
+    assert cache.get(response(1).url) == response(1)
+
+    cache.put(response(3).url, None, response(3))
+    assert cache.get(response(2).url) is None
+    assert cache.get(response(1).url) == response(1)
+    assert cache.get(response(3).url) == response(3)
+    assert cache.size <= cache.max_bytes
+
+
+def test_replay_only_cache_fails_fast(tmp_path):
+    DiskResponseCache(tmp_path).put('https://www.sec.gov/1', None,
+                                    CachedResponse('https://www.sec.gov/1', 200, 'utf-8', b'one'))
+
+    previous = get_response_cache()
+    set_response_cache(DiskResponseCache(tmp_path, replay_only=True))
+    try:
+        assert http_get('https://www.sec.gov/1').text == 'one'
+        with pytest.raises(CacheMissError):
+            http_get('https://www.sec.gov/2')
+        assert not is_retryable(CacheMissError('https://www.sec.gov/2'))
+    finally:
+        set_response_cache(previous)
+
+
+def test_session_is_shared_and_configured(edgar_server):
+    url = edgar_server.add_page('/page', '<html></html>')
+    with edgar_session(user_agent='Test Agent test@example.com') as session:
+        assert get_session() is session
+        for _ in range(3):
+            assert http_get(url).status_code == 200
+
+    assert len(edgar_server.client_ports) == 1
+    for _, headers in edgar_server.requests:
+        assert headers['User-Agent'] == 'Test Agent test@example.com'
+        assert 'gzip' in headers['Accept-Encoding']
+
+    assert get_session() is not session
+    close_session()
+
+
+def test_governor_honors_retry_after_and_recovers(edgar_server):
+    url = edgar_server.add_page('/page', '<html></html>')
+    edgar_server.fail('/page', 429, headers={'Retry-After': '1'})
+    previous = get_governor()
+    governor = RequestGovernor(rate=20, recovery_seconds=0.5)
+    set_governor(governor)
+    try:
+        @governed_retry()
+        def get():
+            result = http_get(url)
+            result.raise_for_status()
+            return result
+
+        started = time.monotonic()
+        assert get().status_code == 200
+        assert time.monotonic() - started >= 1
+        assert governor.stats.retries == 1 and governor.stats.throttled == 1
+        assert governor.stats.throttled_seconds >= 0.9
+        assert governor.rate == pytest.approx(20, rel=0.5)
+        time.sleep(0.5)
+        assert governor.rate == 20
+    finally:
+        set_governor(previous)
+
+
+def test_governor_does_not_retry_client_errors(edgar_server):
+    url = edgar_server.url + '/missing'
+    calls = []
+
+    @governed_retry()
+    def get():
+        calls.append(url)
+        http_get(url).raise_for_status()
+
+    with pytest.raises(requests.HTTPError):
+        get()
+    assert len(calls) == 1
+
+
+def test_governor_state_is_shared_between_processes(tmp_path):
+    path = tmp_path / 'governor.json'
+    first = RequestGovernor(rate=100, state_path=path)
+    second = RequestGovernor(rate=100, state_path=path)
+
+    first.throttle(0.5)
+    assert second.rate == pytest.approx(50, rel=0.01)
+    started = time.monotonic()
+    second.acquire()
+    assert time.monotonic() - started >= 0.45
@@ -0,0 +1,77 @@
+from datetime import date
+
+from sqlalchemy import create_engine
+
+from edgar_prelim.edgar_index import *
+
+MASTER_IDX = """Description:           Master Index of EDGAR Dissemination Feed
+Last Data Received:    April 30, 2019
+Comments:              webmaster@sec.gov
+Anonymous FTP:         ftp://ftp.sec.gov/edgar/
+Cloud HTTP:            https://www.sec.gov/Archives/
+
+
+
+
+CIK|Company Name|Form Type|Date Filed|Filename
+--------------------------------------------------------------------------------
+51143|INTERNATIONAL BUSINESS MACHINES CORP|8-K|2019-04-16|edgar/data/51143/0001104659-19-021739.txt
+51143|INTERNATIONAL BUSINESS MACHINES CORP|10-Q|2019-04-30|edgar/data/51143/0001558370-19-003644.txt
+831001|CITIGROUP INC|8-K|2019-04-15|edgar/data/831001/0000831001-19-000071.txt
+831001|CITIGROUP INC|8-K/A|2019-04-01|edgar/data/831001/0000831001-19-000050.txt
+"""
+
+FORM_IDX = """Description:           Daily Index of EDGAR Dissemination Feed by Form Type
+Last Data Received:    Apr 15, 2019
+
+Form Type   Company Name                                                  CIK         Date Filed  File Name
+---------------------------------------------------------------------------------------------------------------------------------------------
+8-K         CITIGROUP INC                                                 831001      20190415    edgar/data/831001/0000831001-19-000071.txt
+"""
+
+
+def test_parse_master_and_form_index():
+    master_df = parse_index(MASTER_IDX, filing_types=['8-K'])
+    assert list(master_df.filing_type) == ['8-K', '8-K', '8-K/A']
+    assert master_df.cik.iloc[0] == '0000051143'
+    assert master_df.filing_href.iloc[0] == \
+        'https://www.sec.gov/Archives/edgar/data/51143/000110465919021739/0001104659-19-021739-index.htm'
+
+    form_df = parse_index(FORM_IDX)
+    assert form_df.to_dict('records') == master_df.iloc[[1]].to_dict('records')
+
+
+def test_query_index_for_filings(tmp_path):
+    path = tmp_path / 'master.idx'
+    path.write_text(MASTER_IDX)
+    engine = create_engine('sqlite://')
+    assert load_quarterly_index(2019, 2, path=path, filing_types=None, conn=engine) == 4
+
+    filings = query_index_for_filings(['0000831001', '0000051143', '0000000001'], '8-K', start=date(2019, 4, 2),
+                                      end=date(2019, 6, 30), conn=engine)
+    assert filings == {
+        '0000831001': [Filing(date(2019, 4, 15), '8-K', filing_href_from_filename(
+            'edgar/data/831001/0000831001-19-000071.txt'))],
+        '0000051143': [Filing(date(2019, 4, 16), '8-K', filing_href_from_filename(
+            'edgar/data/51143/0001104659-19-021739.txt'))],
+        '0000000001': []
+    }
+
+
+def test_load_index_by_filing_type(tmp_path):
+    path = tmp_path / 'master.idx'
+    path.write_text(MASTER_IDX)
+    engine = create_engine('sqlite://')
+    assert load_quarterly_index(2019, 2, path=path, filing_types=['8-K'], conn=engine) == 3
+    assert is_index_loaded('full-index/2019/QTR2', ['8-k'], conn=engine)
+    assert not is_index_loaded('full-index/2019/QTR2', ['10-Q'], conn=engine)
+
+    # Loading the 10-Qs of the quarter leaves its 8-Ks.
+    assert load_quarterly_index(2019, 2, path=path, filing_types=['10-Q'], conn=engine) == 1
+    assert load_quarterly_index(2019, 2, path=path, filing_types=['10-Q'], conn=engine) == 0
+    assert sorted(t for (t,) in engine.execute('select filing_type from filing_index')) == \
+        ['10-Q', '8-K', '8-K', '8-K/A']
+
+    # And reloading the 8-Ks leaves its 10-Qs.
+    assert load_quarterly_index(2019, 2, path=path, filing_types=['8-K'], reload=True, conn=engine) == 3
+    assert engine.execute('select count(*) from filing_index').scalar() == 4
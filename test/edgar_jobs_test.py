@@ -0,0 +1,90 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+from edgar_prelim.edgar_jobs import *
+
+CIKS = [f'{i:010d}' for i in range(1, 7)]
+
+
+def _engine(tmp_path):
+    return create_engine(f'sqlite:///{tmp_path / "prelim.db"}')
+
+
+def test_scheduler_resumes_where_it_stopped(tmp_path):
+    engine = _engine(tmp_path)
+    loaded = []
+    interrupt = [CIKS[3]]
+
+    def load(cik: str) -> JobResult:
+        if cik in interrupt:
+            interrupt.remove(cik)
+            raise KeyboardInterrupt()
+        if cik == CIKS[1]:
+            raise ValueError('no filings')
+        loaded.append(cik)
+        return JobResult(filings=2, loaded=True)
+
+    scheduler = JobScheduler('update', workers=1, conn=engine)
+    assert scheduler.schedule(CIKS) == 6
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.run(load)
+    assert loaded == [CIKS[0], CIKS[2]]
+    assert scheduler.progress()[:5] == (6, 3, 0, 2, 1)
+
+    # A new scheduler, as after a restart, resumes with the CIK that was interrupted and never runs the others again.
+    resumed = JobScheduler('update', workers=2, conn=engine)
+    assert resumed.schedule(CIKS) == 3
+    progress = resumed.run(load)
+    assert loaded[2:] == CIKS[3:]
+    assert progress[:6] == (6, 0, 0, 5, 1, 10)
+    assert progress.filings_per_minute > 0 and progress.eta is not None
+
+    # Once every CIK has finished, the job starts over.
+    assert JobScheduler('update', conn=engine).schedule(CIKS[:4]) == 4
+
+
+def test_scheduler_leases(tmp_path):
+    engine = _engine(tmp_path)
+    first = JobScheduler('update', workers=1, lease_seconds=0.5, owner='first', conn=engine)
+    second = JobScheduler('update', workers=1, lease_seconds=0.5, owner='second', conn=engine)
+    first.schedule(CIKS[:2])
+
+    assert first.claim_next() == CIKS[0]
+    assert second.claim_next() == CIKS[1]
+    assert second.claim_next() is None
+
+    # The first scheduler's lease expires, as if it had died, and the second takes its CIK over.
+    time.sleep(0.6)
+    second.renew([CIKS[1]])
+    assert second.claim_next() == CIKS[0]
+    first.finish(CIKS[0], JobResult(1, True))
+    assert first.progress()[:5] == (2, 0, 2, 0, 0)
+
+    second.release([CIKS[0]])
+    assert second.progress()[:5] == (2, 1, 1, 0, 0)
+
+
+def test_scheduler_takes_up_ciks_of_dead_schedulers(tmp_path):
+    engine = _engine(tmp_path)
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+
+    # A scheduler on this host that was killed, and one elsewhere that stopped renewing its lease.
+    killed = JobScheduler('update', workers=1, owner=f'{socket.gethostname()}:{dead.pid}', conn=engine)
+    killed.schedule(CIKS[:3])
+    assert killed.claim_next() == CIKS[0]
+    stalled = JobScheduler('update', workers=1, lease_seconds=0.5, owner='elsewhere:1', conn=engine)
+    assert stalled.claim_next() == CIKS[1]
+
+    loaded = []
+    restarted = JobScheduler('update', workers=2, lease_seconds=0.5, conn=engine)
+    assert restarted.schedule(CIKS[:3]) == 2
+    progress = restarted.run(lambda cik: loaded.append(cik) or JobResult(filings=1, loaded=False))
+    # The stalled CIK is waited for until its lease expires.
+    assert sorted(loaded) == CIKS[:3]
+    assert progress[:5] == (3, 0, 0, 3, 0)
@@ -0,0 +1,65 @@
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from conftest import stand_in_filing
+from edgar_prelim.edgar_db import upgrade_schema
+from edgar_prelim.edgar_fingerprint import ITEMS, TITLES, FISCAL_PERIODS, UNITS, register_pattern_version
+from edgar_prelim.edgar_load import *
+
+
+def _load(filings, **kwargs) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    engine = create_engine('sqlite://')
+    upgrade_schema(engine)
+    assert load_prelim_statements('0000000001', start=date(2019, 1, 1), filings=filings, conn=engine, **kwargs)
+    return (pd.read_sql('select * from prelim_statement order by filing_date, item', engine),
+            pd.read_sql('select * from prelim_filing order by filing_date', engine))
+
+
+def test_load_prelim_statements_in_processes(edgar_server):
+    filings = [stand_in_filing(edgar_server, i) for i in range(1, 8)]
+    statements, filing_df = _load(filings, workers=2)
+    assert filing_df.is_prelim.tolist() == [True, False] * 3 + [True]
+    assert filing_df.reject_reason.tolist() == [None, REJECT_NO_TABLES] * 3 + [None]
+    assert filing_df.titled_tables.tolist() == [1, 0] * 3 + [1]
+    assert filing_df.fiscal_period_tables.tolist() == [1, 0] * 3 + [1]
+    assert filing_df.document_hashes.str.len().tolist() == [16] * 7
+    assert set(statements.item) >= {'net income', 'net interest income'}
+
+    in_process = _load(filings)
+    assert statements.equals(in_process[0]) and filing_df.equals(in_process[1])
+
+
+def test_rejection_may_change():
+    changed = {ITEMS: [], UNITS: []}
+    assert not rejection_may_change(REJECT_NO_TABLES, 0, 0, changed)
+    assert rejection_may_change(REJECT_NO_TABLES, 0, 0, {TITLES: []})
+    assert not rejection_may_change(REJECT_NO_ITEMS, 2, 0, changed)
+    assert rejection_may_change(REJECT_NO_ITEMS, 2, 0, {FISCAL_PERIODS: []})
+    assert rejection_may_change(REJECT_NO_ITEMS, 2, 1, changed)
+    assert not rejection_may_change(REJECT_NO_ITEMS, 2, 1, {UNITS: []})
+    assert not rejection_may_change(REJECT_NO_ITEMS, 2, 1, {})
+    # Failures are retried even when nothing changed.
+    assert rejection_may_change(REJECT_ERROR, None, None, {})
+
+    # Without evidence, or without knowing what changed, the filing is visited again.
+    assert rejection_may_change(REJECT_NO_ITEMS, None, None, changed)
+    assert rejection_may_change(REJECT_NO_TABLES, 0, 0, None)
+    assert rejection_may_change(REJECT_ERROR, 0, 0, changed)
+
+
+def test_delete_unsettled_filings(edgar_server, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "prelim.db"}')
+    upgrade_schema(engine)
+    register_pattern_version(conn=engine)
+    filings = [stand_in_filing(edgar_server, i) for i in range(1, 7)]
+    load_prelim_statements('0000000001', start=date(2019, 1, 1), filings=filings, conn=engine)
+    engine.execute("update prelim_filing set pattern_version = null where filing_date = '2019-04-04'")
+    engine.execute("update prelim_filing set reject_reason = 'error' where filing_date = '2019-04-06'")
+
+    # The prelims are visited again, and so are the filing whose patterns aren't known and the one that failed, but not
+    # the other without items.
+    assert delete_unsettled_filings('0000000001', date(2019, 4, 1), date(2019, 4, 30), conn=engine) == 5
+    remaining = pd.read_sql('select * from prelim_filing', engine)
+    assert remaining.filing_date.tolist() == ['2019-04-02']
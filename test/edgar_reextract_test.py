@@ -0,0 +1,65 @@
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from conftest import stand_in_filing
+from edgar_prelim.edgar_archive import SubmissionArchive, set_submission_archive
+from edgar_prelim.edgar_db import upgrade_schema
+from edgar_prelim.edgar_fingerprint import pattern_version, register_pattern_version
+from edgar_prelim.edgar_items import prelim_items
+from edgar_prelim.edgar_load import load_prelim_statements, save_overrides
+from edgar_prelim.edgar_reextract import *
+
+WITHOUT_NET_INCOME = [item for item in prelim_items if item.name != 'net income']
+
+
+def _statements(engine) -> pd.DataFrame:
+    return pd.read_sql('select * from prelim_statement order by filing_date, item', engine)
+
+
+def test_reextract_prelim_statements(edgar_server, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "prelim.db"}')
+    upgrade_schema(engine)
+    register_pattern_version(conn=engine)
+    archive = SubmissionArchive(tmp_path / 'archive', conn=engine)
+    filings = [stand_in_filing(edgar_server, i) for i in range(1, 8)]
+
+    # The last two filings are loaded before there is an archive.
+    load_prelim_statements('0000000001', start=date(2019, 1, 1), filings=filings[5:], conn=engine)
+    set_submission_archive(archive)
+    load_prelim_statements('0000000001', start=date(2019, 1, 1), filings=filings[:5], conn=engine)
+    loaded = _statements(engine)
+    assert set(loaded.pattern_version) == {pattern_version()}
+    assert 'net income' in set(loaded.item)
+
+    overridden = loaded[(loaded.item == 'net income') & (loaded.filing_date == loaded.filing_date.min())]
+    save_overrides(overridden.assign(item_value=1.0), conn=engine)
+
+    dry_run = reextract_prelim_statements(items=WITHOUT_NET_INCOME, workers=0, dry_run=True, conn=engine)
+    assert _statements(engine).drop(columns=['is_overridden', 'item_value']).equals(
+        loaded.drop(columns=['is_overridden', 'item_value']))
+
+    result = reextract_prelim_statements(items=WITHOUT_NET_INCOME, workers=2, conn=engine)
+    # The first filing's net income is overridden, so removing the item doesn't change it. The filings without tables
+    # can't gain items from a change to them, even the one that wasn't archived.
+    assert result.filings.outcome.tolist() == [OUTCOME_UNCHANGED] + [OUTCOME_SCREENED, OUTCOME_CHANGED] * 2 + \
+        [OUTCOME_SCREENED, OUTCOME_NOT_ARCHIVED]
+    assert dry_run.filings.outcome.equals(result.filings.outcome)
+    assert dry_run.changes.reset_index(drop=True).equals(result.changes.reset_index(drop=True))
+
+    # The overridden net income is kept, and the others are gone.
+    assert result.changes.change.tolist() == ['removed'] * 2
+    assert result.changes.old_value.tolist() == [3210000.] * 2
+    reextracted = _statements(engine)
+    assert reextracted[reextracted.item == 'net income'].item_value.tolist() == [1.0, 3210000.]
+    assert set(reextracted[reextracted.is_overridden == False].pattern_version) == \
+        {pattern_version(WITHOUT_NET_INCOME), pattern_version()}
+
+    again = reextract_prelim_statements(items=WITHOUT_NET_INCOME, workers=0, conn=engine)
+    assert again.filings.outcome.tolist() == [OUTCOME_NOT_ARCHIVED]
+
+    restored = reextract_prelim_statements(workers=0, conn=engine)
+    assert restored.filings.outcome.tolist() == [OUTCOME_UNCHANGED] + [OUTCOME_SCREENED, OUTCOME_CHANGED] * 2 + \
+        [OUTCOME_SCREENED]
+    assert restored.changes.change.tolist() == ['added'] * 2
@@ -0,0 +1,182 @@
+import re
+
+from conftest import stand_in_submission, STAND_IN_EARNINGS_HTML
+from edgar_prelim.edgar_cache import DiskResponseCache
+from edgar_prelim.edgar_http import http_stream, set_response_cache
+from edgar_prelim.edgar_submission import *
+
+DOCUMENTS = [
+    ('8-K', 'form8-k.htm', '<html><p>Item 2.02 Results of Operations</p></html>'),
+    ('EX-99.1', 'ex991.htm', '<html><table><tr><td>Net income</td><td>1,234</td></tr></table></html>'),
+    ('GRAPHIC', 'logo.htm', 'begin 644 logo.jpg\nM_]C_X `02D9)1@`!`0$`8`!@``#_VP!#``(!`0(!`0(\nend'),
+    ('EX-99.2', 'ex992.pdf', '%PDF-1.4 binary stuff'),
+    ('EX-101.INS', 'r1.xml', '<xbrl></xbrl>'),
+    ('EX-99.2', 'ex992.html', '<html><p>Café — Supplemental</p></html>'),
+]
+
+
+def _documents_by_find(raw: str):
+    """The documents as found by searching the whole raw text, the way submissions were parsed before streaming."""
+    def tags(text, tag):
+        start = text.find(f'<{tag}>')
+        while start != -1:
+            end = text.find(f'</{tag}>', start)
+            yield text[start + len(tag) + 2:end]
+            start = text.find(f'<{tag}>', end)
+
+    return [
+        SubmissionDocument(doc_type, filename, txt)
+        for doc in tags(raw, 'DOCUMENT')
+        for doc_type in [re.search(r'<TYPE>(.+)\s', doc).group(1)]
+        if doc_type != 'GRAPHIC'
+        for filename in [re.search(r'<FILENAME>(.+)\s', doc).group(1)]
+        if filename.endswith(".htm") or filename.endswith(".html")
+        for txt in tags(doc, 'TEXT')
+    ]
+
+
+def test_streamed_submission_matches_whole_text():
+    raw = stand_in_submission('0000000001-19-000001', '0000000001', DOCUMENTS)
+    parsed = parse_submission(raw)
+    assert parsed.cik == '0000000001'
+    assert parsed.number == '0000000001-19-000001.txt : 20190415'
+    assert [d.filename for d in parsed.documents] == ['form8-k.htm', 'ex991.htm', 'ex992.html']
+    assert parsed.documents == _documents_by_find(raw)
+
+    encoded = raw.encode('utf-8')
+    for chunk_size in [1, 3, 7, 64, len(encoded)]:
+        chunks = (encoded[i:i + chunk_size] for i in range(0, len(encoded), chunk_size))
+        streamed = read_submission(chunks, 'utf-8')
+        assert streamed._replace(raw=raw) == parsed
+
+
+def test_splitter_does_not_buffer_dropped_documents():
+    splitter = SubmissionSplitter()
+    raw = stand_in_submission('0000000001-19-000001', '0000000001', [('GRAPHIC', 'big.jpg', 'x' * 100000)])
+    for i in range(0, len(raw), 1000):
+        assert not list(splitter.feed(raw[i:i + 1000]))
+        assert len(splitter._pending) + sum(len(p) for p in splitter._parts) < 1000
+
+
+def test_load_submission_streams_and_records(edgar_server, tmp_path):
+    raw = stand_in_submission('0000000001-19-000001', '0000000001', DOCUMENTS)
+    href = edgar_server.add_page('/Archives/edgar/data/1/0000000001-19-000001.txt', raw, 'text/plain; charset=utf-8')
+    set_response_cache(DiskResponseCache(tmp_path))
+
+    with http_stream(href, chunk_size=16) as (result, chunks):
+        next(chunks)
+    assert _cache_size(tmp_path) == 0
+
+    expected = parse_submission(raw)._replace(raw=None)
+    assert load_submission(href) == expected
+    assert _cache_size(tmp_path) > 0
+    assert load_submission(href) == expected
+    assert len(edgar_server.requests) == 2
+
+
+def _cache_size(directory) -> int:
+    return DiskResponseCache(directory).size
+
+
+def test_document_gate():
+    assert document_gate(STAND_IN_EARNINGS_HTML) is None
+    assert document_gate('<p>Consolidated&nbsp;Balance Sheets</p><table><tr><td>Net income</td><td>2019</td></tr>'
+                         '</table>') is None
+    assert document_gate('<p>Consolidated Balance<br>Sheets</p><table><tr><td>Net income</td><td>2019</td></tr>'
+                         '</table>') is None
+    assert document_gate(DOCUMENTS[0][2]) == 'no table'
+    assert document_gate(DOCUMENTS[1][2]) == 'no title'
+    assert document_gate('<p>Financial Highlights</p><table><tr><td>Loans</td><td>2019</td></tr></table>') == \
+        'no item'
+    assert document_gate('<p>Financial Highlights</p><table><tr><td>Net income</td><td>1</td></tr></table>') == \
+        'no fiscal period'
+
+
+def test_parse_tables_skips_gated_documents():
+    documents = [('8-K', 'form8-k.htm', DOCUMENTS[0][2]), ('EX-99.1', 'ex991.htm', STAND_IN_EARNINGS_HTML),
+                 ('EX-99.2', 'ex992.htm', STAND_IN_EARNINGS_HTML.replace('Net income', 'Loans'))]
+    submission = parse_submission(stand_in_submission('0000000001-19-000001', '0000000001', documents))
+    gated = parse_tables(submission)
+    assert [t.title for t in gated] == [t.title for t in parse_tables(submission, gate=False)]
+    assert items_from_tables(gated).equals(items_from_tables(parse_tables(submission, gate=False)))
+    assert not items_from_tables(gated).empty
+
+
+def test_parse_tables_gates_documents_by_the_submission():
+    # The headerless table of the last document borrows the headers of the table before it, which is in a document
+    # without items or the digits of a year, so skipping that document would change the items of the last.
+    headers = ('<html><p>CONSOLIDATED STATEMENTS OF INCOME</p><table>'
+               '<tr><td></td><td>Three Months Ended</td><td>Three Months Ended</td></tr>'
+               '<tr><td></td><td>(in thousands)</td><td>(in thousands)</td></tr></table></html>')
+    headerless = ('<html><p>FINANCIAL HIGHLIGHTS</p><table>'
+                  '<tr><td>Total revenue</td><td>5,100</td><td>4,900</td></tr>'
+                  '<tr><td>Book value per share</td><td>25.10</td><td>24.00</td></tr></table></html>')
+    documents = [('EX-99.1', 'ex991.htm', STAND_IN_EARNINGS_HTML), ('EX-99.2', 'ex992.htm', headers),
+                 ('EX-99.3', 'ex993.htm', headerless)]
+    submission = parse_submission(stand_in_submission('0000000001-19-000001', '0000000001', documents))
+    assert document_gate(headers) == 'no item'
+    assert gate_documents([text for _, _, text in documents]) == [None] * 3
+
+    ungated = items_from_tables(parse_tables(submission, gate=False))
+    assert items_from_tables(parse_tables(submission)).equals(ungated)
+    assert items_from_tables(parse_tables(submission, any_items=True)).equals(ungated)
+
+    # Without a document with the literals of an item, none are parsed.
+    without_items = headerless.replace('Total revenue', 'Loans').replace('Book value per share', 'Branches')
+    assert gate_documents([headers, without_items, DOCUMENTS[0][2]]) == ['no item', 'no item', 'no table']
+
+
+def _statement(periods: int) -> pd.DataFrame:
+    """A statement whose periods span two columns each, with a blank column between them."""
+    def row(label, cells):
+        return [label] + [c for cell in cells for c in cell + (np.nan,)]
+
+    return pd.DataFrame([
+        row('', [('Three Months Ended',) * 2] * periods),
+        row('', [('March 31,',) * 2] * periods),
+        row('', [(str(2019 - p % 2),) * 2 for p in range(periods)]),
+        row('', [('(Unaudited)',) * 2] * periods),
+        row('Net  interest\nincome', [('$', f'{p + 1},234') for p in range(periods)]),
+        row('Net income', [('$', f'({p + 12})') for p in range(periods)]),
+        row('Net income', [('$', f'({p + 12})') for p in range(periods)]),
+    ], dtype=object)
+
+
+def test_clean_table():
+    df = clean_table(_statement(2))
+    assert df.values.tolist() == [
+        ['', 'Three Months Ended March 31, 2019', 'Three Months Ended March 31, 2018'],
+        ['Net interest income', '$1,234', '$2,234'],
+        ['Net income', '$(12)', '$(13)'],
+    ]
+    assert list(df.index) == [0, 1, 2] and list(df.columns) == [0, 1, 2]
+
+
+def test_clean_table_collapses_wide_tables():
+    df = clean_table(_statement(1000))
+    assert df.shape == (3, 1001)
+    assert list(df.iloc[0, -2:]) == ['Three Months Ended March 31, 2019', 'Three Months Ended March 31, 2018']
+    assert list(df.iloc[1:, -1]) == ['$1000,234', '$(1011)']
+
+
+def test_item_matcher():
+    matcher = ItemMatcher(prelim_items)
+    assert matcher.match('Net income') == ((0, 0),)
+    assert matcher.match('NET  INTEREST INCOME') == ((1, 0),)
+    assert matcher.match('Total interest income') == ((2, 0),)
+    assert matcher.match('Net interest income - FTE') == ((1, 2),)
+    assert matcher.match('Loans') == ()
+
+    values = clean_table(_statement(2)).values
+    assert matcher.match_table(values, 1).tolist() == [[1, 0, 1, 0], [2, 0, 0, 0]]
+    assert matcher.match_table(values, 0).shape == (0, 4)
+
+
+def test_items_from_table():
+    table = TableTuple('Income Statement', clean_table(_statement(2)), None, None, 0, '', 1.0)
+    df = items_from_table(table)
+    assert df[['item', 'item_rank', 'item_value', 'fiscal_period', 'src_row']].values.tolist() == [
+        ['net income', 0, -12000.0, '2019Q1', 'Net income'],
+        ['net interest income', 0, 1234000.0, '2019Q1', 'Net interest income'],
+    ]
+    assert items_from_table(table, [prelim_items[1]]).equals(df.iloc[[1]].reset_index(drop=True))
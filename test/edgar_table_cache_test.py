@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from conftest import stand_in_submission, STAND_IN_EARNINGS_HTML
+from edgar_prelim.edgar_items import prelim_items
+from edgar_prelim.edgar_submission import parse_submission
+from edgar_prelim.edgar_table_cache import *
+
+ACCESSION = '0000000001-19-000001'
+
+
+def _submission():
+    return parse_submission(stand_in_submission(ACCESSION, '0000000001', [
+        ('EX-99.1', 'ex991.htm', STAND_IN_EARNINGS_HTML),
+        ('EX-99.2', 'ex992.htm', '<html><p>Other events</p></html>')]))
+
+
+def test_table_cache_round_trip(tmp_path):
+    cache = TableCache(tmp_path)
+    df = pd.DataFrame([['', 'March 31, 2019'], ['Net income', None], ['Net loss', np.nan]],
+                      index=[0, 2, 5], dtype=object)
+    tables = [TableTuple('STATEMENTS OF INCOME', df, None, None, 2, None, 1.0),
+              TableTuple('BALANCE SHEETS — é', df.iloc[:0, :0], None, None, 0, 'in thousands', 1000.0)]
+    assert cache.get(ACCESSION) is None
+    assert cache.put(ACCESSION, tables)
+
+    cached = cache.get(ACCESSION)
+    assert [t._replace(df=None) for t in cached] == [t._replace(df=None) for t in tables]
+    assert cached[0].df.equals(df)
+    assert list(cached[0].df.index) == [0, 2, 5]
+    assert cached[0].df.iloc[1, 1] is None
+    assert np.isnan(cached[0].df.iloc[2, 1])
+
+    # Tables parsed with other versions of the patterns aren't used.
+    assert TableCache(tmp_path, version='other').get(ACCESSION) is None
+
+    # Neither are tables that can't be cached.
+    assert not cache.put(ACCESSION, [tables[0]._replace(df=df.assign(extra=1))])
+    assert cache.get(ACCESSION) is not None
+
+
+def test_parse_tables_cached(tmp_path):
+    submission = _submission()
+    parsed = parse_tables(submission)
+    set_table_cache(TableCache(tmp_path))
+    try:
+        assert submission_accession(submission) == ACCESSION
+        assert [t.title for t in parse_tables_cached(submission)] == [t.title for t in parsed]
+
+        cached = get_table_cache().get(ACCESSION)
+        assert len(cached) == len(parsed)
+        without_net_income = [item for item in prelim_items if item.name != 'net income']
+        for items in [None, without_net_income]:
+            expected = items_from_tables(parse_tables(submission, items=items), items=items)
+            assert items_from_tables(parse_tables_cached(submission, items=items), items=items).equals(expected)
+        assert list(dict(items_from_cached_tables([ACCESSION, '0000000001-19-000002']))) == [ACCESSION]
+    finally:
+        set_table_cache(None)
@@ -0,0 +1,47 @@
+import sre_parse
+
+import pytest
+from bs4 import BeautifulSoup
+
+from edgar_prelim.edgar_re import _required_literals
+from edgar_prelim.edgar_title import *
+
+FRAGMENTS = [
+    'Consolidated Statements of Income', 'CONSOLIDATED STATEMENTS OF INCOME (Unaudited)',
+    'C o n s o l i d a t e d   B a l a n c e   S h e e t s', 'Consolidated Balance Sheet (1)', 'Financial Highlights*',
+    'Selected Financial Data', 'Summary of Business Results', 'Quarterly Results of Operations', 'Earnings',
+    'Statements of Income (Loss)', 'Shareholders’ Equity', 'Per Share-Related Information', 'Net income',
+    '(Dollars in thousands, except per share data)', '($ in millions)', 'In Thousands', '(000’s)', '$ 1,234',
+    'Non-GAAP Financial Measures', 'Business Segment Results', 'For the three months ended March 31, 2019', '',
+    'Net interest income and net interest margin', 'Key Performance Ratios', 'Capital ratios',
+]
+
+
+def test_required_literals():
+    def literals(pattern):
+        return [set(clause) for clause in _required_literals(sre_parse.parse(allow_space_between_letters(pattern)))]
+
+    assert literals(r'^consolidated\s+balance\s+sheets?$') == [{'consolidatedbalancesheet'}]
+    assert literals(r'(?:net\s+)?(?:income|earnings)\s+statements?') == [{'income', 'earnings'}, {'statement'}]
+    assert literals(r'(?:key|select(?:ed)?)?\s+data') == [{'data'}]
+    assert literals(r'(?:key|\d+)\s+data') == [{'data'}]
+
+
+@pytest.mark.parametrize('patterns', [
+    [p.pattern for p in title_inclusion_patterns], list(unit_patterns), list(title_exclusion_patterns)])
+def test_pattern_set_matches_pattern_by_pattern(patterns):
+    pattern_set = PatternSet(patterns)
+    for lower in map(str.lower, FRAGMENTS):
+        expected = tuple(i for i, p in enumerate(patterns) if p.search(lower))
+        assert pattern_set.search(lower) == expected
+        assert pattern_set.search(lower) == expected
+
+
+def test_title_from_table_tag_matches_pattern_by_pattern():
+    html = ''.join(f'<p>{fragment}</p><table><tr><td>Net income</td><td>1</td></tr></table>' for fragment in FRAGMENTS)
+    for cik in ['', '0000019617', '0000750556']:
+        tables = BeautifulSoup(html, features='lxml').find_all('table')
+        titles = [title_from_table_tag(t, cik) for t in tables]
+        assert any(titles)
+        assert titles == [title_from_table_tag(t, cik, list(title_inclusion_patterns), tuple(title_exclusion_patterns))
+                          for t in tables]
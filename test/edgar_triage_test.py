@@ -0,0 +1,54 @@
+from datetime import date
+
+from sqlalchemy import create_engine
+
+from conftest import stand_in_submission, stand_in_filing
+from edgar_prelim.edgar_db import upgrade_schema
+from edgar_prelim.edgar_load import load_prelim_statements, FilingTable, REJECT_NO_TABLES
+from edgar_prelim.edgar_triage import *
+
+EARNINGS = ['Results of Operations and Financial Condition', 'Financial Statements and Exhibits']
+NOT_EARNINGS = ['Other Events', 'Financial Statements and Exhibits']
+FORM_8K = ('8-K', 'form8-k.htm', '<html><p>Item 8.01 Other Events</p>' + ' ' * 100000 + '</html>')
+PRESS_RELEASE = ('EX-99.1', 'ex991.htm', '<html><p>Dividend declared</p></html>')
+
+
+def _add_filing(server, i: int, items) -> Filing:
+    return stand_in_filing(server, i, [FORM_8K, PRESS_RELEASE], items=items)
+
+
+def test_triage_submission_head():
+    def head(items, documents=()):
+        return stand_in_submission('0000000001-19-000001', '0000000001', documents, items=items)
+
+    assert triage_submission_head(head(EARNINGS)) == Triage(True, None, EARNINGS)
+    assert triage_submission_head(head(NOT_EARNINGS)) == Triage(False, REJECT_TRIAGE, NOT_EARNINGS)
+    assert triage_submission_head(head(NOT_EARNINGS, [('EX-99.1', 'ex991.htm', '')])).keep
+    assert triage_submission_head(head([])).keep
+
+
+def test_triage_filing_reads_only_the_head(edgar_server):
+    filing = _add_filing(edgar_server, 1, NOT_EARNINGS)
+    assert triage_filing(filing, size=1024) == Triage(False, REJECT_TRIAGE, NOT_EARNINGS)
+    assert edgar_server.requests[-1][1]['Range'] == 'bytes=0-1023'
+
+    edgar_server.honor_range = False
+    assert triage_filing(filing, size=1024) == Triage(False, REJECT_TRIAGE, NOT_EARNINGS)
+
+
+def test_load_records_triage_rejections(edgar_server):
+    filings = [_add_filing(edgar_server, 1, NOT_EARNINGS), _add_filing(edgar_server, 2, EARNINGS)]
+    engine = create_engine('sqlite://')
+    upgrade_schema(engine)
+
+    load_prelim_statements('0000000001', start=date(2019, 4, 1), end=date(2019, 4, 30), filings=filings,
+                           conn=engine, triage=True)
+    filing_table = FilingTable.from_query('0000000001', conn=engine)
+    assert filing_table.reject_reason('0000000001', filings[0]) == REJECT_TRIAGE
+    assert filing_table.reject_reason('0000000001', filings[1]) == REJECT_NO_TABLES
+    assert [path for path, headers in edgar_server.requests if 'Range' not in headers] == \
+           ['/Archives/edgar/data/1/0000000001-19-000002.txt']
+
+    load_prelim_statements('0000000001', start=date(2019, 4, 1), end=date(2019, 4, 30), filings=filings, conn=engine)
+    filing_table = FilingTable.from_query('0000000001', conn=engine)
+    assert filing_table.reject_reason('0000000001', filings[0]) == REJECT_NO_TABLES
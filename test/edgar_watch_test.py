@@ -0,0 +1,60 @@
+from sqlalchemy import create_engine
+
+from conftest import stand_in_filing, stand_in_feed, stand_in_feed_entry, STAND_IN_EARNINGS_HTML, \
+    STAND_IN_OTHER_EVENTS_HTML
+from edgar_prelim.edgar_db import upgrade_schema
+from edgar_prelim.edgar_load import query_prelims
+from edgar_prelim.edgar_watch import *
+
+
+def _add_filing(server, cik: str, i: int, text: str = None) -> str:
+    """The feed entry of a filing accepted now, whose submission is served unless text is None."""
+    filing = stand_in_filing(server, i, [('EX-99.1', 'ex991.htm', text)], cik=cik, serve=text is not None)
+    return stand_in_feed_entry(cik, f'{cik}-19-{i:06d}', filing.href, updated=datetime.now(timezone.utc).isoformat())
+
+
+def test_parse_feed():
+    entry = stand_in_feed_entry('0000000001', '0000000001-19-000001', 'https://www.sec.gov/x-index.htm')
+    assert parse_feed(stand_in_feed([entry]).encode('latin-1')) == [FeedEntry(
+        cik='0000000001', accession='0000000001-19-000001',
+        filing=Filing(date=datetime(2019, 4, 15).date(), type='8-K', href='https://www.sec.gov/x-index.htm'),
+        company_name='STAND-IN BANCORP', updated=datetime.fromisoformat('2019-04-15T08:03:21-04:00'))]
+
+
+def test_watcher_loads_new_filings_of_watched_ciks(edgar_server):
+    engine = create_engine('sqlite://')
+    upgrade_schema(engine)
+    entries = [_add_filing(edgar_server, '0000000002', 1, STAND_IN_EARNINGS_HTML),
+               _add_filing(edgar_server, '0000000001', 1, STAND_IN_EARNINGS_HTML)]
+    feed_url = edgar_server.add_page('/cgi-bin/browse-edgar', stand_in_feed(entries), 'application/atom+xml', 'v1')
+    watcher = FeedWatcher(['0000000001'], url=feed_url, conn=engine)
+
+    assert watcher.run_once() == 1
+    assert set(query_prelims('0000000001', conn=engine).item) >= {'net income', 'net interest income'}
+    assert watcher.run_once() == 0
+    assert edgar_server.requests[-1][1]['If-None-Match'] == 'v1'
+
+    entries.insert(0, _add_filing(edgar_server, '0000000001', 2, STAND_IN_OTHER_EVENTS_HTML))
+    edgar_server.add_page('/cgi-bin/browse-edgar', stand_in_feed(entries), 'application/atom+xml', 'v2')
+    assert watcher.run_once() == 0
+
+    # A filing that fails to load is tried again with the next poll, even if the feed hasn't changed.
+    entries.insert(0, _add_filing(edgar_server, '0000000001', 3))
+    edgar_server.add_page('/cgi-bin/browse-edgar', stand_in_feed(entries), 'application/atom+xml', 'v3')
+    assert watcher.run_once() == 0
+    _add_filing(edgar_server, '0000000001', 3, STAND_IN_EARNINGS_HTML)
+    assert watcher.run_once() == 1
+    assert watcher.run_once() == 0
+
+    assert [path for path, _ in edgar_server.requests if not path.startswith('/cgi-bin')] == [
+        '/Archives/edgar/data/1/0000000001-19-000001.txt', '/Archives/edgar/data/1/0000000001-19-000002.txt',
+        '/Archives/edgar/data/1/0000000001-19-000003.txt', '/Archives/edgar/data/1/0000000001-19-000003.txt']
+
+    summary = watcher.metrics.summary()
+    assert (summary['polls'], summary['not_modified'], summary['filings'], summary['prelims'], summary['errors']) == \
+        (6, 3, 4, 2, 1)
+    # The filings were accepted as the test began, so each is detected and written within seconds of it.
+    assert 0 < summary['detect_p50'] <= summary['detect_max'] < 30
+    assert 0 < summary['row_p50'] <= summary['row_max'] < 30
+    # The first filing's rows are written after it is detected.
+    assert watcher.metrics.row_latency[0] >= watcher.metrics.detect_latency[0]